@@ -0,0 +1,91 @@
+import argparse
+import json
+import re
+import time
+
+from smersh_cli.utils.json import clean_ldjson
+
+from .fake_server import Dataset
+
+SNAKE_CASE_REGEX = re.compile(r'(.)([A-Z][a-z]+)')
+SNAKE_CASE_2_REGEX = re.compile(r'([a-z0-9])([A-Z])')
+
+
+def reference_snake_case(s):
+    s = SNAKE_CASE_REGEX.sub(r'\1_\2', s)
+    return SNAKE_CASE_2_REGEX.sub(r'\1_\2', s).lower()
+
+
+def reference_clean_ldjson(data):
+    # The previous, recursive implementation, used to check the output and to measure the speedup
+    data_type = type(data)
+
+    if data_type == list:
+        return [reference_clean_ldjson(e) for e in data]
+
+    elif data_type == dict:
+        if ('@type' in data) and (data['@type'] == 'hydra:Collection'):
+            return reference_clean_ldjson(data['hydra:member'])
+
+        if ('id' not in data) and ('@id' not in data):
+            return data
+
+        id_ = data['id' if 'id' in data else '@id']
+        cleaned = {
+            'id': str(id_) if type(id_) == int else id_.split('/')[-1]
+        }
+
+        for k, v in data.items():
+            if (k[0] != '@') and (k != 'id'):
+                cleaned[reference_snake_case(k)] = reference_clean_ldjson(v)
+
+        return cleaned
+
+    return data
+
+
+def create_collection(endpoint, size):
+    dataset = Dataset({endpoint: size})
+
+    return {
+        '@context': f'/api/contexts/{endpoint}',
+        '@id': f'/api/{endpoint}',
+        '@type': 'hydra:Collection',
+        'hydra:member': dataset.get_page(endpoint, 1, size),
+        'hydra:totalItems': size
+    }
+
+
+def measure(function, data, repeat):
+    durations = []
+
+    for __ in range(repeat):
+        start = time.perf_counter()
+        function(data)
+        durations.append(time.perf_counter() - start)
+
+    return min(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare clean_ldjson with its previous implementation')
+    parser.add_argument('-e', '--endpoint', default='hosts', help='The kind of objects of the collection')
+    parser.add_argument('-s', '--size', type=int, default=100000, help='The number of objects of the collection')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='Keep the best time of this many runs')
+    args = parser.parse_args()
+
+    # Decoding the JSON gives distinct string objects, as the client gets them
+    data = json.loads(json.dumps(create_collection(args.endpoint, args.size)))
+
+    if clean_ldjson(data) != reference_clean_ldjson(data):
+        raise SystemExit('The outputs differ')
+
+    reference_duration = measure(reference_clean_ldjson, data, args.repeat)
+    duration = measure(clean_ldjson, data, args.repeat)
+
+    print(f'{args.size} {args.endpoint}: reference {reference_duration * 1000:.0f} ms, '
+          f'clean_ldjson {duration * 1000:.0f} ms ({reference_duration / duration:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
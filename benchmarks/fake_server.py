@@ -0,0 +1,869 @@
+import argparse
+import base64
+import email.parser
+import gzip
+import hashlib
+import hmac
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from smersh_cli.api import APIRoles
+from smersh_cli.models import MODELS, Model
+
+API_ROOT = Model.API_ROOT
+AUTHENTICATION_PATH = '/authentication_token'
+UPLOAD_PATH = f'{API_ROOT}/upload/host'
+
+DEFAULT_SCALE = {
+    'missions': 50,
+    'users': 20,
+    'clients': 30,
+    'hosts': 100000,
+    'host_vulns': 1000000,
+    'vulns': 500,
+    'impacts': 4,
+    'vuln_types': 10,
+    'mission_types': 3,
+    'nmaps': 10000,
+    'negative_points': 20,
+    'positive_points': 20,
+    'steps': 500
+}
+
+ITEMS_PER_PAGE = 30
+MAX_ITEMS_PER_PAGE = 1000
+GZIP_THRESHOLD = 1024
+BASE_DATE = datetime(2021, 1, 1, tzinfo=timezone.utc)
+
+IMPACT_NAMES = ['Low', 'Medium', 'High', 'Critical']
+HOST_VULN_STATES = ['TODO', 'IN PROGRESS', 'DONE', 'WONTFIX']
+TECHNOLOGIES = ['nginx', 'apache', 'iis', 'tomcat', 'node', None]
+CITIES = ['Paris', 'Lyon', 'Lille', 'Nantes', 'Bordeaux']
+ROLE_NAMES = [role.name for role in APIRoles]
+HOST_REGEX = re.compile(rb'^[a-z0-9]([a-z0-9-]*[a-z0-9])?(\.[a-z0-9]([a-z0-9-]*[a-z0-9])?)*$')
+
+
+def iso(date):
+    return date.isoformat(timespec='seconds')
+
+
+def get_children(parent_id, parent_count, children_count):
+    # Child `i` belongs to parent `(i - 1) % parent_count + 1`, so the relations never need to be stored
+    return range(parent_id, children_count + 1, parent_count)
+
+
+def get_parent(child_id, parent_count):
+    return (child_id - 1) % parent_count + 1
+
+
+def project(item, query):
+    # The sparse fieldsets of API Platform: only the requested properties, with the identifiers, are returned
+    properties = query.get('properties[]')
+
+    if properties is None:
+        return item
+
+    return {k: v for k, v in item.items() if (k in ('@id', '@type', 'id')) or (k in properties)}
+
+
+def normalize(value):
+    # The values of the query parameters are strings, and the references can be given by IRI or by identifier
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+
+    return str(value)
+
+
+def matches_value(value, expected):
+    if isinstance(value, list):
+        return any(matches_value(e, expected) for e in value)
+
+    value = normalize(value)
+
+    if expected in ('1', '0') and value in ('true', 'false'):
+        expected = 'true' if expected == '1' else 'false'
+
+    return (value == expected) or (value.startswith(API_ROOT + '/') and (value.rsplit('/', 1)[1] == expected))
+
+
+def matches_lookup(value, lookup, expected):
+    if value is None:
+        return False
+
+    if lookup in ('partial', 'start', 'end', 'word_start', 'exact'):
+        value = normalize(value).lower()
+        expected = expected.lower()
+
+        return {
+            'partial': lambda: expected in value,
+            'start': lambda: value.startswith(expected),
+            'end': lambda: value.endswith(expected),
+            'word_start': lambda: any(word.startswith(expected) for word in value.split()),
+            'exact': lambda: value == expected
+        }[lookup]()
+
+    if lookup == 'between':
+        low, __, high = expected.partition('..')
+        return matches_lookup(value, 'gte', low) and matches_lookup(value, 'lte', high)
+
+    # The numbers are compared as numbers, the dates as ISO 8601 strings
+    try:
+        value, expected = float(value), float(expected)
+    except ValueError:
+        value = normalize(value)
+
+    return {
+        'after': value >= expected,
+        'before': value <= expected,
+        'strictly_after': value > expected,
+        'strictly_before': value < expected,
+        'gt': value > expected,
+        'gte': value >= expected,
+        'lt': value < expected,
+        'lte': value <= expected
+    }[lookup]
+
+
+def get_filters(query):
+    # The search, boolean, date, range and exists filters and the ordering of API Platform
+    filters = []
+    ordering = []
+
+    for key, values in query.items():
+        match = re.match(r'^(\w+)(?:\[(\w*)\])?$', key)
+
+        if (match is None) or (key in ('page', 'itemsPerPage', 'properties[]')):
+            continue
+
+        name, argument = match.groups()
+
+        if name == 'order':
+            ordering.append((argument, values[-1]))
+        elif name == 'exists':
+            filters.append(lambda item, name=argument, expected=values[-1]:
+                           (item.get(name) not in (None, [])) == (expected in ('true', '1')))
+        elif argument in (None, ''):
+            filters.append(lambda item, name=name, values=values:
+                           any(matches_value(item.get(name), e) for e in values))
+        else:
+            filters.append(lambda item, name=name, lookup=argument, expected=values[-1]:
+                           matches_lookup(item.get(name), lookup, expected))
+
+    return filters, ordering
+
+
+class Dataset:
+    """
+    Synthetic SMERSH data generated on the fly and deterministically from the identifiers, so the scale only costs
+    memory for the objects created or modified through the API.
+    """
+
+    def __init__(self, scale=None, seed=0, username='admin'):
+        self.scale = dict(DEFAULT_SCALE, **({} if scale is None else scale))
+        self.seed = seed
+        self.username = username
+
+        self.generators = {
+            'missions': self.generate_mission,
+            'users': self.generate_user,
+            'clients': self.generate_client,
+            'hosts': self.generate_host,
+            'host_vulns': self.generate_host_vuln,
+            'vulns': self.generate_vuln,
+            'impacts': self.generate_impact,
+            'vuln_types': self.generate_vuln_type,
+            'mission_types': self.generate_mission_type,
+            'nmaps': self.generate_nmap,
+            'negative_points': self.generate_point,
+            'positive_points': self.generate_point,
+            'steps': self.generate_step
+        }
+
+        missing_endpoints = set(MODELS) - set(self.generators)
+
+        if len(missing_endpoints) > 0:
+            raise RuntimeError(f'No generator for the endpoints: {", ".join(sorted(missing_endpoints))}')
+
+        self.created = {endpoint: {} for endpoint in self.generators}
+        self.updated = {endpoint: {} for endpoint in self.generators}
+        self.deleted = {endpoint: set() for endpoint in self.generators}
+        self.next_ids = {endpoint: self.scale[endpoint] + 1 for endpoint in self.generators}
+        self.lock = threading.Lock()
+
+    def iri(self, endpoint, id):
+        return f'{API_ROOT}/{endpoint}/{id}'
+
+    def iris(self, endpoint, ids):
+        return [self.iri(endpoint, id) for id in ids]
+
+    def random(self, endpoint, id):
+        return random.Random(f'{self.seed}:{endpoint}:{id}')
+
+    def mission_users(self, mission_id):
+        return sorted({get_parent(mission_id + k, self.scale['users']) for k in range(3)})
+
+    def generate_mission(self, id, rng):
+        start_date = BASE_DATE + timedelta(days=rng.randrange(700))
+
+        return {
+            'name': f'mission-{id}',
+            'startDate': iso(start_date),
+            'pathToCodi': f'/codi/mission-{id}',
+            'endDate': iso(start_date + timedelta(days=rng.randrange(5, 60))),
+            'users': self.iris('users', self.mission_users(id)),
+            'hosts': self.iris('hosts', get_children(id, self.scale['missions'], self.scale['hosts'])),
+            'nmap': rng.random() < 0.5,
+            'nessus': rng.random() < 0.5,
+            'nmapFiler': rng.random() < 0.5,
+            'nessusFiler': rng.random() < 0.5,
+            'credentials': f'user{id}:password{id}',
+            'clients': [self.iri('clients', get_parent(id, self.scale['clients']))],
+            'steps': self.iris('steps', get_children(id, self.scale['missions'], self.scale['steps']))
+        }
+
+    def generate_user(self, id, rng):
+        missions = [m for m in range(1, self.scale['missions'] + 1) if id in self.mission_users(m)]
+
+        return {
+            'username': self.username if id == 1 else f'user{id}',
+            'roles': ['ROLE_ADMIN'] if id == 1 else rng.sample(ROLE_NAMES, 5),
+            'enabled': rng.random() < 0.9,
+            'missions': self.iris('missions', missions),
+            'phone': f'+33 6{rng.randrange(10 ** 8):08d}',
+            'city': rng.choice(CITIES),
+            'trigram': f'U{id:02d}'[-3:],
+            'mail': f'user{id}@example.com'
+        }
+
+    def generate_client(self, id, rng):
+        return {
+            'name': f'Client {id}',
+            'phone': f'+33 1{rng.randrange(10 ** 8):08d}',
+            'firstName': f'First{id}',
+            'lastName': f'Last{id}',
+            'mail': f'contact{id}@client{id}.example.com',
+            'missions': self.iris('missions', get_children(id, self.scale['clients'], self.scale['missions']))
+        }
+
+    def generate_host(self, id, rng):
+        mission_id = get_parent(id, self.scale['missions'])
+
+        return {
+            'name': f'host-{id}.mission-{mission_id}.example.com',
+            'checked': rng.random() < 0.3,
+            'technology': rng.choice(TECHNOLOGIES),
+            'hostVulns': self.iris('host_vulns', get_children(id, self.scale['hosts'], self.scale['host_vulns'])),
+            'mission': self.iri('missions', mission_id),
+            'nmaps': self.iris('nmaps', get_children(id, self.scale['hosts'], self.scale['nmaps']))
+        }
+
+    def generate_host_vuln(self, id, rng):
+        return {
+            'host': self.iri('hosts', get_parent(id, self.scale['hosts'])),
+            'vuln': self.iri('vulns', rng.randrange(1, self.scale['vulns'] + 1)),
+            'impact': self.iri('impacts', rng.randrange(1, self.scale['impacts'] + 1)),
+            'currentState': rng.choice(HOST_VULN_STATES)
+        }
+
+    def generate_vuln(self, id, rng):
+        return {
+            'name': f'Vulnerability {id}',
+            'description': f'Description of the vulnerability {id}. ' * rng.randrange(1, 5),
+            'remediation': f'Remediation of the vulnerability {id}.',
+            'vulnType': self.iri('vuln_types', get_parent(id, self.scale['vuln_types'])),
+            'impact': self.iri('impacts', get_parent(id, self.scale['impacts']))
+        }
+
+    def generate_impact(self, id, rng):
+        return {
+            'name': IMPACT_NAMES[(id - 1) % len(IMPACT_NAMES)],
+            'vulns': self.iris('vulns', get_children(id, self.scale['impacts'], self.scale['vulns']))
+        }
+
+    def generate_vuln_type(self, id, rng):
+        return {
+            'name': f'Vulnerability type {id}',
+            'vulns': self.iris('vulns', get_children(id, self.scale['vuln_types'], self.scale['vulns']))
+        }
+
+    def generate_mission_type(self, id, rng):
+        return {
+            'name': f'Mission type {id}'
+        }
+
+    def generate_nmap(self, id, rng):
+        return {
+            'date': iso(BASE_DATE + timedelta(minutes=rng.randrange(10 ** 6))),
+            'status': rng.random() < 0.5,
+            'port': str(rng.choice([22, 80, 443, 8080, 8443])),
+            'host': [self.iri('hosts', get_parent(id, self.scale['hosts']))]
+        }
+
+    def generate_point(self, id, rng):
+        return {
+            'name': f'Point {id}',
+            'description': f'Description of the point {id}'
+        }
+
+    def generate_step(self, id, rng):
+        created_at = BASE_DATE + timedelta(minutes=rng.randrange(10 ** 6))
+
+        return {
+            'description': f'Step {id}',
+            'findAt': iso(created_at - timedelta(minutes=rng.randrange(1, 600))),
+            'createdAt': iso(created_at),
+            'mission': self.iri('missions', get_parent(id, self.scale['missions']))
+        }
+
+    def exists(self, endpoint, id):
+        if id in self.deleted[endpoint]:
+            return False
+
+        return (1 <= id <= self.scale[endpoint]) or (id in self.created[endpoint])
+
+    def get(self, endpoint, id):
+        if not self.exists(endpoint, id):
+            return None
+
+        if id in self.created[endpoint]:
+            fields = dict(self.created[endpoint][id])
+        else:
+            fields = self.generators[endpoint](id, self.random(endpoint, id))
+
+        fields.update(self.updated[endpoint].get(id, {}))
+
+        return dict({'@id': self.iri(endpoint, id), '@type': endpoint, 'id': id}, **fields)
+
+    def count(self, endpoint):
+        return self.next_ids[endpoint] - 1 - len(self.deleted[endpoint])
+
+    def iter_ids(self, endpoint):
+        ids = itertools.chain(range(1, self.scale[endpoint] + 1), sorted(self.created[endpoint]))
+
+        return (id for id in ids if id not in self.deleted[endpoint])
+
+    def get_page(self, endpoint, page, items_per_page):
+        start = (page - 1) * items_per_page
+
+        if (len(self.deleted[endpoint]) == 0) and (len(self.created[endpoint]) == 0):
+            ids = range(1, self.scale[endpoint] + 1)[start:start + items_per_page]
+        else:
+            ids = itertools.islice(self.iter_ids(endpoint), start, start + items_per_page)
+
+        return [self.get(endpoint, id) for id in ids]
+
+    def select(self, endpoint, filters, ordering):
+        """
+        Return every item matching the filters, sorted. The whole collection is generated, like a database without
+        index would scan it.
+        """
+
+        items = [item for item in map(lambda id: self.get(endpoint, id), self.iter_ids(endpoint))
+                 if all(f(item) for f in filters)]
+
+        # The first key is the main one
+        for name, direction in reversed(ordering):
+            items.sort(key=lambda item: (item.get(name) is not None, '' if item.get(name) is None else item.get(name)),
+                       reverse=(direction.lower() == 'desc'))
+
+        return items
+
+    @staticmethod
+    def clean_fields(fields):
+        # The identifiers are assigned by the server
+        return {k: v for k, v in fields.items() if (k != 'id') and (k[0] != '@')}
+
+    def create(self, endpoint, fields):
+        fields = self.clean_fields(fields)
+
+        with self.lock:
+            id = self.next_ids[endpoint]
+            self.next_ids[endpoint] += 1
+            self.created[endpoint][id] = fields
+
+        return self.get(endpoint, id)
+
+    def update(self, endpoint, id, fields, replace=False):
+        fields = self.clean_fields(fields)
+
+        with self.lock:
+            if not self.exists(endpoint, id):
+                return None
+
+            if replace:
+                self.updated[endpoint][id] = dict(fields)
+            else:
+                self.updated[endpoint].setdefault(id, {}).update(fields)
+
+        return self.get(endpoint, id)
+
+    def delete(self, endpoint, id):
+        with self.lock:
+            if not self.exists(endpoint, id):
+                return False
+
+            self.deleted[endpoint].add(id)
+
+        return True
+
+    def find_mission(self, name):
+        match = re.match(r'^mission-(\d+)$', name)
+
+        if (match is not None) and self.exists('missions', int(match.group(1))):
+            return int(match.group(1))
+
+        for id, fields in self.created['missions'].items():
+            if (fields.get('name') == name) and self.exists('missions', id):
+                return id
+
+        return None
+
+
+class JWT:
+    """
+    HS256 JSON Web Tokens carrying the same claims as the ones of the SMERSH backend.
+    """
+
+    def __init__(self, secret, ttl):
+        self.secret = secret
+        self.ttl = ttl
+
+    @staticmethod
+    def _encode(data):
+        return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+    @staticmethod
+    def _decode(data):
+        return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+    def _sign(self, message):
+        return self._encode(hmac.new(self.secret, message.encode(), hashlib.sha256).digest())
+
+    def create(self, username, user_iri, roles):
+        now = int(time.time())
+        header = self._encode(json.dumps({'typ': 'JWT', 'alg': 'HS256'}).encode())
+        claims = self._encode(json.dumps({
+            'iat': now,
+            'exp': now + self.ttl,
+            'roles': roles,
+            'username': username,
+            'user': user_iri
+        }).encode())
+
+        return f'{header}.{claims}.{self._sign(f"{header}.{claims}")}'
+
+    def check(self, token):
+        """
+        Return None if the token is valid or the error message of the backend otherwise.
+        """
+
+        try:
+            header, claims, signature = token.split('.')
+            valid = hmac.compare_digest(signature, self._sign(f'{header}.{claims}'))
+            expired = json.loads(self._decode(claims))['exp'] <= time.time()
+        except (ValueError, KeyError):
+            return 'Invalid JWT Token'
+
+        if not valid:
+            return 'Invalid JWT Token'
+
+        if expired:
+            return 'Expired JWT Token'
+
+        return None
+
+
+class FakeSmershServer(ThreadingHTTPServer):
+    """
+    A stand-in for the SMERSH API serving a Dataset: Hydra collections with pagination, items, writes, JWT
+    authentication and hosts uploads. Every response can be delayed by `latency` seconds (plus or minus a random
+    `jitter`) and answered with one of `error_statuses` with an `error_rate` probability.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, dataset, password='admin', token_ttl=3600, latency=0.0, jitter=0.0, error_rate=0.0,
+                 error_statuses=(503,), retry_after=1):
+        super().__init__(address, FakeSmershRequestHandler)
+
+        self.dataset = dataset
+        self.password = password
+        self.jwt = JWT(hashlib.sha256(f'{dataset.seed}'.encode()).digest(), token_ttl)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.retry_after = retry_after
+
+        self.requests_count = 0
+        self.errors_count = 0
+        self.uploaded_hosts_count = 0
+        self.counters_lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+        return self.url
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def increment(self, name, n=1):
+        with self.counters_lock:
+            setattr(self, name, getattr(self, name) + n)
+
+
+class FakeSmershRequestHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    # The headers and the body are written separately, Nagle's algorithm would delay the body of every response
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, data, status=200, headers=None):
+        body = json.dumps(data).encode()
+        etag = '"{}"'.format(hashlib.sha1(body).hexdigest())
+
+        if (status == 200) and (self.headers.get('If-None-Match') == etag):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/ld+json; charset=utf-8')
+
+        if status == 200:
+            self.send_header('ETag', etag)
+
+        for name, value in ({} if headers is None else headers).items():
+            self.send_header(name, value)
+
+        if (len(body) >= GZIP_THRESHOLD) and ('gzip' in self.headers.get('Accept-Encoding', '')):
+            body = gzip.compress(body, compresslevel=1)
+            self.send_header('Content-Encoding', 'gzip')
+
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, description):
+        if status == 401:
+            self.send_json({'code': 401, 'message': description}, status)
+        else:
+            self.send_json({'@type': 'hydra:Error', 'hydra:title': 'An error occurred',
+                            'hydra:description': description}, status)
+
+    def send_no_content(self):
+        self.send_response(204)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def read_body(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+
+        return body
+
+    def read_json(self):
+        try:
+            return json.loads(self.read_body() or b'{}')
+        except ValueError:
+            return None
+
+    def handle_request(self, method):
+        server = self.server
+        server.increment('requests_count')
+
+        if server.latency > 0:
+            time.sleep(max(0.0, server.latency + random.uniform(-server.jitter, server.jitter)))
+
+        if random.random() < server.error_rate:
+            # The request body must still be consumed to keep the connection usable
+            self.read_body()
+            server.increment('errors_count')
+            status = random.choice(server.error_statuses)
+            headers = {'Retry-After': str(server.retry_after)} if status in (429, 503) else None
+
+            return self.send_json({'@type': 'hydra:Error', 'hydra:description': 'Injected error'}, status, headers)
+
+        url = urlsplit(self.path)
+
+        if url.path == AUTHENTICATION_PATH:
+            if method != 'POST':
+                return self.send_error_json(405, 'Method not allowed')
+
+            return self.authenticate()
+
+        error = self.check_authorization()
+
+        if error is not None:
+            self.read_body()
+            return self.send_error_json(401, error)
+
+        if url.path == UPLOAD_PATH:
+            if method != 'POST':
+                return self.send_error_json(405, 'Method not allowed')
+
+            return self.upload_hosts()
+
+        parts = url.path[len(API_ROOT) + 1:].split('/') if url.path.startswith(API_ROOT + '/') else []
+
+        if (len(parts) == 0) or (parts[0] not in server.dataset.generators) or (len(parts) > 2):
+            self.read_body()
+            return self.send_error_json(404, 'Not Found')
+
+        endpoint = parts[0]
+
+        if len(parts) == 1:
+            if method == 'GET':
+                return self.get_collection(endpoint, parse_qs(url.query))
+
+            if method == 'POST':
+                return self.create(endpoint)
+
+            return self.send_error_json(405, 'Method not allowed')
+
+        try:
+            id = int(parts[1])
+        except ValueError:
+            self.read_body()
+            return self.send_error_json(404, 'Not Found')
+
+        if method == 'GET':
+            return self.get_item(endpoint, id, parse_qs(url.query))
+
+        if method in ('PUT', 'PATCH'):
+            return self.update(endpoint, id, replace=(method == 'PUT'))
+
+        if method == 'DELETE':
+            if server.dataset.delete(endpoint, id):
+                return self.send_no_content()
+
+            return self.send_error_json(404, 'Not Found')
+
+        self.send_error_json(405, 'Method not allowed')
+
+    def check_authorization(self):
+        authorization = self.headers.get('Authorization', '')
+
+        if not authorization.startswith('Bearer '):
+            return 'JWT Token not found'
+
+        return self.server.jwt.check(authorization[len('Bearer '):])
+
+    def authenticate(self):
+        credentials = self.read_json() or {}
+        dataset = self.server.dataset
+
+        if (credentials.get('username') != dataset.username) or (credentials.get('password') != self.server.password):
+            return self.send_error_json(401, 'Invalid credentials.')
+
+        user = dataset.get('users', 1)
+        token = self.server.jwt.create(user['username'], user['@id'], user['roles'])
+        self.send_json({'token': token})
+
+    def get_collection(self, endpoint, query):
+        dataset = self.server.dataset
+
+        try:
+            page = max(1, int(query.get('page', ['1'])[0]))
+            items_per_page = min(MAX_ITEMS_PER_PAGE, max(1, int(query.get('itemsPerPage', [ITEMS_PER_PAGE])[0])))
+        except ValueError:
+            return self.send_error_json(400, 'Invalid pagination parameters')
+
+        filters, ordering = get_filters(query)
+
+        if (len(filters) > 0) or (len(ordering) > 0):
+            items = dataset.select(endpoint, filters, ordering)
+            total = len(items)
+            members = items[(page - 1) * items_per_page:page * items_per_page]
+        else:
+            total = dataset.count(endpoint)
+            members = dataset.get_page(endpoint, page, items_per_page)
+
+        last_page = max(1, -(-total // items_per_page))
+        collection_iri = f'{API_ROOT}/{endpoint}'
+
+        # The other parameters, like the properties, are kept in the links to the other pages
+        parameters = [(k, v) for k, values in query.items() if k not in ('page', 'itemsPerPage') for v in values]
+
+        if items_per_page != ITEMS_PER_PAGE:
+            parameters.insert(0, ('itemsPerPage', items_per_page))
+
+        def page_iri(n):
+            return f'{collection_iri}?{urlencode([("page", n)] + parameters)}'
+
+        view = {
+            '@id': page_iri(page),
+            '@type': 'hydra:PartialCollectionView',
+            'hydra:first': page_iri(1),
+            'hydra:last': page_iri(last_page)
+        }
+
+        if page > 1:
+            view['hydra:previous'] = page_iri(page - 1)
+
+        if page < last_page:
+            view['hydra:next'] = page_iri(page + 1)
+
+        self.send_json({
+            '@context': f'{API_ROOT}/contexts/{endpoint}',
+            '@id': collection_iri,
+            '@type': 'hydra:Collection',
+            'hydra:member': [project(e, query) for e in members],
+            'hydra:totalItems': total,
+            'hydra:view': view
+        })
+
+    def get_item(self, endpoint, id, query):
+        item = self.server.dataset.get(endpoint, id)
+
+        if item is None:
+            return self.send_error_json(404, 'Not Found')
+
+        self.send_json(dict({'@context': f'{API_ROOT}/contexts/{endpoint}'}, **project(item, query)))
+
+    def create(self, endpoint):
+        data = self.read_json()
+
+        if type(data) != dict:
+            return self.send_error_json(400, 'Syntax error')
+
+        self.send_json(self.server.dataset.create(endpoint, data), 201)
+
+    def update(self, endpoint, id, replace=False):
+        data = self.read_json()
+
+        if type(data) != dict:
+            return self.send_error_json(400, 'Syntax error')
+
+        item = self.server.dataset.update(endpoint, id, data, replace=replace)
+
+        if item is None:
+            return self.send_error_json(404, 'Not Found')
+
+        self.send_json(item)
+
+    def upload_hosts(self):
+        body = self.read_body()
+        message = email.parser.BytesParser().parsebytes(
+            b'Content-Type: ' + self.headers.get('Content-Type', '').encode() + b'\r\n\r\n' + body)
+
+        if not message.is_multipart():
+            return self.send_error_json(400, 'A multipart body is expected')
+
+        fields = {part.get_param('name', header='Content-Disposition'): part.get_payload(decode=True)
+                  for part in message.get_payload()}
+        mission_name = (fields.get('missionName') or b'').decode()
+        hosts_data = fields.get('filename')
+
+        if hosts_data is None:
+            return self.send_error_json(400, 'The hosts file is missing')
+
+        if self.server.dataset.find_mission(mission_name) is None:
+            return self.send_error_json(400, f'The mission {mission_name} does not exist')
+
+        rejected_domains = []
+        count = 0
+
+        for line in hosts_data.splitlines():
+            host = line.strip().lower()
+
+            if len(host) == 0:
+                continue
+
+            if HOST_REGEX.match(host):
+                count += 1
+            else:
+                rejected_domains.append(line.decode(errors='replace'))
+
+        self.server.increment('uploaded_hosts_count', count)
+        self.send_json({'rejected_domains': rejected_domains})
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def do_PUT(self):
+        self.handle_request('PUT')
+
+    def do_PATCH(self):
+        self.handle_request('PATCH')
+
+    def do_DELETE(self):
+        self.handle_request('DELETE')
+
+
+def add_server_arguments(parser):
+    group = parser.add_argument_group('fake server')
+
+    for endpoint, count in DEFAULT_SCALE.items():
+        group.add_argument(f'--{endpoint.replace("_", "-")}', dest=f'scale_{endpoint}', type=int, default=count,
+                           help=f'The number of {endpoint.replace("_", " ")} (default: {count})')
+
+    group.add_argument('--seed', type=int, default=0, help='The seed of the generated data')
+    group.add_argument('--username', default='admin', help='The username accepted by the server')
+    group.add_argument('--password', default='admin', help='The password accepted by the server')
+    group.add_argument('--token-ttl', type=int, default=3600, help='The lifetime of the tokens, in seconds')
+    group.add_argument('--latency', type=float, default=0.0, help='The delay added to every response, in seconds')
+    group.add_argument('--jitter', type=float, default=0.0, help='The random variation of the latency, in seconds')
+    group.add_argument('--error-rate', type=float, default=0.0,
+                       help='The probability for a request to be answered with an error')
+    group.add_argument('--error-status', dest='error_statuses', type=int, action='append',
+                       help='The status of the injected errors, can be repeated (default: 503)')
+    group.add_argument('--retry-after', type=int, default=1,
+                       help='The Retry-After header of the injected 429 and 503 errors, in seconds')
+
+
+def create_server(args, address=('127.0.0.1', 0)):
+    scale = {endpoint: getattr(args, f'scale_{endpoint}') for endpoint in DEFAULT_SCALE}
+    dataset = Dataset(scale, seed=args.seed, username=args.username)
+
+    return FakeSmershServer(address, dataset, password=args.password, token_ttl=args.token_ttl,
+                            latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                            error_statuses=tuple(args.error_statuses or (503,)), retry_after=args.retry_after)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='A stand-in for the SMERSH API serving synthetic data')
+    parser.add_argument('--host', default='127.0.0.1', help='The address to listen on')
+    parser.add_argument('--port', type=int, default=8000, help='The port to listen on')
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = create_server(args, (args.host, args.port))
+    print(f'Serving on {server.url} (username: {args.username}, password: {args.password})')
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+import argparse
+import json
+import time
+
+from smersh_cli.utils.serialization import JSON_BACKENDS
+
+from .clean_ldjson import create_collection
+from .fake_server import DEFAULT_SCALE
+
+EDGE_CASES = [
+    {},
+    [],
+    {'empty': {}, 'list': [[], [{}], [[[]]]]},
+    {'unicode': 'éàç ñ 日本語 😀', 'escaped': '"quoted" \\ back\\slash / slash \t\n\r\b\f \u0000 \u001f  '},
+    {'ints': [0, 1, -1, 2 ** 31, -2 ** 31, 2 ** 53 + 1, 2 ** 63 - 1, -2 ** 63]},
+    {'floats': [0.0, -0.0, 0.1, 1.5, -2.25, 1e-07, 1.7976931348623157e+308, 5e-324, 123456789.123456789]},
+    {'constants': [True, False, None]},
+    {'long': 'x' * 100000},
+    {'@id': '/api/hosts/1', '@type': 'Host', 'hydra:member': ['/api/host_vulns/1'], 'camelCase': None},
+    {'deep': [[[[[[[[[[[[[[[[[[[[{'a': [1, {'b': [2, {'c': 3}]}]}]]]]]]]]]]]]]]]]]]]]}
+]
+
+# Written by hand as the backends never produce them: indentation, escaped characters and surrogate pairs
+RAW_DOCUMENTS = [
+    b'{\n  "a" : [ 1 , 2.5e3 , -0 ] ,\n  "b" : "\\u00e9\\ud83d\\ude00\\/\\"" \n}',
+    b'[{"id":1},{"id":"\\/api\\/hosts\\/2"}]',
+    '{"name": "hôte"}'.encode()
+]
+
+INVALID_DOCUMENTS = [b'', b'{', b'[1,]', b'nul', b'{"a" 1}', b'"unterminated']
+
+
+def check_parity(backends, documents):
+    errors = []
+
+    for document in documents:
+        for encoder in backends:
+            encoded = encoder.dumps(document)
+
+            for decoder in backends:
+                if decoder.loads(encoded) != document:
+                    errors.append(f'{decoder.name} does not decode what {encoder.name} encoded')
+
+    for document in RAW_DOCUMENTS:
+        expected = json.loads(document)
+
+        for backend in backends:
+            if backend.loads(document) != expected:
+                errors.append(f'{backend.name} decodes {document!r} differently')
+
+    for document in INVALID_DOCUMENTS:
+        for backend in backends:
+            try:
+                backend.loads(document)
+                errors.append(f'{backend.name} accepts the invalid document {document!r}')
+            except backend.DecodeError:
+                pass
+
+    return errors
+
+
+def measure(function, data, repeat):
+    durations = []
+
+    for __ in range(repeat):
+        start = time.perf_counter()
+        function(data)
+        durations.append(time.perf_counter() - start)
+
+    return min(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the installed JSON backends give the same results and compare '
+                                                 'their speed')
+    parser.add_argument('-s', '--size', type=int, default=10000, help='The number of hosts of the timed collection')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='Keep the best time of this many runs')
+    args = parser.parse_args()
+
+    backends = [backend() for backend in JSON_BACKENDS.values() if backend.available]
+    print(f'Installed backends: {", ".join(backend.name for backend in backends)}')
+
+    documents = EDGE_CASES + [create_collection(endpoint, 100) for endpoint in DEFAULT_SCALE]
+    errors = check_parity(backends, documents)
+
+    for error in errors:
+        print(f'ERROR: {error}')
+
+    if len(errors) > 0:
+        raise SystemExit(1)
+
+    print(f'The backends agree on {len(documents) + len(RAW_DOCUMENTS) + len(INVALID_DOCUMENTS)} documents')
+
+    data = create_collection('hosts', args.size)
+    encoded = json.dumps(data).encode()
+
+    for backend in backends:
+        loads_duration = measure(backend.loads, encoded, args.repeat)
+        dumps_duration = measure(backend.dumps, data, args.repeat)
+
+        print(f'{backend.name:>8}: loads {loads_duration * 1000:7.1f} ms, dumps {dumps_duration * 1000:7.1f} ms '
+              f'({len(encoded) / 1024 / 1024:.1f} MiB)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+from rich.console import Console
+from rich.table import Table
+
+from smersh_cli.__main__ import App
+from smersh_cli.api import SmershAPI
+from smersh_cli.models import Host, HostVuln, Mission
+from smersh_cli.stats import Histogram, stats
+from smersh_cli.utils.ratelimit import AdaptiveRateLimiter
+from smersh_cli.utils.retry import RetryPolicy
+
+from .fake_server import add_server_arguments, create_server
+
+
+class Scenarios:
+    """
+    The operations of the load test. Each one runs a client operation or an App command against the server and is
+    chosen by its name on the command line.
+    """
+
+    def __init__(self, api, scale, upload_size):
+        self.api = api
+        self.scale = scale
+        self.upload_size = upload_size
+        self.local = threading.local()
+
+    @property
+    def app(self):
+        # cmd2 keeps some state per instance, so each worker thread drives its own App
+        if not hasattr(self.local, 'app'):
+            self.local.app = App(self.api)
+            self.local.app.console = Console(file=open(os.devnull, 'w'))
+
+        return self.local.app
+
+    def random_id(self, endpoint):
+        return random.randint(1, self.scale[endpoint])
+
+    def run(self, name):
+        return getattr(self, name.replace('-', '_'))()
+
+    def get_host(self):
+        Host.get(self.api, self.random_id('hosts'))
+
+    def get_host_vuln(self):
+        HostVuln.get(self.api, self.random_id('host_vulns'))
+
+    def get_many_hosts(self):
+        __, errors = Host.get_many(self.api, [self.random_id('hosts') for __ in range(20)])
+
+        if len(errors) > 0:
+            raise errors[0][1]
+
+    def get_page(self):
+        page = random.randint(1, max(1, self.scale['hosts'] // 30))
+        self.api.get(f'/api/hosts?page={page}')
+
+    def list_missions(self):
+        Mission.all(self.api)
+
+    def show_host(self):
+        self.app.onecmd_plus_hooks(f'show host {self.random_id("hosts")}')
+
+    def show_missions(self):
+        self.app.onecmd_plus_hooks('show mission')
+
+    def show_mission(self):
+        self.app.onecmd_plus_hooks(f'show mission {self.random_id("missions")}')
+
+    def upload_hosts(self):
+        mission_id = self.random_id('missions')
+
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as outf:
+            for i in range(self.upload_size):
+                outf.write(f'upload-{i}.mission-{mission_id}.example.com\n')
+
+        try:
+            self.api.upload_hosts(outf.name, Mission(id=str(mission_id), name=f'mission-{mission_id}'), resume=False)
+        finally:
+            os.remove(outf.name)
+
+
+SCENARIOS = [name.replace('_', '-') for name in vars(Scenarios)
+             if not name.startswith('_') and name not in ('app', 'random_id', 'run')]
+
+
+class LoadGenerator:
+    """
+    Run the scenarios from `concurrency` threads, until `duration` seconds elapsed or `operations` operations were
+    run, and measure the latency of every operation.
+    """
+
+    def __init__(self, scenarios, names, concurrency, duration=None, operations=None):
+        self.scenarios = scenarios
+        self.names = names
+        self.concurrency = concurrency
+        self.duration = duration
+        self.operations = operations
+
+        self.latencies = {name: Histogram() for name in names}
+        self.errors = {name: 0 for name in names}
+        self.started_operations = 0
+        self.lock = threading.Lock()
+        self.elapsed = None
+
+    def next_operation(self, deadline):
+        with self.lock:
+            if (self.operations is not None) and (self.started_operations >= self.operations):
+                return None
+
+            if (deadline is not None) and (time.perf_counter() >= deadline):
+                return None
+
+            name = self.names[self.started_operations % len(self.names)]
+            self.started_operations += 1
+
+            return name
+
+    def work(self, deadline):
+        while True:
+            name = self.next_operation(deadline)
+
+            if name is None:
+                return
+
+            start = time.perf_counter()
+            failed = False
+
+            try:
+                self.scenarios.run(name)
+            except Exception:
+                failed = True
+
+            duration = time.perf_counter() - start
+
+            with self.lock:
+                self.latencies[name].add(duration)
+
+                if failed:
+                    self.errors[name] += 1
+
+    def run(self):
+        start = time.perf_counter()
+        deadline = None if self.duration is None else start + self.duration
+        threads = [threading.Thread(target=self.work, args=(deadline,)) for __ in range(self.concurrency)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.elapsed = time.perf_counter() - start
+
+    def to_dict(self):
+        return {
+            'elapsed': self.elapsed,
+            'concurrency': self.concurrency,
+            'scenarios': {
+                name: dict(self.latencies[name].to_dict(), errors=self.errors[name],
+                           throughput=self.latencies[name].count / self.elapsed)
+                for name in self.names
+            }
+        }
+
+
+def format_ms(seconds):
+    return '-' if seconds is None else f'{seconds * 1000:.1f}'
+
+
+def print_report(console, report, requests_stats, server):
+    table = Table(title=f'{report["elapsed"]:.1f}s with {report["concurrency"]} workers')
+
+    for column in ('Scenario', 'Operations', 'Errors', 'Ops/s', 'p50 (ms)', 'p95 (ms)', 'p99 (ms)'):
+        table.add_column(column, justify='left' if column == 'Scenario' else 'right')
+
+    for name, data in report['scenarios'].items():
+        table.add_row(name, str(data['count']), str(data['errors']), f'{data["throughput"]:.1f}',
+                      format_ms(data['p50']), format_ms(data['p95']), format_ms(data['p99']))
+
+    console.print(table)
+
+    endpoints = requests_stats['endpoints']
+    requests_count = sum(sum(e['status_codes'].values()) + e['errors'] for e in endpoints)
+    retries = sum(e['retries'] for e in endpoints)
+    received = sum(e['received_wire_bytes'] for e in endpoints)
+
+    console.print(f'HTTP requests: {requests_count} ({requests_count / report["elapsed"]:.1f}/s), '
+                  f'retries: {retries}, received: {received / 1024 / 1024:.1f} MiB')
+
+    if server is not None:
+        console.print(f'Server: {server.requests_count} requests, {server.errors_count} injected errors')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the throughput and the latency of the SMERSH client')
+    parser.add_argument('scenarios', nargs='*', default=['get-host', 'get-many-hosts', 'get-page', 'show-host'],
+                        choices=SCENARIOS, help='The operations to run, in turn (default: %(default)s)')
+    parser.add_argument('--url', help='The URL of a SMERSH server to use instead of starting a fake one. The fake '
+                                      'server options then only describe its data')
+    parser.add_argument('-c', '--concurrency', type=int, default=8, help='The number of concurrent workers')
+    parser.add_argument('-d', '--duration', type=float, default=10.0, help='How long to run the load test (seconds)')
+    parser.add_argument('-n', '--operations', type=int, help='Stop after this many operations instead')
+    parser.add_argument('--pool-size', type=int, help='The connection pool size (default: the concurrency)')
+    parser.add_argument('--max-retries', type=int, default=RetryPolicy.DEFAULT_MAX_RETRIES)
+    parser.add_argument('--rate-limit', type=float, default=AdaptiveRateLimiter.DEFAULT_RATE,
+                        help='The initial number of requests per second of the client (default: %(default)s)')
+    parser.add_argument('--upload-size', type=int, default=10000, help='The number of hosts of the uploaded files')
+    parser.add_argument('-j', '--json', dest='json_path', help='Also write the report to this file')
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    console = Console()
+    server = None
+
+    if args.url is None:
+        server = create_server(args)
+        url = server.start()
+    else:
+        url = args.url
+
+    pool_size = args.concurrency if args.pool_size is None else args.pool_size
+    rate_limiter = AdaptiveRateLimiter(rate=args.rate_limit, max_concurrency=pool_size)
+    api = SmershAPI(url, pool_size=pool_size, retry_policy=RetryPolicy(max_retries=args.max_retries),
+                    rate_limiter=rate_limiter)
+
+    try:
+        if not api.authenticate(args.username, args.password):
+            console.print('[red]Unable to log in')
+            return
+
+        scale = {endpoint[len('scale_'):]: value for endpoint, value in vars(args).items()
+                 if endpoint.startswith('scale_')}
+        scenarios = Scenarios(api, scale, args.upload_size)
+        load_generator = LoadGenerator(scenarios, args.scenarios, args.concurrency,
+                                       duration=None if args.operations is not None else args.duration,
+                                       operations=args.operations)
+
+        stats.reset()
+        load_generator.run()
+
+        report = load_generator.to_dict()
+        report['requests'] = stats.to_dict()
+        print_report(console, report, report['requests'], server)
+
+        if args.json_path is not None:
+            with open(args.json_path, 'w') as outf:
+                json.dump(report, outf, indent=2)
+    finally:
+        api.close()
+
+        if server is not None:
+            server.stop()
+
+
+if __name__ == '__main__':
+    main()
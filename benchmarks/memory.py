@@ -0,0 +1,86 @@
+import argparse
+import gc
+import json
+import tracemalloc
+from dataclasses import MISSING, field, fields, make_dataclass
+
+from smersh_cli.models import MODELS, get_codec
+from smersh_cli.utils.json import clean_ldjson
+
+from .clean_ldjson import create_collection
+
+
+def create_reference_classes():
+    # The previous models: a __dict__ per object, and stubs holding every field
+    reference_classes = {}
+
+    for endpoint, cls in MODELS.items():
+        reference_fields = []
+
+        for f in fields(cls):
+            if f.default_factory is not MISSING:
+                reference_fields.append((f.name, f.type, field(default_factory=f.default_factory)))
+            elif f.name == 'id':
+                reference_fields.append((f.name, f.type))
+            else:
+                reference_fields.append((f.name, f.type, field(default=f.default)))
+
+        reference_classes[cls] = make_dataclass(f'Reference{cls.__name__}', reference_fields)
+
+    return reference_classes
+
+
+def reference_decode(reference_classes, cls, kvs):
+    reference_cls = reference_classes[cls]
+    kwargs = {}
+
+    for f, is_list, target_codec in get_codec(cls).fields:
+        if f.name not in kvs:
+            continue
+
+        value = kvs[f.name]
+
+        if target_codec is not None:
+            target_cls = reference_classes[target_codec.cls]
+
+            if is_list:
+                value = [target_cls(id=e) if type(e) == str else e for e in value]
+            elif type(value) == str:
+                value = target_cls(id=value)
+
+        kwargs[f.name] = value
+
+    return reference_cls(**kwargs)
+
+
+def measure(function, items):
+    gc.collect()
+    tracemalloc.start()
+    objects = [function(e) for e in items]
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return size, objects
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the memory used by the slotted models with the previous '
+                                                 'ones, stubs included')
+    parser.add_argument('-e', '--endpoint', default='hosts', help='The kind of objects to materialize')
+    parser.add_argument('-s', '--size', type=int, default=100000, help='The number of objects to materialize')
+    args = parser.parse_args()
+
+    cls = MODELS[args.endpoint]
+    reference_classes = create_reference_classes()
+    items = clean_ldjson(json.loads(json.dumps(create_collection(args.endpoint, args.size))))
+
+    reference_size, reference_objects = measure(lambda e: reference_decode(reference_classes, cls, e), items)
+    del reference_objects
+    size, objects = measure(cls.from_dict, items)
+
+    print(f'{args.size} {args.endpoint} with their stubs: reference {reference_size / args.size:.0f} bytes per object, '
+          f'slotted {size / args.size:.0f} bytes per object ({reference_size / size:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+import argparse
+import json
+import time
+from typing import get_type_hints
+
+from smersh_cli.models import MODELS, Model, get_innermost_field, is_list, is_model
+from smersh_cli.utils.case import camel_case
+from smersh_cli.utils.json import clean_ldjson
+
+from .clean_ldjson import create_collection
+
+
+def reference_convert_keys_case(data, case_function):
+    converted = {}
+
+    for k, v in data.items():
+        if type(v) == dict:
+            v = reference_convert_keys_case(v, case_function)
+
+        converted[case_function(k)] = v
+
+    return converted
+
+
+def reference_wrap_id(data):
+    if type(data) == list:
+        return [{'id': e} for e in data]
+
+    return {'id': data}
+
+
+def reference_from_dict(cls, kvs):
+    # The previous decoding: type hints inspected for every object, then decoded by dataclasses_json
+    lazy_keys = set()
+
+    for field_name, field_type in get_type_hints(cls).items():
+        if (field_name in kvs) and is_model(field_type):
+            value = kvs[field_name]
+            value_type = type(value)
+
+            if ((value_type == list) and (len(value) > 0) and (type(value[0]) == str)) or (value_type == str):
+                lazy_keys.add(field_name)
+
+    return cls.from_dict_not_lazy({k: reference_wrap_id(v) if k in lazy_keys else v for k, v in kvs.items()})
+
+
+def reference_export_field(field_type, field_value):
+    if is_list(field_type):
+        item_type = get_innermost_field(field_type)
+        return [reference_export_field(item_type, e) for e in field_value]
+    elif is_model(field_type):
+        if issubclass(field_value.__class__, Model):
+            return field_value.iri
+
+        return get_innermost_field(field_type)(id=field_value).iri
+
+    return field_value
+
+
+def reference_encode(o):
+    data = {}
+
+    for field_name, field_type in get_type_hints(o.__class__).items():
+        data[field_name] = reference_export_field(field_type, getattr(o, field_name))
+
+    return reference_convert_keys_case(data, camel_case)
+
+
+def measure(function, items):
+    start = time.perf_counter()
+    results = [function(e) for e in items]
+
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the model codecs with the previous, reflective conversion')
+    parser.add_argument('-e', '--endpoint', default='hosts', help='The kind of objects to materialize')
+    parser.add_argument('-s', '--size', type=int, default=100000, help='The number of objects to materialize')
+    parser.add_argument('--reference-size', type=int, default=5000,
+                        help='The number of objects converted the previous way, which is much slower')
+    args = parser.parse_args()
+
+    cls = MODELS[args.endpoint]
+    items = clean_ldjson(json.loads(json.dumps(create_collection(args.endpoint, args.size))))
+    reference_items = items[:args.reference_size]
+
+    decode_duration, objects = measure(cls.from_dict, items)
+    reference_decode_duration, reference_objects = measure(lambda e: reference_from_dict(cls, e), reference_items)
+
+    if objects[:len(reference_objects)] != reference_objects:
+        raise SystemExit('The decoded objects differ')
+
+    encode_duration, encoded = measure(lambda o: o.encode(), objects)
+    reference_encode_duration, reference_encoded = measure(reference_encode, reference_objects)
+
+    if encoded[:len(reference_encoded)] != reference_encoded:
+        raise SystemExit('The encoded objects differ')
+
+    for name, duration, reference_duration in (('decode', decode_duration, reference_decode_duration),
+                                               ('encode', encode_duration, reference_encode_duration)):
+        per_object = duration / len(items) * 1e6
+        reference_per_object = reference_duration / len(reference_items) * 1e6
+
+        print(f'{name} {len(items)} {args.endpoint}: {duration * 1000:.0f} ms ({per_object:.1f} µs per object), '
+              f'reference {reference_per_object:.1f} µs per object ({reference_per_object / per_object:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
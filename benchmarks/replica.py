@@ -0,0 +1,87 @@
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from smersh_cli.api import SmershAPI
+from smersh_cli.models import Host
+from smersh_cli.replica import Replica
+from smersh_cli.stats import stats
+
+from .fake_server import add_server_arguments, create_server
+
+
+def get_received_bytes():
+    return sum(e['received_bytes'] for e in stats.to_dict()['endpoints'])
+
+
+def sync(api, replica, server, endpoints):
+    requests_count = server.requests_count
+    received = get_received_bytes()
+    start = time.perf_counter()
+    results = replica.sync(api, endpoints)
+    duration = time.perf_counter() - start
+
+    objects = sum(result.objects for result in results.values())
+    received = get_received_bytes() - received
+
+    return duration, server.requests_count - requests_count, received, objects
+
+
+def measure_gets(api, ids):
+    durations = []
+
+    for id in ids:
+        # Every read goes to the server or to the replica, not to the objects of the session
+        api.identity_map.clear()
+
+        start = time.perf_counter()
+        Host.get(api, id)
+        durations.append(time.perf_counter() - start)
+
+    return statistics.median(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the synchronization of the local replica and compare the '
+                                                 'reads from the replica with the reads from the server')
+    parser.add_argument('-n', '--reads', type=int, default=200, help='The number of hosts read')
+    parser.add_argument('-m', '--modified', type=int, default=10, help='The number of hosts modified between syncs')
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = create_server(args)
+    url = server.start()
+    endpoints = ['missions', 'hosts', 'host_vulns']
+
+    with tempfile.TemporaryDirectory() as directory:
+        replica = Replica(os.path.join(directory, 'replica.sqlite3'))
+
+        try:
+            api = SmershAPI(url, replica=replica)
+            api.authenticate(args.username, args.password)
+            ids = range(1, min(args.reads, args.scale_hosts) + 1)
+            network = measure_gets(api, ids)
+
+            for name in ('full sync', 'unchanged', 'modified'):
+                if name == 'modified':
+                    # The objects modified by someone else, at the end of the collection
+                    for id in range(args.scale_hosts - args.modified + 1, args.scale_hosts + 1):
+                        server.dataset.update('hosts', id, {'checked': True})
+
+                duration, requests_count, received, objects = sync(api, replica, server, endpoints)
+                print(f'{name:>10}: {duration:.2f} s, {requests_count} requests, {received / 1024:.0f} KiB received, '
+                      f'{objects} objects updated')
+
+            local = measure_gets(api, ids)
+            print(f'Host.get: server {network * 1000:.2f} ms, replica {local * 1000:.3f} ms '
+                  f'({network / local:.0f}x)')
+            api.close()
+        finally:
+            replica.close()
+            server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from smersh_cli.api import SmershAPI
+from smersh_cli.models import MODELS, Model
+from smersh_cli.search import ENDPOINTS, INDEXED_FIELDS, SearchIndex
+from smersh_cli.utils.case import camel_case
+
+from .fake_server import add_server_arguments, create_server
+
+QUERIES = ['nginx', 'vulnerability 42', 'remed', 'host 1234 example']
+
+
+def download(api):
+    # The documents a client without index would have to scan
+    documents = []
+
+    for endpoint in ENDPOINTS:
+        path = f'{Model.API_ROOT}/{endpoint}{MODELS[endpoint].get_projection(INDEXED_FIELDS[endpoint])}'
+
+        for e in api.iter_collection(path):
+            values = [e.get(camel_case(name)) for name in INDEXED_FIELDS[endpoint]]
+            documents.append(' '.join('' if value is None else str(value) for value in values).lower())
+
+    return documents
+
+
+def scan(documents, text):
+    words = text.lower().split()
+
+    return [e for e in documents if all(word in e for word in words)]
+
+
+def measure(function, repeat):
+    durations = []
+
+    for __ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+
+    return statistics.median(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the indexing of the searched objects and compare the queries '
+                                                 'of the full-text index with a scan of the downloaded objects')
+    parser.add_argument('-r', '--repeat', type=int, default=20, help='The number of times each query is run')
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = create_server(args)
+    url = server.start()
+
+    with tempfile.TemporaryDirectory() as directory:
+        search_index = SearchIndex(os.path.join(directory, 'search.sqlite3'))
+
+        try:
+            api = SmershAPI(url, search_index=search_index)
+            api.authenticate(args.username, args.password)
+
+            start = time.perf_counter()
+            count = search_index.update(api)
+            print(f'indexing: {count} objects in {time.perf_counter() - start:.2f} s')
+
+            start = time.perf_counter()
+            count = search_index.update(api)
+            print(f'  update: {count} unchanged objects in {time.perf_counter() - start:.2f} s')
+
+            documents = download(api)
+
+            for query in QUERIES:
+                hits = search_index.search(query)
+                indexed = measure(lambda: search_index.search(query), args.repeat)
+                scanned = measure(lambda: scan(documents, query), args.repeat)
+                print(f'{query!r:>20}: {len(hits)} hits, index {indexed * 1000:.2f} ms, scan {scanned * 1000:.2f} ms '
+                      f'({scanned / indexed:.0f}x)')
+
+            api.close()
+        finally:
+            search_index.close()
+            server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+import argparse
+import time
+
+from smersh_cli.api import SmershAPI
+from smersh_cli.models import Host, HostVuln, Impact, Mission, Vuln
+from smersh_cli.unit_of_work import UnitOfWork
+from smersh_cli.utils.ratelimit import AdaptiveRateLimiter
+
+from .fake_server import add_server_arguments, create_server
+
+
+def create_mission(size, vulns_per_host):
+    # A new mission with its hosts and their vulnerabilities, the hosts and the mission referencing each other
+    mission = Mission(id=None, name=f'mission-{size}-hosts', start_date='2021-01-01T00:00:00+00:00',
+                      end_date='2021-02-01T00:00:00+00:00')
+    host_vulns = []
+
+    for i in range(size):
+        host = Host(id=None, name=f'host-{i}.example.com', mission=mission)
+        mission.hosts.append(host)
+
+        for j in range(vulns_per_host):
+            host_vuln = HostVuln(id=None, host=host, vuln=Vuln(id=str(j + 1)), impact=Impact(id='1'),
+                                 current_state='TODO')
+            host.host_vulns.append(host_vuln)
+            host_vulns.append(host_vuln)
+
+    return mission, host_vulns
+
+
+def save_serially(api, mission, host_vulns):
+    # What a script had to do: save each object in turn, in the right order, without the references to objects
+    # which don't exist yet, then save again the objects referencing the ones created after them
+    hosts = mission.hosts
+    mission.hosts = []
+    mission.save(api)
+
+    for host in hosts:
+        vulns = host.host_vulns
+        host.host_vulns = []
+        host.save(api)
+        host.host_vulns = vulns
+
+    for host_vuln in host_vulns:
+        host_vuln.save(api)
+
+    mission.hosts = hosts
+    mission.save(api)
+
+    for host in hosts:
+        host.save(api)
+
+
+def save_with_unit_of_work(api, mission, __):
+    unit_of_work = UnitOfWork(api)
+    unit_of_work.add(mission)
+
+    errors = unit_of_work.flush()
+
+    if len(errors) > 0:
+        raise SystemExit(f'{len(errors)} objects could not be saved, the first error: {errors[0][1]}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the creation of a mission with its hosts and their '
+                                                 'vulnerabilities, object by object and with a unit of work')
+    parser.add_argument('-s', '--size', type=int, default=500, help='The number of hosts of the mission')
+    parser.add_argument('-v', '--vulns-per-host', type=int, default=2, help='The number of vulnerabilities per host')
+    parser.add_argument('-c', '--concurrency', type=int, default=16, help='The number of concurrent requests')
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = create_server(args)
+    url = server.start()
+
+    try:
+        for name, function in (('serial', save_serially), ('unit of work', save_with_unit_of_work)):
+            # Only the concurrency is limited, as by a server answering slowly
+            rate_limiter = AdaptiveRateLimiter(rate=10000.0, max_concurrency=args.concurrency)
+            api = SmershAPI(url, pool_size=args.concurrency, rate_limiter=rate_limiter)
+            api.authenticate(args.username, args.password)
+
+            mission, host_vulns = create_mission(args.size, args.vulns_per_host)
+            requests_count = server.requests_count
+            start = time.perf_counter()
+            function(api, mission, host_vulns)
+            duration = time.perf_counter() - start
+            requests_count = server.requests_count - requests_count
+
+            saved = Mission.get(api, mission.id)
+
+            if (len(saved.hosts) != args.size) or any(h.mission.id != mission.id for h in saved.hosts):
+                raise SystemExit(f'{name}: the mission was not saved correctly')
+
+            print(f'{name:>12}: {args.size} hosts and {len(host_vulns)} host vulns created in {duration:.1f} s '
+                  f'({requests_count} requests)')
+            api.close()
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
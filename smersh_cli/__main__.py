@@ -1,25 +1,44 @@
 import argparse
+import itertools
+import json
 import sys
 import gettext
 import os
+import time
 from datetime import datetime, timezone
 
 import requests
 from cmd2 import Cmd, Cmd2ArgumentParser, with_argparser, with_argument_list
 from rich import box
 from rich.console import Console
+from rich.markup import escape
 from rich.panel import Panel
+from rich.progress import Progress
 from rich.table import Table
 from rich.text import Text
 from rich.tree import Tree
 
 from .api import SmershAPI, APIRoles
-from .models import User, Mission, Client, Vuln, PositivePoint, NegativePoint, Model, Host, Step, HostVuln, Impact
+from .auth import TokenCache
+from .cache import HTTPCache
+from .replica import Replica
+from .search import MATCH_END, MATCH_START, SearchIndex
+from .utils.ratelimit import AdaptiveRateLimiter
+from .utils.retry import RetryPolicy
+from .utils.serialization import AUTO_JSON_BACKEND, JSON_BACKEND_VARIABLE, JSON_BACKENDS, get_json_backend
+from .models import MODELS, User, Mission, Client, Vuln, PositivePoint, NegativePoint, Model, Host, Step, HostVuln, \
+    Impact
+from .stats import stats
+from .transport import Cassette, RecordingAdapter, ReplayAdapter
+from .upload import HostsUpload
 from .utils import date
+from .utils.hosts import count_lines
+from .utils.paths import get_cache_directory, get_server_path
 
 PACKAGE_NAME = 'smersh-cli'
 TABLE_BOX_TYPE = box.ROUNDED
 COMMAND_PROMPT = '\x1b[1;31mSMERSH {}>>\x1b[0m '
+TOKEN_CACHE_PASSPHRASE_VARIABLE = 'SMERSH_TOKEN_CACHE_PASSPHRASE'
 
 gettext.bindtextdomain(PACKAGE_NAME, localedir=os.path.join(os.path.abspath(os.path.dirname(__file__)), 'locale'))
 gettext.textdomain(PACKAGE_NAME)
@@ -34,6 +53,20 @@ def has_ipython():
         return False
 
 
+def requires_fields(*fields, detailed=False):
+    """
+    Declare the only fields read by a print function, so `show` requests only these ones. If `detailed` is set, the
+    function displays every field of a single object, which is then requested whole.
+    """
+
+    def decorator(function):
+        function.fields = fields
+        function.detailed = detailed
+        return function
+
+    return decorator
+
+
 def get_show_parser():
     parser = Cmd2ArgumentParser()
 
@@ -60,6 +93,34 @@ def get_show_parser():
         help=_('Whether to print the data in raw (without formatting) or in a table. Default is to print in a table.')
     )
 
+    parser.add_argument(
+        '-w',
+        '--where',
+        action='append',
+        default=[],
+        metavar='FIELD=VALUE',
+        help=_('Only print the objects whose field has the given value, filtered by the server. A lookup can follow the '
+               'field name, like created_at__after=2021-01-01. Can be repeated.')
+    )
+
+    parser.add_argument(
+        '-o',
+        '--order',
+        action='append',
+        default=[],
+        metavar='FIELD',
+        help=_('Sort the objects by this field, in descending order if it starts with "-" (as in --order=-name). Can be '
+               'repeated.')
+    )
+
+    parser.add_argument(
+        '-l',
+        '--limit',
+        type=int,
+        default=None,
+        help=_('The maximum number of objects to print.')
+    )
+
     return parser
 
 
@@ -220,6 +281,109 @@ def get_upload_parser():
         help=_('The path to the file to upload.')
     )
 
+    parser.add_argument(
+        '-n',
+        '--normalize',
+        action='store_true',
+        help=_('Strip and lowercase the hosts, and skip the empty lines, the comments and the duplicates before '
+               'uploading them.')
+    )
+
+    parser.add_argument(
+        '-b',
+        '--batch-size',
+        type=int,
+        default=HostsUpload.DEFAULT_BATCH_SIZE,
+        help=_('The number of hosts sent in each request.')
+    )
+
+    parser.add_argument(
+        '-w',
+        '--workers',
+        type=int,
+        default=HostsUpload.DEFAULT_WORKERS,
+        help=_('The number of requests sent concurrently.')
+    )
+
+    parser.add_argument(
+        '--restart',
+        action='store_true',
+        help=_('Upload the whole file again instead of resuming a previous upload which failed.')
+    )
+
+    return parser
+
+
+def get_stats_parser():
+    parser = Cmd2ArgumentParser()
+
+    parser.add_argument(
+        '-j',
+        '--json',
+        dest='json_path',
+        nargs='?',
+        const='-',
+        default=None,
+        help=_('Dump the statistics as JSON instead of printing tables, into the given file if any.')
+    )
+
+    parser.add_argument(
+        '--reset',
+        action='store_true',
+        help=_('Reset the statistics once they are printed.')
+    )
+
+    return parser
+
+
+def get_sync_parser():
+    parser = Cmd2ArgumentParser()
+
+    # No choices: argparse rejects an empty list of positional arguments with choices
+    parser.add_argument(
+        'models',
+        nargs='*',
+        help=_('The object types to synchronize (mission, user, client, vuln, positive_point, negative_point, step, '
+               'host, impact, host_vuln). Default is to synchronize every object type.')
+    )
+
+    return parser
+
+
+def get_search_parser():
+    parser = Cmd2ArgumentParser()
+
+    parser.add_argument(
+        'words',
+        nargs='+',
+        help=_('The words to look for, the last one may be incomplete.')
+    )
+
+    parser.add_argument(
+        '-t',
+        '--type',
+        dest='models',
+        action='append',
+        choices=['vuln', 'step', 'host', 'positive_point', 'negative_point'],
+        help=_('Only look for objects of this type. Can be repeated.')
+    )
+
+    parser.add_argument(
+        '-l',
+        '--limit',
+        type=int,
+        default=20,
+        help=_('The maximum number of results. Default is 20.')
+    )
+
+    parser.add_argument(
+        '-u',
+        '--update',
+        action='store_true',
+        help=_('Download the searched objects to index them before searching. The objects are otherwise indexed as '
+               'they are displayed or saved.')
+    )
+
     return parser
 
 
@@ -267,26 +431,38 @@ class App(Cmd):
         ids = namespace.ids
 
         if namespace.raw:
-            print_function = self.console.print
+            print_function = self.print_raw
         else:
             print_function = self.get_print_function_from_model_name(namespace.model)
 
-        if len(ids) == 0:
-            print_function(model.all(self.api))
+        # Only the fields displayed are requested
+        fields = getattr(print_function, 'fields', None)
+
+        if (len(ids) == 0) or (len(namespace.where) > 0) or (len(namespace.order) > 0) or (namespace.limit is not None):
+            try:
+                query = self.get_query(model, namespace, fields)
+            except ValueError as e:
+                self.console.print(_('[red]Invalid query: {}').format(e))
+                return
+
+            # Objects are streamed page by page to the print function instead of being loaded all at once
+            with stats.timer('show'):
+                print_function(query)
         else:
-            objects = []
+            if (len(ids) == 1) and getattr(print_function, 'detailed', False):
+                fields = None
+
+            objects, errors = model.get_many(self.api, ids, fields=fields)
 
-            for id in ids:
-                try:
-                    objects.append(model.get(self.api, id))
-                except requests.exceptions.HTTPError as e:
-                    if e.response.status_code == 404:
-                        self.console.print(_('[yellow]Unable to find an object with id: {}').format(id))
-                    else:
-                        self.console.print(_('[red]An HTTP error occurred: {}').format(e))
+            for id, e in errors:
+                if (e.response is not None) and (e.response.status_code == 404):
+                    self.console.print(_('[yellow]Unable to find an object with id: {}').format(id))
+                else:
+                    self.console.print(_('[red]An HTTP error occurred: {}').format(e))
 
             if len(objects) > 0:
-                print_function(objects)
+                with stats.timer('show'):
+                    print_function(objects)
             else:
                 self.console.print(_('Your request returned no object :('))
 
@@ -305,7 +481,8 @@ class App(Cmd):
             self.context = model(id=None)
         else:
             try:
-                self.context = model.get(self.api, id)
+                # The object is edited from its current state on the server, even if it was modified in this session
+                self.context = model(id=str(id)).refresh(self.api)
             except requests.exceptions.HTTPError as e:
                 if e.response.status_code == 404:
                     self.console.print(_('[yellow]Unable to find an object with id: {}').format(id))
@@ -392,27 +569,32 @@ class App(Cmd):
         """
         Save the object designated by the current context. The object will be either updated or created depending of its
         identifier (`id` field). If the identifier is None, the object is considered new and will be created. Otherwise,
-        the object will be updated.
+        the object will be updated: only the fields modified since it was loaded are sent.
 
         This command will raise an error if you have no context selected.
         """
 
         if self.context is None:
             self.console.print(_('[red]You need to be in a context to save something'))
-        else:
+            return
+
+        try:
             try:
-                try:
-                    self.context = self.context.save(self.api)
-                    self.context = self.context.fetch(self.api)
-                    self.update_prompt()
+                if (self.context.id is not None) and (len(self.context.get_changes()) == 0):
+                    self.console.print(_('[yellow]Nothing to save, the object was not modified'))
+                    return
 
-                    self.console.print(_('[green]The object was saved successfully'))
-                except TypeError:
-                    # The user probably tried to save a model containing an object with an undefined id
-                    self.console.print(_('[red]You must set every object identifier before saving'))
+                self.context = self.context.save(self.api)
+                self.context = self.context.refresh(self.api)
+                self.update_prompt()
 
-            except requests.exceptions.HTTPError as e:
-                self.console.print(_('[red]Unable to save the object: {}').format(e))
+                self.console.print(_('[green]The object was saved successfully'))
+            except TypeError:
+                # The user probably tried to save a model containing an object with an undefined id
+                self.console.print(_('[red]You must set every object identifier before saving'))
+
+        except requests.exceptions.HTTPError as e:
+            self.console.print(_('[red]Unable to save the object: {}').format(e))
 
     def do_delete(self, __):
         """
@@ -435,6 +617,11 @@ class App(Cmd):
 
     @with_argparser(get_upload_parser())
     def do_upload(self, namespace):
+        """
+        Upload a hosts file to the mission designated by the current context. The file is sent in batches uploaded
+        concurrently. If the upload fails, running the same command again only uploads the remaining batches.
+        """
+
         file_path = namespace.file_path
 
         if not (os.path.exists(file_path) and os.path.isfile(file_path)):
@@ -442,7 +629,17 @@ class App(Cmd):
             return
 
         if isinstance(self.context, Mission):
-            response = self.api.upload_hosts(file_path, self.context)
+            try:
+                with Progress(console=self.console, transient=True) as progress:
+                    task = progress.add_task(_('Uploading'), total=count_lines(file_path))
+                    response = self.api.upload_hosts(file_path, self.context,
+                                                     progress=lambda lines: progress.update(task, completed=lines),
+                                                     batch_size=namespace.batch_size, workers=namespace.workers,
+                                                     normalize=namespace.normalize, resume=not namespace.restart)
+            except requests.exceptions.RequestException as e:
+                self.console.print(_('[red]The upload failed: {}. Run the same command again to resume it').format(e))
+                return
+
             rejected_domains = response['rejected_domains']
 
             if len(rejected_domains) > 0:
@@ -452,10 +649,136 @@ class App(Cmd):
                     self.console.print(f'\t[yellow]{rejected_domain}')
 
             self.console.print(_('[green]The hosts file has been successfully uploaded'))
-            self.context = self.context.fetch(self.api)
+            self.context = self.context.refresh(self.api)
         else:
             self.console.print(_('[red]You must be in a mission context to use this command'))
 
+    @with_argparser(get_stats_parser())
+    def do_stats(self, namespace):
+        """
+        Print statistics about the requests sent to the server (latency percentiles, transferred bytes, status codes
+        and retries per endpoint), the counters of the model layer and the time spent in the main processing steps.
+        """
+
+        data = stats.to_dict()
+
+        if namespace.json_path == '-':
+            self.poutput(json.dumps(data, indent=4))
+        elif namespace.json_path is not None:
+            with open(namespace.json_path, 'w') as outf:
+                json.dump(data, outf, indent=4)
+
+            self.console.print(_('[green]The statistics have been written to {}').format(namespace.json_path))
+        else:
+            self.print_stats(data)
+
+        if namespace.reset:
+            stats.reset()
+
+    @with_argparser(get_sync_parser())
+    def do_sync(self, namespace):
+        """
+        Update the local replica of the server: only the new and modified objects are downloaded, and the deleted ones
+        are removed. The next commands read the synchronized objects from the replica instead of the server.
+        """
+
+        replica = self.api.replica
+
+        if replica is None:
+            self.console.print(_('[red]The replica is disabled, start the client with the --replica option'))
+            return
+
+        if len(namespace.models) == 0:
+            endpoints = list(replica.references)
+        else:
+            try:
+                endpoints = [self.get_model_from_name(e).ENDPOINT_NAME for e in namespace.models]
+            except KeyError as e:
+                self.console.print(_('[red]Unknown object type {}').format(e.args[0]))
+                return
+
+        results = []
+
+        try:
+            with Progress(console=self.console, transient=True) as progress:
+                task = progress.add_task(_('Synchronizing'), total=len(endpoints))
+
+                for endpoint in endpoints:
+                    results.append(replica.sync_endpoint(self.api, endpoint))
+                    progress.advance(task)
+        except requests.exceptions.RequestException as e:
+            self.console.print(_('[red]The synchronization failed: {}').format(e))
+            return
+
+        table = Table(box=TABLE_BOX_TYPE)
+
+        table.add_column(_('Endpoint'))
+        table.add_column(_('Pages'), justify='right')
+        table.add_column(_('Downloaded pages'), justify='right')
+        table.add_column(_('Updated objects'), justify='right')
+        table.add_column(_('Removed objects'), justify='right')
+        table.add_column(_('Duration'), justify='right')
+
+        for result in results:
+            table.add_row(result.endpoint, str(result.pages), str(result.changed_pages), str(result.objects),
+                          str(result.removed), f'{result.duration:.1f} s')
+
+        self.console.print(table)
+        self.console.print(_('[green]The replica is up to date'))
+
+    @with_argparser(get_search_parser())
+    def do_search(self, namespace):
+        """
+        Search the vulnerabilities, steps, hosts and positive and negative points. The search is done in a local index
+        of the objects displayed, saved or synchronized, it does not contact the server.
+        """
+
+        search_index = self.api.search_index
+
+        if search_index is None:
+            self.console.print(_('[red]The search index is disabled, start the client with the --search-index option'))
+            return
+
+        endpoints = None
+
+        if namespace.models is not None:
+            endpoints = [self.get_model_from_name(e).ENDPOINT_NAME for e in namespace.models]
+
+        if namespace.update:
+            try:
+                with self.console.status(_('Indexing')):
+                    search_index.update(self.api, endpoints)
+            except requests.exceptions.RequestException as e:
+                self.console.print(_('[red]The indexing failed: {}').format(e))
+                return
+
+        start = time.perf_counter()
+        hits = search_index.search(' '.join(namespace.words), endpoints, namespace.limit)
+        duration = time.perf_counter() - start
+
+        if len(hits) == 0:
+            self.console.print(_('Your request returned no object :('))
+            return
+
+        table = Table(box=TABLE_BOX_TYPE, show_lines=True)
+
+        table.add_column(_('Type'), justify='center')
+        table.add_column(_('ID'), justify='center')
+        table.add_column(_('Name'))
+        table.add_column(_('Match'))
+
+        for hit in hits:
+            model_name = MODELS[hit.endpoint].__name__
+            table.add_row(model_name, hit.id, self.highlight_match(hit.title), self.highlight_match(hit.snippet))
+
+        self.console.print(table)
+        self.console.print(_('{} results in {:.1f} ms ({} indexed objects)').format(len(hits), duration * 1000,
+                                                                                  len(search_index)))
+
+    @staticmethod
+    def highlight_match(text):
+        return escape(text).replace(MATCH_START, '[bold yellow]').replace(MATCH_END, '[/bold yellow]')
+
     def update_prompt(self):
         if self.context is None:
             self.prompt = COMMAND_PROMPT.format('')
@@ -479,6 +802,34 @@ class App(Cmd):
             'hostvuln': HostVuln
         }[model_name.replace('_', '')]
 
+    def get_query(self, model, namespace, fields=None):
+        """
+        Return the query of the objects selected by the options of the show command.
+        """
+
+        query = model.query(self.api)
+
+        if len(namespace.ids) > 0:
+            query = query.where(id=namespace.ids)
+
+        for condition in namespace.where:
+            name, separator, value = condition.partition('=')
+
+            if separator == '':
+                raise ValueError(_('"{}" is not of the form FIELD=VALUE').format(condition))
+
+            query = query.where(**{name: value})
+
+        query = query.order_by(*namespace.order)
+
+        if namespace.limit is not None:
+            query = query.limit(namespace.limit)
+
+        if fields is not None:
+            query = query.only(*fields)
+
+        return query
+
     def get_print_function_from_model_name(self, model_name):
         return {
             'mission': self.print_missions,
@@ -497,11 +848,92 @@ class App(Cmd):
     def get_printable_flag(flag, yes_text=_('Yes'), no_text=_('No')):
         return f'[green]{yes_text}' if flag else f'[red]{no_text}'
 
+    @staticmethod
+    def format_duration(seconds):
+        return '' if seconds is None else f'{seconds * 1000:.1f} ms'
+
+    @staticmethod
+    def format_size(size):
+        for unit in ('B', 'KiB', 'MiB'):
+            if size < 1024:
+                return f'{size:.0f} {unit}'
+
+            size /= 1024
+
+        return f'{size:.1f} GiB'
+
+    def print_stats(self, data):
+        requests_table = Table(box=TABLE_BOX_TYPE, title=_('Requests'))
+
+        requests_table.add_column(_('Method'), justify='center')
+        requests_table.add_column(_('Endpoint'))
+        requests_table.add_column(_('Count'), justify='right')
+        requests_table.add_column(_('p50'), justify='right')
+        requests_table.add_column(_('p95'), justify='right')
+        requests_table.add_column(_('p99'), justify='right')
+        requests_table.add_column(_('Status codes'), justify='center')
+        requests_table.add_column(_('Retries'), justify='right')
+        requests_table.add_column(_('Received (wire / decoded)'), justify='right')
+
+        for endpoint in data['endpoints']:
+            latency = endpoint['latency']
+            status_codes = ', '.join(f'{k}: {v}' for k, v in sorted(endpoint['status_codes'].items()))
+            received = '{} / {}'.format(self.format_size(endpoint['received_wire_bytes']),
+                                        self.format_size(endpoint['received_bytes']))
+
+            requests_table.add_row(endpoint['method'], endpoint['endpoint'], str(latency['count']),
+                                   self.format_duration(latency['p50']), self.format_duration(latency['p95']),
+                                   self.format_duration(latency['p99']), status_codes, str(endpoint['retries']),
+                                   received)
+
+        timers_table = Table(box=TABLE_BOX_TYPE, title=_('Processing steps'))
+
+        timers_table.add_column(_('Step'))
+        timers_table.add_column(_('Count'), justify='right')
+        timers_table.add_column(_('Total'), justify='right')
+        timers_table.add_column(_('p50'), justify='right')
+        timers_table.add_column(_('p95'), justify='right')
+        timers_table.add_column(_('p99'), justify='right')
+
+        for name, timer in data['timers'].items():
+            timers_table.add_row(name, str(timer['count']), self.format_duration(timer['total']),
+                                 self.format_duration(timer['p50']), self.format_duration(timer['p95']),
+                                 self.format_duration(timer['p99']))
+
+        counters_table = Table(box=TABLE_BOX_TYPE, title=_('Counters'))
+
+        counters_table.add_column(_('Name'))
+        counters_table.add_column(_('Value'), justify='right')
+
+        for name, value in sorted(data['counters'].items()):
+            counters_table.add_row(name, str(value))
+
+        self.console.print(requests_table)
+        self.console.print(timers_table)
+        self.console.print(counters_table)
+
+    def print_raw(self, objects):
+        for o in objects:
+            self.console.print(o)
+
+    @requires_fields('id', 'name', 'start_date', 'end_date', 'nmap', 'nessus', 'hosts', detailed=True)
     def print_missions(self, missions):
-        if len(missions) > 1:
-            self.print_missions_table(missions)
+        missions = iter(missions)
+        first_missions = list(itertools.islice(missions, 2))
+
+        if len(first_missions) > 1:
+            self.print_missions_table(itertools.chain(first_missions, missions))
+        elif len(first_missions) == 1:
+            mission = first_missions[0]
+
+            # A mission requested by its identifier is complete and shared by the session, the other ones only have
+            # the fields of the table and the complete one is requested
+            if self.api.identity_map.get(mission.iri) is not mission:
+                mission = Mission.get(self.api, mission.id)
+
+            self.print_single_mission(mission)
         else:
-            self.print_single_mission(missions[0])
+            self.console.print(_('Your request returned no object :('))
 
     def print_missions_table(self, missions):
         table = Table(box=TABLE_BOX_TYPE)
@@ -583,6 +1015,8 @@ class App(Cmd):
 
         hosts_node = layout.add(_(':desktop_computer: Scope'))
 
+        # The references are loaded when they are first read, in concurrent batches: every distinct host, host vuln,
+        # vuln and impact is requested once
         for host in mission.hosts:
             if isinstance(host, str):
                 hosts_node.add(_('#{} (save to update)').format(host))
@@ -593,10 +1027,15 @@ class App(Cmd):
                 f' #{host.id} - {host.name}')
 
             for host_vuln in host.host_vulns:
-                vuln = Vuln.get(self.api, host_vuln.vuln.id)
-                impact = host_vuln.impact
+                vuln_name = impact_name = _('[bold red]Undefined[/bold red]')
 
-                host_node.add(f'#{host_vuln.id} - {vuln.name} ({impact.name}) - {host_vuln.current_state}')
+                if host_vuln.vuln is not None:
+                    vuln_name = host_vuln.vuln.name
+
+                if host_vuln.impact is not None:
+                    impact_name = host_vuln.impact.name
+
+                host_node.add(f'#{host_vuln.id} - {vuln_name} ({impact_name}) - {host_vuln.current_state}')
 
         steps_node = layout.add(_(':spiral_notepad: [magenta]Activity'), guide_style='magenta')
 
@@ -656,6 +1095,7 @@ class App(Cmd):
 
         return layout
 
+    @requires_fields('id', 'username', 'trigram', 'phone', 'city', 'mail', 'enabled', 'roles', 'missions')
     def print_users_table(self, users):
         table = Table(box=TABLE_BOX_TYPE, show_lines=True)
 
@@ -686,6 +1126,7 @@ class App(Cmd):
 
         self.console.print(table)
 
+    @requires_fields('id', 'name', 'first_name', 'last_name', 'phone', 'mail')
     def print_clients_table(self, clients):
         table = Table(box=TABLE_BOX_TYPE)
 
@@ -702,6 +1143,7 @@ class App(Cmd):
 
         self.console.print(table)
 
+    @requires_fields('id', 'name', 'description', 'remediation')
     def print_vulns_table(self, vulns):
         table = Table(box=TABLE_BOX_TYPE, show_lines=True)
 
@@ -715,6 +1157,7 @@ class App(Cmd):
 
         self.console.print(table)
 
+    @requires_fields('id', 'name', 'description')
     def print_points_table(self, points):
         table = Table(box=TABLE_BOX_TYPE, show_lines=True)
 
@@ -727,6 +1170,7 @@ class App(Cmd):
 
         self.console.print(table)
 
+    @requires_fields('id', 'description', 'created_at', 'find_at')
     def print_steps_table(self, steps):
         table = Table(box=TABLE_BOX_TYPE)
 
@@ -740,6 +1184,7 @@ class App(Cmd):
 
         self.console.print(table)
 
+    @requires_fields('id', 'name', 'technology', 'checked', 'host_vulns')
     def print_hosts_table(self, hosts):
         table = Table(box=TABLE_BOX_TYPE)
 
@@ -756,6 +1201,7 @@ class App(Cmd):
 
         self.console.print(table)
 
+    @requires_fields('id', 'name')
     def print_impacts_list(self, impacts):
         tree = Tree(_('[bold]Impacts'))
 
@@ -764,34 +1210,32 @@ class App(Cmd):
 
         self.console.print(tree)
 
-    def print_host_vuln(self, host_vuln):
-        assert (len(host_vuln) == 1)
+    def print_host_vuln(self, host_vulns):
+        host_vulns = iter(host_vulns)
+        host_vuln = next(host_vulns, None)
+
+        if host_vuln is None:
+            raise ValueError('There is no host vuln to print')
+
+        if next(host_vulns, None) is not None:
+            raise ValueError('Only a single host vuln can be printed')
 
-        host_vuln = host_vuln[0]
         host = vuln = impact = _('[bold red]Undefined[/bold red]')
 
-        if host_vuln.host is not None:
-            if isinstance(host_vuln.host, str):
-                host_object = Host.get(self.api, host_vuln.host)
-            else:
-                host_object = host_vuln.host.fetch(self.api)
+        # The three references are loaded concurrently
+        host_object, vuln_object, impact_object = [
+            model.get(self.api, o) if isinstance(o, str) else o
+            for model, o in ((Host, host_vuln.host), (Vuln, host_vuln.vuln), (Impact, host_vuln.impact))
+        ]
+        self.api.loader.load_many([host_object, vuln_object, impact_object])
 
+        if host_object is not None:
             host = f'[bold]#{host_object.id}[/bold] - {host_object.name}'
 
-        if host_vuln.vuln is not None:
-            if isinstance(host_vuln.vuln, str):
-                vuln_object = Vuln.get(self.api, host_vuln.vuln)
-            else:
-                vuln_object = host_vuln.vuln.fetch(self.api)
-
+        if vuln_object is not None:
             vuln = f'[bold]#{vuln_object.id}[/bold] - {vuln_object.name}'
 
-        if host_vuln.impact is not None:
-            if isinstance(host_vuln.impact, str):
-                impact_object = Impact.get(self.api, host_vuln.impact)
-            else:
-                impact_object = host_vuln.impact.fetch(self.api)
-
+        if impact_object is not None:
             impact = f'{impact_object.name}'
 
         self.console.print(f'{vuln} ({impact}) <=> {host}', highlight=False)
@@ -815,6 +1259,117 @@ def parse_args():
                         help=_('Disable server authentication. Please, do NOT use this option in production')
                         )
 
+    parser.add_argument('--pool-size',
+                        dest='pool_size',
+                        type=int,
+                        default=SmershAPI.DEFAULT_POOL_SIZE,
+                        help=_('The maximum number of connections kept alive with the SMERSH backend server')
+                        )
+
+    parser.add_argument('--max-retries',
+                        dest='max_retries',
+                        type=int,
+                        default=RetryPolicy.DEFAULT_MAX_RETRIES,
+                        help=_('How many times a request is sent again after a transient failure')
+                        )
+
+    parser.add_argument('--rate-limit',
+                        dest='rate_limit',
+                        type=float,
+                        default=AdaptiveRateLimiter.DEFAULT_RATE,
+                        help=_('The initial number of requests per second sent to the server. It is automatically '
+                               'lowered when the server is overloaded')
+                        )
+
+    parser.add_argument('--cache',
+                        dest='cache_directory',
+                        nargs='?',
+                        const=get_cache_directory('http'),
+                        default=None,
+                        help=_('Keep the server responses in a local cache (in the given directory if any) and only '
+                               'download them again when they changed')
+                        )
+
+    parser.add_argument('--replica',
+                        dest='replica_directory',
+                        nargs='?',
+                        const=get_cache_directory('replicas'),
+                        default=None,
+                        help=_('Keep a local copy of the server data (in the given directory if any), updated by the '
+                               'sync command. The objects are read from this copy while it is recent enough, and '
+                               'whenever the server can\'t be reached')
+                        )
+
+    parser.add_argument('--replica-max-age',
+                        dest='replica_max_age',
+                        type=float,
+                        default=Replica.DEFAULT_MAX_AGE,
+                        help=_('How long (in seconds) after a synchronization the objects are read from the replica '
+                               'instead of the server')
+                        )
+
+    parser.add_argument('--search-index',
+                        dest='search_directory',
+                        nargs='?',
+                        const=get_cache_directory('search'),
+                        default=None,
+                        help=_('Index the vulnerabilities, steps, hosts and points received from the server for the '
+                               'search command, in the given directory if any')
+                        )
+
+    parser.add_argument('--compress-requests',
+                        dest='compress_requests',
+                        action='store_true',
+                        help=_('Compress the large request bodies (and hosts files) sent to the server. The server '
+                               'must support gzip-encoded requests')
+                        )
+
+    transport_group = parser.add_mutually_exclusive_group()
+
+    transport_group.add_argument('--record',
+                                 dest='record_path',
+                                 type=str,
+                                 help=_('Record every exchange with the server into the given cassette file')
+                                 )
+
+    transport_group.add_argument('--replay',
+                                 dest='replay_path',
+                                 type=str,
+                                 help=_('Answer the requests with the exchanges recorded in the given cassette file '
+                                        'instead of contacting the server')
+                                 )
+
+    parser.add_argument('--replay-latency',
+                        dest='replay_latency',
+                        type=float,
+                        default=None,
+                        help=_('The latency (in seconds) added to every replayed response. Default is to reproduce '
+                               'the recorded latency')
+                        )
+
+    parser.add_argument('--replay-speed',
+                        dest='replay_speed',
+                        type=float,
+                        default=1.0,
+                        help=_('Replay the recorded latencies this many times faster')
+                        )
+
+    parser.add_argument('--token-cache',
+                        dest='token_cache',
+                        action='store_true',
+                        help=_('Keep the authentication token in an encrypted file to skip the login while it is '
+                               'valid. The passphrase is read from the {} environment variable or asked at '
+                               'startup').format(TOKEN_CACHE_PASSPHRASE_VARIABLE)
+                        )
+
+    parser.add_argument('--json-backend',
+                        dest='json_backend',
+                        choices=[AUTO_JSON_BACKEND] + list(JSON_BACKENDS),
+                        default=None,
+                        help=_('The library used to encode and decode JSON. Default is the {} environment variable or, '
+                               'if it is not set, the fastest installed library').format(JSON_BACKEND_VARIABLE)
+                        )
+
     return parser.parse_args()
 
 
@@ -823,6 +1378,13 @@ def print_hello(console):
     console.print(Panel(Text(_('Welcome to the SMERSH command-line client'), justify='center')))
 
 
+def prompt_credentials(console):
+    username = console.input(_('Enter your username: '))
+    password = console.input(_('Enter your password (will not be echoed): '), password=True)
+
+    return username, password
+
+
 def main():
     args = parse_args()
     console = Console()
@@ -837,18 +1399,90 @@ def main():
         console.print(_('[bold yellow]WARNING:[/bold yellow][yellow] The program is currently running in '
                         '[bold yellow]INSECURE[/bold yellow] mode. Server authenticity will not be checked.'))
 
-    api = SmershAPI(args.url, certificate=certificate)
+    json_backend_name = args.json_backend or os.environ.get(JSON_BACKEND_VARIABLE)
+
+    try:
+        json_backend = get_json_backend(json_backend_name)
+    except ValueError:
+        console.print(_('[red]Unknown JSON library {}').format(json_backend_name))
+        sys.exit(1)
+    except RuntimeError:
+        console.print(_('[red]The JSON library {} is not installed').format(json_backend_name))
+        sys.exit(1)
+
+    retry_policy = RetryPolicy(max_retries=args.max_retries)
+    rate_limiter = AdaptiveRateLimiter(rate=args.rate_limit, max_concurrency=args.pool_size)
+    cache = None if args.cache_directory is None else HTTPCache(args.cache_directory, json_backend=json_backend)
+    replica = None
+
+    if args.replica_directory is not None:
+        replica_path = get_server_path(args.replica_directory, args.url, '.sqlite3')
+        replica = Replica(replica_path, max_age=args.replica_max_age, json_backend=json_backend)
+
+    search_index = None
+
+    if args.search_directory is not None:
+        try:
+            search_index = SearchIndex(get_server_path(args.search_directory, args.url, '.sqlite3'))
+        except RuntimeError:
+            console.print(_('[red]The search index requires the FTS5 extension of SQLite'))
+            sys.exit(1)
+
+    transport = None
+
+    if args.record_path is not None:
+        transport = RecordingAdapter(Cassette(args.record_path), pool_connections=args.pool_size,
+                                     pool_maxsize=args.pool_size)
+    elif args.replay_path is not None:
+        try:
+            cassette = Cassette.load(args.replay_path)
+        except (OSError, ValueError, KeyError):
+            console.print(_('[red]Unable to read the cassette file {}').format(args.replay_path))
+            sys.exit(1)
+
+        transport = ReplayAdapter(cassette, latency=args.replay_latency, speed=args.replay_speed)
+
+    api = SmershAPI(args.url, certificate=certificate, pool_size=args.pool_size, retry_policy=retry_policy,
+                    rate_limiter=rate_limiter, cache=cache, compress_requests=args.compress_requests,
+                    transport=transport, json_backend=json_backend, replica=replica, search_index=search_index)
+
+    def renew_credentials():
+        console.print(_('[yellow]Your session is about to expire, please log in again'))
+        return prompt_credentials(console)
+
+    api.token_manager.credentials_provider = renew_credentials
 
     print_hello(console)
 
     try:
+        if args.token_cache:
+            passphrase = os.environ.get(TOKEN_CACHE_PASSPHRASE_VARIABLE)
+
+            if passphrase is None:
+                passphrase = console.input(_('Enter the passphrase of the token cache (will not be echoed): '),
+                                           password=True)
+
+            try:
+                api.token_manager.cache = TokenCache(get_cache_directory('tokens'), passphrase)
+            except RuntimeError:
+                console.print(_('[red]The token cache requires the "cryptography" package'))
+                sys.exit(1)
+
+            if api.token_manager.load_cached_token():
+                console.print(_('[green]:heavy_check_mark: Hello, [bold]{}[/bold]. You are successfully logged in')
+                              .format(api.authenticated_username))
+
         while not api.authenticated:
-            username = console.input(_('Enter your username: '))
-            password = console.input(_('Enter your password (will not be echoed): '), password=True)
+            username, password = prompt_credentials(console)
 
             try:
                 if api.authenticate(username, password):
-                    username = User.get(api, api.authenticated_user_id).username
+                    # The username is usually part of the token, no need to ask the server
+                    username = api.authenticated_username
+
+                    if username is None:
+                        username = User.get(api, api.authenticated_user_id).username
+
                     console.print(_('[green]:heavy_check_mark: Hello, [bold]{}[/bold]. You are successfully logged in').format(username))
                 else:
                     console.print(_('[red]:cross_mark: Unable to log you in. Your credentials seem invalid'))
@@ -860,10 +1494,21 @@ def main():
     except EOFError:
         # The \n is important because we need to not print inside the input caption
         console.print(_('\nBye'))
+        api.close()
         sys.exit(0)
 
     app = App(api)
-    sys.exit(app.cmdloop())
+    exit_code = app.cmdloop()
+
+    # Closing the API also saves the cassette when the exchanges are recorded
+    api.close()
+
+    if replica is not None:
+        replica.close()
+
+    if search_index is not None:
+        search_index.close()
+    sys.exit(exit_code)
 
 
 if __name__ == '__main__':
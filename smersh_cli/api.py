@@ -1,10 +1,28 @@
-import base64
-import json
+import asyncio
+import functools
+import gzip
+import time
 import requests
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 from enum import IntFlag
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3 import encode_multipart_formdata
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
-
-from .utils.json import clean_ldjson
+from requests.packages.urllib3.util.request import ACCEPT_ENCODING
+
+from .auth import AUTHENTICATION_PATH, TokenManager
+from .identity import IdentityMap
+from .loader import ReferenceLoader
+from .stats import stats as default_stats
+from .upload import HostsUpload
+from .utils.json import clean_ldjson, get_next_page
+from .utils.prefetch import prefetch
+from .utils.ratelimit import AdaptiveRateLimiter
+from .utils.retry import RetryPolicy
+from .utils.serialization import get_json_backend
+from .utils.stream import CollectionStream
 
 requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
 
@@ -154,44 +172,276 @@ class APIRoles(IntFlag):
                                       ROLE_POSITIVE_POINT_MANAGE | ROLE_VULN_MANAGE | ROLE_VULN_TYPE_MANAGE
 
 
+Transfer = namedtuple('Transfer', ['method', 'url', 'status_code', 'sent_bytes', 'sent_wire_bytes', 'received_bytes',
+                                   'received_wire_bytes'])
+
+
+class ByteCounter:
+
+    def __init__(self):
+        self.count = 0
+
+    def write(self, chunk):
+        self.count += len(chunk)
+
+
+def tee_chunks(chunks, writer):
+    for chunk in chunks:
+        writer.write(chunk)
+        yield chunk
+
+
 class SmershAPI:
 
     DEFAULT_USER_AGENT = 'SmershPythonClient'
+    DEFAULT_POOL_SIZE = 10
+
+    STREAM_CHUNK_SIZE = 64 * 1024
+    PREFETCH_SIZE = 100
+    TRANSFERS_HISTORY_SIZE = 1000
+
+    # Request bodies smaller than this are not worth compressing
+    COMPRESSION_THRESHOLD = 1024
 
-    def __init__(self, main_url, user_agent=DEFAULT_USER_AGENT, certificate=None):
+    # Status codes meaning the server wants us to slow down
+    THROTTLE_STATUSES = (429, 503)
+
+    def __init__(self, main_url, user_agent=DEFAULT_USER_AGENT, certificate=None, pool_size=DEFAULT_POOL_SIZE,
+                 retry_policy=None, rate_limiter=None, cache=None, compress_requests=False, token_manager=None,
+                 stats=None, transport=None, json_backend=None, identity_map=None, replica=None,
+                 search_index=None):
         if main_url.endswith('/'):
             main_url = main_url[:-1]
 
         self.main_url = main_url
         self.user_agent = user_agent
         self.certificate = certificate
-        self.token = None
+        self.pool_size = pool_size
+        self.transport = transport
+        self.session = self.create_session()
+        self.stats = default_stats if stats is None else stats
+
+        if token_manager is None:
+            token_manager = TokenManager(self)
+
+        self.token_manager = token_manager
+
+        if retry_policy is None:
+            retry_policy = RetryPolicy()
+
+        if rate_limiter is None:
+            rate_limiter = AdaptiveRateLimiter(max_concurrency=pool_size)
+
+        self.retry_policy = retry_policy
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.replica = replica
+        self.search_index = search_index
+        self.compress_requests = compress_requests
+        self.json_backend = get_json_backend() if json_backend is None else json_backend
+        self.identity_map = IdentityMap() if identity_map is None else identity_map
+        self.loader = ReferenceLoader(self)
+        self.transfers = deque(maxlen=self.TRANSFERS_HISTORY_SIZE)
+
+    def create_session(self):
+        # A single session is kept for the whole life of the client so every request goes through the same connection
+        # pool: connections (and their TLS sessions) are kept alive and reused instead of being negotiated again
+        session = requests.Session()
+        adapter = self.transport
+
+        # The transport is pluggable to record or replay the exchanges with the server (see the transport module)
+        if adapter is None:
+            adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({
+            'Accept': 'application/ld+json',
+            # Every encoding urllib3 is able to decode (brotli and zstd are available when their module is installed)
+            'Accept-Encoding': ACCEPT_ENCODING,
+            'User-Agent': self.user_agent
+        })
+
+        if self.certificate is not None:
+            session.verify = self.certificate
+
+        return session
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def token(self):
+        token = self.token_manager.token
+        return None if token is None else token.value
 
-    def request(self, method, path, body=None, content_type='application/ld+json', files=None):
+    @token.setter
+    def token(self, token):
+        self.token_manager.set_token(token)
+
+    def request(self, method, path, body=None, content_type='application/ld+json', files=None, raw=False):
         if path[0] != '/':
             path = '/' + path
 
-        headers = {
-            'Accept': 'application/ld+json',
-            'User-Agent': self.user_agent
-        }
+        headers = {}
 
         if files is None:
             headers['Content-Type'] = content_type
 
-        if self.authenticated:
-            headers['Authorization'] = f'Bearer {self.token}'
+        url = self.main_url + path
+        cache_entry = None
+
+        # The reads are answered by the local replica while it is recent enough
+        if (self.replica is not None) and (method == 'GET'):
+            data = self.replica.get(path)
+
+            if data is not None:
+                if self.search_index is not None:
+                    self.search_index.record(method, path, data)
+
+                return data if raw else clean_ldjson(data)
+
+        if (self.cache is not None) and (method == 'GET'):
+            cache_entry = self.cache.get(url)
+
+            if cache_entry is not None:
+                headers.update(cache_entry.validators)
+
+        try:
+            response, sent_bytes = self.send_body(method, url, headers, body, files)
+        except requests.ConnectionError:
+            data = self.read_offline(method, path)
+
+            if data is None:
+                raise
+
+            if self.search_index is not None:
+                self.search_index.record(method, path, data)
+
+            return data if raw else clean_ldjson(data)
+
+        if (self.cache is not None) and (method != 'GET'):
+            self.cache.invalidate(url)
+
+        self.record_transfer(response, sent_bytes, len(response.content))
+
+        if (cache_entry is not None) and (response.status_code == 304):
+            data = cache_entry.data
+        else:
+            self.check_response(response)
+
+            try:
+                data = self.json_backend.loads(response.content)
+            except self.json_backend.DecodeError:
+                data = None
+
+            if (data is not None) and (self.cache is not None) and (method == 'GET'):
+                self.cache.set(url, response, data)
+
+        self.record_response(method, path, data)
+
+        if data is None:
+            return None
+
+        if raw:
+            return data
+
+        with self.stats.timer('clean_ldjson'):
+            return clean_ldjson(data)
+
+    def record_response(self, method, path, data):
+        # The local copies of the server data are kept up to date with every response
+        if self.replica is not None:
+            self.replica.record(method, path, data)
+
+        if self.search_index is not None:
+            self.search_index.record(method, path, data)
+
+    def read_offline(self, method, path):
+        # When the server can't be reached, the replica answers the reads whatever their age
+        if (self.replica is None) or (method != 'GET'):
+            return None
+
+        data = self.replica.get(path, stale=True)
+
+        if data is not None:
+            self.stats.increment('replica_offline_reads')
+
+        return data
+
+    def send_body(self, method, url, headers, body=None, files=None):
+        """
+        Send a request with its body, compressed if this is enabled and worth it. Return the response and the size of
+        the body before compression.
+        """
+
+        if self.compress_requests and ((body is not None) or (files is not None)):
+            payload, payload_type = self.encode_body(body, files, headers.get('Content-Type'))
+
+            if len(payload) >= self.COMPRESSION_THRESHOLD:
+                compressed_headers = dict(headers)
+                compressed_headers['Content-Type'] = payload_type
+                compressed_headers['Content-Encoding'] = 'gzip'
+
+                response = self.send(method, url, headers=compressed_headers, data=gzip.compress(payload))
+
+                if response.status_code != 415:
+                    return response, len(payload)
+
+                # The server does not support compressed requests, don't try again
+                self.compress_requests = False
 
         if body is None:
-            response = requests.request(method, self.main_url + path, verify=self.certificate, headers=headers,
-                                        files=files)
+            response = self.send(method, url, headers=headers, files=files)
         elif files is None:
-            response = requests.request(method, self.main_url + path, verify=self.certificate, headers=headers,
-                                        json=body)
+            response = self.send(method, url, headers=headers, data=self.json_backend.dumps(body))
         else:
-            response = requests.request(method, self.main_url + path, verify=self.certificate, headers=headers,
-                                        data=body, files=files)
+            response = self.send(method, url, headers=headers, data=body, files=files)
+
+        return response, None
+
+    def encode_body(self, body, files, content_type):
+        if files is None:
+            return self.json_backend.dumps(body), content_type
+
+        fields = [] if body is None else list(body.items())
+        fields.extend((k, (k, v)) for k, v in files.items())
+
+        return encode_multipart_formdata(fields)
 
+    def record_transfer(self, response, sent_bytes, received_bytes):
+        request = response.request
+        sent_wire_bytes = len(request.body) if isinstance(request.body, (bytes, str)) else 0
+        received_wire_bytes = response.raw.tell() if hasattr(response.raw, 'tell') else received_bytes
+
+        if sent_bytes is None:
+            sent_bytes = sent_wire_bytes
+
+        self.transfers.append(Transfer(request.method, response.url, response.status_code, sent_bytes,
+                                       sent_wire_bytes, received_bytes, received_wire_bytes))
+        self.stats.record_transfer(request.method, response.url, sent_wire_bytes, received_bytes, received_wire_bytes)
+
+    def get_transfer_totals(self):
+        """
+        Sum the sizes of the recent transfers, before and after compression.
+        """
+
+        totals = dict.fromkeys(['sent_bytes', 'sent_wire_bytes', 'received_bytes', 'received_wire_bytes'], 0)
+
+        for transfer in list(self.transfers):
+            for k in totals:
+                totals[k] += getattr(transfer, k)
+
+        return totals
+
+    @staticmethod
+    def check_response(response):
         # This should never happen
         if response.status_code == 405:
             raise requests.HTTPError
@@ -202,17 +452,189 @@ class SmershAPI:
         if response.status_code == 400:
             raise requests.HTTPError('Error 400: {}'.format(response.json()['hydra:description']))
 
+        if response.status_code == 429:
+            raise requests.HTTPError('Too many requests, the server is rate limiting us', response=response)
+
         if response.status_code >= 500:
             raise requests.HTTPError('Well, I guess the server died ¯\\_(ツ)_/¯', response=response)
 
-        try:
-            return clean_ldjson(response.json())
-        except json.JSONDecodeError:
-            return None
+    def send(self, method, url, **kwargs):
+        authenticating = (url == self.main_url + AUTHENTICATION_PATH)
+        renewed = False
+        attempt = 0
+        start = time.perf_counter()
+
+        if not authenticating:
+            self.token_manager.ensure_valid()
+
+        while True:
+            response = None
+
+            try:
+                with self.rate_limiter:
+                    response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self.rate_limiter.throttle()
+
+                if not self.retry_policy.should_retry(method, attempt):
+                    self.stats.record_request(method, url, None, time.perf_counter() - start, attempt)
+                    raise
+            else:
+                if response.status_code in self.THROTTLE_STATUSES:
+                    self.rate_limiter.throttle()
+                else:
+                    self.rate_limiter.recover()
+
+                # The token was rejected (revoked, expired sooner than expected, ...), log in again once
+                if (response.status_code == 401) and self.authenticated and not (authenticating or renewed) and \
+                        self.token_manager.can_renew:
+                    renewed = True
+
+                    if self.token_manager.renew():
+                        response.close()
+                        continue
+
+                if not self.retry_policy.should_retry(method, attempt, response):
+                    self.stats.record_request(method, url, response.status_code, time.perf_counter() - start, attempt)
+                    return response
+
+                response.close()
+
+            time.sleep(self.retry_policy.get_delay(attempt, response))
+            attempt += 1
 
     def get(self, path, body=None):
         return self.request('GET', path, body)
 
+    def iter_collection(self, path, limit=None):
+        """
+        Iterate over every member of a (possibly paginated) Hydra collection. Pages are downloaded and decoded in
+        background, at most PREFETCH_SIZE members ahead of the consumer, so the memory usage does not depend on the
+        size of the collection. If `limit` is set, no page is requested once this number of members is received.
+        """
+
+        if self.replica is None:
+            return prefetch(self.iter_members(path, limit), self.PREFETCH_SIZE)
+
+        members = self.replica.iter_collection(path)
+
+        if members is not None:
+            return (clean_ldjson(e) for e in self.index_members(path, members))
+
+        return self.iter_members_offline(path, prefetch(self.iter_members(path, limit), self.PREFETCH_SIZE))
+
+    def iter_members_offline(self, path, members):
+        # The members are read from the replica if the server can't be reached for the first page
+        received = False
+
+        try:
+            for e in members:
+                received = True
+                yield e
+        except requests.ConnectionError:
+            replica_members = None if received else self.replica.iter_collection(path, stale=True)
+
+            if replica_members is None:
+                raise
+
+            self.stats.increment('replica_offline_reads')
+
+            for e in self.index_members(path, replica_members):
+                yield clean_ldjson(e)
+
+    def index_members(self, path, members):
+        if self.search_index is None:
+            return members
+
+        return self.search_index.index_members(path, members)
+
+    def iter_members(self, path, limit=None):
+        next_path = path
+        count = 0
+
+        # The page being received is read to its end so it can be cached, only the next ones are not requested
+        while (next_path is not None) and ((limit is None) or (count < limit)):
+            page = self.stream_page(next_path)
+
+            while True:
+                try:
+                    e = next(page)
+                except StopIteration as stop:
+                    next_path = stop.value
+                    break
+
+                count += 1
+                yield e
+
+    def stream_page(self, path):
+        """
+        Yield the cleaned members of a single collection page as they are received, then return the path of the next
+        page (or None if it is the last one).
+        """
+
+        if path[0] != '/':
+            path = '/' + path
+
+        url = self.main_url + path
+        headers = {'Content-Type': 'application/ld+json'}
+        cache_entry = None
+
+        if self.cache is not None:
+            cache_entry = self.cache.get(url)
+
+            if cache_entry is not None:
+                headers.update(cache_entry.validators)
+
+        response = self.send('GET', url, headers=headers, stream=True)
+
+        with closing(response):
+            if (cache_entry is not None) and (response.status_code == 304):
+                self.record_transfer(response, None, 0)
+
+                if self.search_index is not None:
+                    self.search_index.record('GET', path, cache_entry.data)
+
+                for e in clean_ldjson(cache_entry.data):
+                    yield e
+
+                return get_next_page(cache_entry.data)
+
+            self.check_response(response)
+
+            counter = ByteCounter()
+            chunks = tee_chunks(response.iter_content(self.STREAM_CHUNK_SIZE), counter)
+            writer = None if self.cache is None else self.cache.create_writer(url, response)
+
+            if writer is not None:
+                chunks = tee_chunks(chunks, writer)
+
+            collection = CollectionStream(chunks)
+
+            # The members are cleaned one by one, but their cleaning is recorded once for the whole page
+            clean_duration = 0.0
+
+            try:
+                for e in self.index_members(path, collection):
+                    start = time.perf_counter()
+                    e = clean_ldjson(e)
+                    clean_duration += time.perf_counter() - start
+
+                    yield e
+            except BaseException:
+                if writer is not None:
+                    writer.abort()
+
+                raise
+            finally:
+                self.stats.record_duration('clean_ldjson', clean_duration)
+
+            if writer is not None:
+                writer.commit()
+
+            self.record_transfer(response, None, counter.count)
+
+            return get_next_page(collection.metadata)
+
     def post(self, path, body=None):
         return self.request('POST', path, body)
 
@@ -226,24 +648,15 @@ class SmershAPI:
         return self.request('DELETE', path, body)
 
     def authenticate(self, username, password):
-        data = {
-            'username': username,
-            'password': password
-        }
-        response = self.post('/authentication_token', data)
-
-        if ('code' in response) and (response['code'] == 401):
-            return False
-
-        self.token = response['token']
-        return True
+        return self.token_manager.login(username, password)
 
-    def upload_hosts(self, file_path, mission):
-        with open(file_path, 'rb') as inf:
-            hosts_data = inf.read()
-            data = {'missionName': mission.name}
+    def upload_hosts(self, file_path, mission, progress=None, **kwargs):
+        """
+        Upload a hosts file to a mission. The file is streamed and sent in concurrent batches, see HostsUpload for the
+        available options.
+        """
 
-            return self.request('POST', '/api/upload/host', body=data, files=dict(filename=hosts_data))
+        return HostsUpload(self, file_path, mission, **kwargs).run(progress)
 
     @property
     def authenticated(self):
@@ -254,16 +667,125 @@ class SmershAPI:
         if not self.authenticated:
             return None
 
-        # HACK: Ugly fix because of a badly encoded token
-        token_data_b64 = self.token.split('.')[1]
-        missing_padding_count = (4 - (len(token_data_b64) % 4))
+        return self.token_manager.token.user_id
 
-        if missing_padding_count == 3:
-            token_data_b64 += 'A=='
-        else:
-            token_data_b64 += '=' * missing_padding_count
+    @property
+    def authenticated_username(self):
+        if not self.authenticated:
+            return None
+
+        return self.token_manager.token.username
+
+
+class AsyncSmershAPI:
+    """
+    An asyncio front-end for SmershAPI. Requests are run by a bounded pool of worker threads sharing the connection pool,
+    the retry policy, the rate limiter and the JSON-LD decoding of a regular SmershAPI client so both clients always
+    return the same results.
+
+    This is not an asyncio-native HTTP client: every request in flight holds one of the `max_concurrency` threads, so
+    hundreds of concurrent requests cost hundreds of threads. The requests above this limit wait for a free thread.
+    """
+
+    DEFAULT_MAX_CONCURRENCY = 100
+
+    # A coroutine can't wait for a request when it reads a field: the stubs are loaded explicitly, with afetch
+    loader = None
+
+    def __init__(self, main_url, user_agent=SmershAPI.DEFAULT_USER_AGENT, certificate=None,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY, **kwargs):
+        self.sync = SmershAPI(main_url, user_agent=user_agent, certificate=certificate, pool_size=max_concurrency,
+                              **kwargs)
+        self.max_concurrency = max_concurrency
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='smersh-api')
+
+    async def run(self, function, *args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(function, *args, **kwargs))
+
+    async def request(self, method, path, body=None, content_type='application/ld+json', files=None, raw=False):
+        return await self.run(self.sync.request, method, path, body, content_type=content_type, files=files, raw=raw)
+
+    async def get(self, path, body=None):
+        return await self.run(self.sync.get, path, body)
+
+    async def iter_collection(self, path, limit=None):
+        page = asyncio.ensure_future(self.request('GET', path, raw=True))
+        count = 0
+
+        try:
+            while page is not None:
+                data = await page
+                members = clean_ldjson(data)
+                count += len(members)
+                next_path = get_next_page(data)
+
+                if (limit is not None) and (count >= limit):
+                    next_path = None
+
+                page = None if next_path is None else asyncio.ensure_future(self.request('GET', next_path, raw=True))
+
+                for e in members:
+                    yield e
+        finally:
+            if page is not None:
+                page.cancel()
+
+    async def post(self, path, body=None):
+        return await self.run(self.sync.post, path, body)
+
+    async def put(self, path, body=None):
+        return await self.run(self.sync.put, path, body)
+
+    async def patch(self, path, body=None):
+        return await self.run(self.sync.patch, path, body)
 
-        token_data = json.loads(base64.b64decode(token_data_b64))
-        user_path = token_data['user']
+    async def delete(self, path, body=None):
+        return await self.run(self.sync.delete, path, body)
 
-        return int(user_path.split('/')[-1])
+    async def authenticate(self, username, password):
+        return await self.run(self.sync.authenticate, username, password)
+
+    async def upload_hosts(self, file_path, mission, progress=None, **kwargs):
+        return await self.run(self.sync.upload_hosts, file_path, mission, progress, **kwargs)
+
+    async def close(self):
+        loop = asyncio.get_event_loop()
+
+        # Waiting for the requests in flight must not block the event loop
+        await loop.run_in_executor(None, functools.partial(self.executor.shutdown, wait=True))
+        await loop.run_in_executor(None, self.sync.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    @property
+    def main_url(self):
+        return self.sync.main_url
+
+    @property
+    def identity_map(self):
+        return self.sync.identity_map
+
+    @property
+    def token(self):
+        return self.sync.token
+
+    @token.setter
+    def token(self, token):
+        self.sync.token = token
+
+    @property
+    def authenticated(self):
+        return self.sync.authenticated
+
+    @property
+    def authenticated_user_id(self):
+        return self.sync.authenticated_user_id
+
+    @property
+    def authenticated_username(self):
+        return self.sync.authenticated_username
@@ -0,0 +1,212 @@
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:
+    Fernet = None
+
+
+AUTHENTICATION_PATH = '/authentication_token'
+
+
+def decode_jwt_claims(token):
+    try:
+        # HACK: Ugly fix because of a badly encoded token
+        token_data_b64 = token.split('.')[1]
+        missing_padding_count = (4 - (len(token_data_b64) % 4))
+
+        if missing_padding_count == 3:
+            token_data_b64 += 'A=='
+        else:
+            token_data_b64 += '=' * missing_padding_count
+
+        return json.loads(base64.urlsafe_b64decode(token_data_b64))
+    except (IndexError, ValueError):
+        return {}
+
+
+class Token:
+    """
+    A JWT whose claims are decoded once and for all.
+    """
+
+    def __init__(self, value):
+        self.value = value
+        self.claims = decode_jwt_claims(value)
+
+    @property
+    def expires_at(self):
+        return self.claims.get('exp')
+
+    @property
+    def username(self):
+        return self.claims.get('username')
+
+    @property
+    def user_id(self):
+        user_path = self.claims.get('user')
+
+        if user_path is None:
+            return None
+
+        return int(user_path.split('/')[-1])
+
+    def expires_in(self):
+        if self.expires_at is None:
+            return None
+
+        return self.expires_at - time.time()
+
+    def is_expired(self, margin=0):
+        expires_in = self.expires_in()
+        return (expires_in is not None) and (expires_in <= margin)
+
+
+class TokenCache:
+    """
+    Keep the tokens on disk, encrypted with a key derived from a passphrase, so a new session can reuse a token which
+    is still valid instead of logging in again. Requires the `cryptography` package.
+    """
+
+    KEY_DERIVATION_ITERATIONS = 200000
+
+    def __init__(self, directory, passphrase):
+        if Fernet is None:
+            raise RuntimeError('The token cache requires the "cryptography" package')
+
+        self.directory = directory
+
+        salt = self._load_salt()
+        key = hashlib.pbkdf2_hmac('sha256', passphrase.encode(), salt, self.KEY_DERIVATION_ITERATIONS)
+        self.fernet = Fernet(base64.urlsafe_b64encode(key))
+
+    def _load_salt(self):
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        path = os.path.join(self.directory, 'salt')
+
+        try:
+            with open(path, 'rb') as inf:
+                return inf.read()
+        except FileNotFoundError:
+            salt = os.urandom(16)
+
+            with open(os.open(path, os.O_WRONLY | os.O_CREAT, 0o600), 'wb') as outf:
+                outf.write(salt)
+
+            return salt
+
+    def _get_path(self, url):
+        return os.path.join(self.directory, hashlib.sha1(url.encode()).hexdigest())
+
+    def load(self, url):
+        try:
+            with open(self._get_path(url), 'rb') as inf:
+                return Token(self.fernet.decrypt(inf.read()).decode())
+        except (OSError, InvalidToken):
+            return None
+
+    def store(self, url, token):
+        path = self._get_path(url)
+
+        with open(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as outf:
+            outf.write(self.fernet.encrypt(token.value.encode()))
+
+    def remove(self, url):
+        try:
+            os.remove(self._get_path(url))
+        except FileNotFoundError:
+            pass
+
+
+class TokenManager:
+    """
+    Keep the token of a SmershAPI client valid. The token is renewed shortly before it expires (or when the server
+    rejects it) by logging in again, either with the credentials of the last successful login or with the ones given
+    by `credentials_provider`, a callable returning a (username, password) tuple.
+    """
+
+    DEFAULT_REFRESH_MARGIN = 60
+
+    def __init__(self, api, refresh_margin=DEFAULT_REFRESH_MARGIN, cache=None, credentials_provider=None):
+        self.api = api
+        self.refresh_margin = refresh_margin
+        self.cache = cache
+        self.credentials_provider = credentials_provider
+        self.credentials = None
+        self.token = None
+        self.lock = threading.RLock()
+
+    def set_token(self, value):
+        self.token = None if value is None else Token(value)
+
+        if value is None:
+            self.api.session.headers.pop('Authorization', None)
+        else:
+            self.api.session.headers['Authorization'] = f'Bearer {value}'
+
+    def login(self, username, password):
+        data = {
+            'username': username,
+            'password': password
+        }
+        response = self.api.post(AUTHENTICATION_PATH, data)
+
+        if ('code' in response) and (response['code'] == 401):
+            return False
+
+        with self.lock:
+            self.credentials = (username, password)
+            self.set_token(response['token'])
+
+            if self.cache is not None:
+                self.cache.store(self.api.main_url, self.token)
+
+        return True
+
+    def load_cached_token(self):
+        """
+        Use the cached token of the server if there is one which is still valid. Return whether a token was loaded.
+        """
+
+        if self.cache is None:
+            return False
+
+        token = self.cache.load(self.api.main_url)
+
+        if (token is None) or token.is_expired(self.refresh_margin):
+            return False
+
+        self.set_token(token.value)
+        return True
+
+    @property
+    def can_renew(self):
+        return (self.credentials is not None) or (self.credentials_provider is not None)
+
+    def renew(self):
+        with self.lock:
+            credentials = self.credentials
+
+            if credentials is None:
+                if self.credentials_provider is None:
+                    return False
+
+                credentials = self.credentials_provider()
+
+            return self.login(*credentials)
+
+    def ensure_valid(self):
+        token = self.token
+
+        if (token is None) or not token.is_expired(self.refresh_margin) or not self.can_renew:
+            return
+
+        with self.lock:
+            # Another thread may have renewed the token while we were waiting for the lock
+            if self.token is token:
+                self.renew()
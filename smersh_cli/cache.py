@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from .utils.serialization import get_json_backend
+
+
+class CacheEntry:
+
+    def __init__(self, data, etag=None, last_modified=None):
+        self.data = data
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def validators(self):
+        headers = {}
+
+        if self.etag is not None:
+            headers['If-None-Match'] = self.etag
+
+        if self.last_modified is not None:
+            headers['If-Modified-Since'] = self.last_modified
+
+        return headers
+
+
+class CacheWriter:
+
+    def __init__(self, path, directory, etag, last_modified):
+        self.path = path
+
+        # Write to a temporary file first so concurrent readers never see a partially written entry
+        fd, self.temp_path = tempfile.mkstemp(dir=directory)
+        self.file = os.fdopen(fd, 'wb')
+
+        header = '{{"etag": {}, "last_modified": {}, "data": '.format(json.dumps(etag), json.dumps(last_modified))
+        self.file.write(header.encode())
+
+    def write(self, chunk):
+        self.file.write(chunk)
+
+    def commit(self):
+        """
+        Store the entry. Return False if it could not be stored, the directory of the resource may have been removed by
+        a concurrent invalidation: the response is then simply not cached.
+        """
+
+        try:
+            self.file.write(b'}')
+            self.file.close()
+
+            os.replace(self.temp_path, self.path)
+        except OSError:
+            self.abort()
+            return False
+
+        return True
+
+    def abort(self):
+        self.file.close()
+
+        try:
+            os.remove(self.temp_path)
+        except OSError:
+            pass
+
+
+class HTTPCache:
+    """
+    A persistent cache of GET responses. Entries are never served blindly: they are revalidated by the server with
+    their ETag / Last-Modified validators and only reused when the server answers "304 Not Modified".
+
+    Entries are grouped in one directory per resource (the URL without its query string) so a resource can be
+    invalidated with every variant of it (pages of a collection, ...) at once.
+    """
+
+    def __init__(self, directory, json_backend=None):
+        self.directory = directory
+        self.json_backend = get_json_backend() if json_backend is None else json_backend
+
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def _hash(s):
+        return hashlib.sha1(s.encode()).hexdigest()
+
+    def _get_resource_directory(self, url):
+        return os.path.join(self.directory, self._hash(url.split('?')[0]))
+
+    def _get_entry_path(self, url):
+        return os.path.join(self._get_resource_directory(url), self._hash(url) + '.json')
+
+    def get(self, url):
+        try:
+            with open(self._get_entry_path(url), 'rb') as inf:
+                entry = self.json_backend.loads(inf.read())
+        except (OSError, ValueError, self.json_backend.DecodeError):
+            return None
+
+        return CacheEntry(entry['data'], entry['etag'], entry['last_modified'])
+
+    def set(self, url, response, data):
+        writer = self.create_writer(url, response)
+
+        if writer is not None:
+            writer.write(self.json_backend.dumps(data))
+            writer.commit()
+
+    def create_writer(self, url, response):
+        """
+        Create a writer used to store the body of `response` chunk by chunk as it is received. Return None if the
+        response can't be cached.
+        """
+
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+
+        if (etag is None) and (last_modified is None):
+            # The response can't be revalidated so there is no point in keeping it
+            return None
+
+        directory = self._get_resource_directory(url)
+
+        try:
+            os.makedirs(directory, exist_ok=True)
+
+            return CacheWriter(self._get_entry_path(url), directory, etag, last_modified)
+        except OSError:
+            # Removed by a concurrent invalidation
+            return None
+
+    def invalidate(self, url):
+        """
+        Drop the cached entries of a resource and of the collection it belongs to.
+        """
+
+        resource_url = url.split('?')[0].rstrip('/')
+        collection_url = resource_url.rsplit('/', 1)[0]
+
+        for e in (resource_url, collection_url):
+            shutil.rmtree(self._get_resource_directory(e), ignore_errors=True)
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory, exist_ok=True)
@@ -0,0 +1,44 @@
+import threading
+import weakref
+
+
+class IdentityMap:
+    """
+    The objects of an API session by IRI, so every reference to the same resource resolves to a single instance. The
+    objects are weakly referenced: they are evicted as soon as nothing else uses them.
+    """
+
+    def __init__(self):
+        self.objects = weakref.WeakValueDictionary()
+        self.lock = threading.Lock()
+
+    def get(self, iri):
+        return self.objects.get(iri)
+
+    def add(self, iri, o):
+        """
+        Register `o` under `iri` unless another object already is. Return the registered object.
+        """
+
+        with self.lock:
+            registered = self.objects.get(iri)
+
+            if registered is None:
+                self.objects[iri] = o
+                registered = o
+
+        return registered
+
+    def discard(self, iri):
+        with self.lock:
+            self.objects.pop(iri, None)
+
+    def clear(self):
+        with self.lock:
+            self.objects.clear()
+
+    def __contains__(self, iri):
+        return iri in self.objects
+
+    def __len__(self):
+        return len(self.objects)
@@ -0,0 +1,146 @@
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from requests import HTTPError
+
+from .stats import stats
+
+
+class ReferenceLoader:
+    """
+    Load the lazy stubs of an API session the first time one of their fields is read. The stubs waiting to be loaded
+    are remembered by relation (the field of the class referencing them): loading one of them also loads the other
+    pending stubs of the same relation, in a single batch of concurrent requests. Rendering the references of a list of
+    objects then costs one request per distinct object, sent in parallel, instead of one serial request per reference,
+    while reading an unrelated stub only loads this one.
+    """
+
+    DEFAULT_MAX_BATCH_SIZE = 100
+
+    # Only the most recent stubs of each relation are remembered, the older ones are loaded when they are read
+    MAX_PENDING = 10000
+
+    def __init__(self, api, max_batch_size=DEFAULT_MAX_BATCH_SIZE):
+        self.api = api
+        self.max_batch_size = max_batch_size
+        self.pending = {}
+        self.relations = {}
+        self.loading = {}
+        self.lock = threading.Lock()
+
+    def add(self, stub, relation=None):
+        """
+        Register a stub created for `relation`, a (class, field name) tuple. The stubs without relation are loaded alone.
+        """
+
+        stub._loader = self
+
+        if relation is None:
+            return
+
+        with self.lock:
+            pending = self.pending.setdefault(relation, OrderedDict())
+            pending[stub.id] = weakref.ref(stub)
+            self.relations[stub.id] = relation
+
+            if len(pending) > self.MAX_PENDING:
+                iri, __ = pending.popitem(last=False)
+                self.relations.pop(iri, None)
+
+    def load(self, stub):
+        """
+        Load `stub` along with the other pending stubs of its relation.
+        """
+
+        self.load_many([stub], self.max_batch_size)
+
+    def load_many(self, stubs, batch_size=None):
+        """
+        Load the stubs of `stubs`, of any class, concurrently. The None values and the loaded objects are ignored. If
+        `batch_size` is set, the batch is completed with the pending stubs of the relation of the first one.
+        """
+
+        batch = []
+        loading = []
+
+        with self.lock:
+            relation = None
+
+            if (batch_size is not None) and (len(stubs) > 0) and (stubs[0] is not None):
+                relation = self.relations.get(stubs[0].id)
+
+            for stub in stubs:
+                self._take(stub, batch, loading)
+
+            if relation is not None:
+                pending = self.pending.get(relation, {})
+
+                while (len(batch) < batch_size) and (len(pending) > 0):
+                    iri, ref = pending.popitem(last=False)
+                    self.relations.pop(iri, None)
+                    stub = ref()
+
+                    if stub is not None:
+                        self._take(stub, batch, loading)
+
+        # The identifiers of the stubs change once they are loaded
+        iris = [stub.id for stub in batch]
+
+        try:
+            self._fetch(batch)
+        finally:
+            with self.lock:
+                for iri in iris:
+                    self.loading.pop(iri).set()
+
+        # The stubs already being loaded by another thread
+        for event in loading:
+            event.wait()
+
+    def _take(self, stub, batch, loading):
+        if (stub is None) or not stub.is_lazy():
+            return
+
+        event = self.loading.get(stub.id)
+
+        if event is not None:
+            loading.append(event)
+            return
+
+        self.loading[stub.id] = threading.Event()
+        relation = self.relations.pop(stub.id, None)
+
+        if relation is not None:
+            self.pending[relation].pop(stub.id, None)
+
+        batch.append(stub)
+
+    def _fetch(self, batch):
+        if len(batch) == 0:
+            return
+
+        stats.increment('lazy_load_batches')
+        stats.increment('lazy_loads', len(batch))
+
+        if len(batch) == 1:
+            self._fetch_stub(batch[0])
+            return
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.api.pool_size, len(batch)))) as executor:
+            list(executor.map(self._fetch_stub, batch))
+
+    def _fetch_stub(self, stub):
+        iri = stub.id
+
+        # The stub is updated in place by the decoder, through the identity map
+        self.api.identity_map.add(iri, stub)
+
+        try:
+            stub.__class__.get(self.api, iri)
+        except HTTPError:
+            # A deleted or forbidden object keeps the default values of its fields
+            stats.increment('lazy_load_errors')
+
+        stub._loader = None
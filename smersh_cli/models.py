@@ -1,14 +1,20 @@
+import asyncio
 import copy
+import threading
 from abc import ABC
-from dataclasses import dataclass, fields, field
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import MISSING, dataclass, fields, field
 from typing import List, Optional, Union, get_type_hints
+from urllib.parse import urlencode
 
-from dataclasses_json import dataclass_json
+from dataclasses_json import DataClassJsonMixin, dataclass_json
 from pydantic.typing import NoneType
 from requests import HTTPError
 
 from .api import APIRoles
-from .utils.json import wrap_id_dict, convert_dict_keys_case, clean_none_keys
+from .query import Query
+from .stats import stats
+from .utils.json import clean_none_keys
 from .utils.case import camel_case
 
 
@@ -62,29 +68,384 @@ def is_optional(field):
     return False
 
 
-def lazy_model(_cls):
+class ModelCodec:
+    """
+    The decoder and the encoder of a model class. Their code is generated once from the fields of the class so decoding
+    an object does not inspect its type hints anymore.
+
+    The decoder takes the cleaned data of the API: IRIs of referenced objects become lazy stubs (objects with only their
+    `id`, an IRI, set), embedded objects are decoded by the codec of their class. Given an identity map, the decoder
+    returns the objects it already knows, filled with the new data, instead of creating copies. Given a reference
+    loader, the stubs are loaded the first time one of their fields is read. The encoder returns the data to send
+    to the API: camelCase keys and IRIs for the references.
+
+    The decoded objects keep a snapshot of their fields, so the fields modified since are the only ones sent when they
+    are saved. The modified fields of a known object are kept when new data is merged into it.
+    """
+
+    def __init__(self, cls):
+        self.cls = cls
+
+        # Registered before the references are resolved because the models reference each other
+        _pending_codecs[cls] = self
+
+        type_hints = get_type_hints(cls)
+        self.fields = []
+
+        for f in fields(cls):
+            field_type = type_hints[f.name]
+            target = get_innermost_field(field_type) if is_model(field_type) else None
+            target_codec = None if target is None else get_codec(target)
+
+            self.fields.append((f, is_list(field_type), target_codec))
+
+        self.snapshot = self._compile_snapshot()
+        self.changes = self._compile_changes()
+        self.dirty = self._compile_dirty()
+        self.decode = self._compile_decoder()
+        self.stub = self._compile_stub()
+        self.encode = self._compile_encoder()
+
+    def _get_default_code(self, f, namespace):
+        if f.default is not MISSING:
+            namespace[f'default_{f.name}'] = f.default
+            return f'default_{f.name}'
+
+        if f.default_factory is not MISSING:
+            # Most defaults are empty lists, there is no need to call the factory for those
+            if f.default_factory() == []:
+                return '[]'
+
+            namespace[f'factory_{f.name}'] = f.default_factory
+            return f'factory_{f.name}()'
+
+        return None
+
+    def _compile(self, name, lines, namespace):
+        exec('\n'.join(lines), namespace)
+        return namespace[name]
+
+    def _compile_decoder(self):
+        namespace = {'new': self.cls.__new__, 'cls': self.cls, 'get_iri': self.get_iri, 'snapshot': self.snapshot,
+                     'get_dirty': self.dirty, 'MISSING': MISSING, 'stats': stats}
+        lines = [
+            'def decode(kvs, identity_map=None, loader=None):',
+            '    self = new(cls)',
+            '    merging = False',
+            '    dirty = ()',
+            '    if identity_map is not None:',
+            '        iri = get_iri(kvs.get("id"))',
+            '        if iri is not None:',
+            '            known = identity_map.add(iri, self)',
+            '            merging = known is not self',
+            '            self = known',
+            # The fields modified by the user since the object was loaded are not overwritten
+            '    if merging:',
+            '        previous = self._get_private("_snapshot")',
+            '        if previous is not None:',
+            '            dirty = get_dirty(self, previous)',
+            '    stubs = 0'
+        ]
+
+        for i, (f, is_list_field, target_codec) in enumerate(self.fields):
+            lines.append(f'    if {i} not in dirty:')
+            field_lines = []
+            self._add_decoded_field(field_lines, f, is_list_field, target_codec, namespace)
+            lines.extend('    ' + line for line in field_lines)
+
+        lines.extend([
+            '    if len(dirty) > 0:',
+            '        self._snapshot = tuple(previous[i] if i in dirty else e for i, e in enumerate(snapshot(self)))',
+            '    else:',
+            '        self._snapshot = snapshot(self)',
+            '    stats.increment("from_dict")',
+            '    if stubs > 0:',
+            '        stats.increment("lazy_stubs", stubs)',
+            '    return self'
+        ])
+
+        return self._compile('decode', lines, namespace)
+
+    def _add_decoded_field(self, lines, f, is_list_field, target_codec, namespace):
+        default_code = self._get_default_code(f, namespace)
+
+        if default_code is None:
+            lines.append(f'    value = kvs[{f.name!r}]')
+        else:
+            lines.append(f'    value = kvs.get({f.name!r}, MISSING)')
+
+        if target_codec is not None:
+            namespace[f'codec_{f.name}'] = target_codec
+            namespace[f'relation_{f.name}'] = (self.cls, f.name)
+
+            if is_list_field:
+                lines.extend([
+                    '    if type(value) == list:',
+                    '        stubs += len(value)',
+                    f'        value = [codec_{f.name}.stub(e, identity_map, loader, relation_{f.name}) '
+                    f'if type(e) == str else '
+                    f'codec_{f.name}.decode(e, identity_map, loader) if type(e) == dict else e for e in value]'
+                ])
+            else:
+                lines.extend([
+                    '    if type(value) == str:',
+                    '        stubs += 1',
+                    f'        value = codec_{f.name}.stub(value, identity_map, loader, relation_{f.name})',
+                    '    elif type(value) == dict:',
+                    f'        value = codec_{f.name}.decode(value, identity_map, loader)'
+                ])
+        elif is_list_field:
+            lines.extend([
+                '    if type(value) == list:',
+                '        value = list(value)'
+            ])
+
+        if default_code is None:
+            lines.append(f'    self.{f.name} = value')
+        else:
+            # The fields missing from the data keep their value when it is merged into a known object
+            lines.extend([
+                '    if value is not MISSING:',
+                f'        self.{f.name} = value',
+                '    elif not merging:',
+                f'        self.{f.name} = {default_code}'
+            ])
+
+    def _compile_stub(self):
+        namespace = {'new': self.cls.__new__, 'cls': self.cls, 'get_iri': self.get_iri}
+        lines = [
+            'def stub(iri, identity_map=None, loader=None, relation=None):',
+            '    if identity_map is not None:',
+            '        known = identity_map.get(get_iri(iri))',
+            '        if known is not None:',
+            '            return known',
+            '    self = new(cls)',
+            '    self.id = iri',
+            '    if identity_map is not None:',
+            '        self = identity_map.add(get_iri(iri), self)',
+            '    if (loader is not None) and self.is_lazy():',
+            '        loader.add(self, relation)',
+            '    return self'
+        ]
+
+        return self._compile('stub', lines, namespace)
+
+    def get_iri(self, value):
+        """
+        Return the IRI of a reference which is either an object or an identifier (an IRI or a raw identifier). Raise a
+        TypeError for an object without identifier, which can't be referenced before it is created.
+        """
+
+        if value is None:
+            return None
+
+        if isinstance(value, Model):
+            if value.id is None:
+                raise TypeError(f'The {value.__class__.__name__} object has no identifier')
+
+            return value.iri
+
+        if isinstance(value, str) and value.startswith('/'):
+            return value
+
+        return f'{Model.API_ROOT}/{self.cls.ENDPOINT_NAME}/{value}'
+
+    def _get_encoded_code(self, value_code, f, is_list_field, target_codec, namespace):
+        if target_codec is not None:
+            namespace[f'iri_{f.name}'] = target_codec.get_iri
+
+            if is_list_field:
+                return f'None if {value_code} is None else [iri_{f.name}(e) for e in {value_code}]'
+
+            return f'iri_{f.name}({value_code})'
+
+        if is_list_field:
+            return f'None if {value_code} is None else list({value_code})'
+
+        return value_code
+
+    def _compile_encoder(self):
+        namespace = {}
+        lines = [
+            'def encode(self):',
+            '    return {'
+        ]
+
+        for f, is_list_field, target_codec in self.fields:
+            value_code = self._get_encoded_code(f'self.{f.name}', f, is_list_field, target_codec, namespace)
+            lines.append(f'        {camel_case(f.name)!r}: {value_code},')
+
+        lines.append('    }')
+
+        return self._compile('encode', lines, namespace)
+
+    def _compile_dirty(self):
+        # Unlike the encoder, the references to new objects (without IRI) must not fail
+        namespace = {'key': get_reference_key}
+        lines = [
+            'def dirty(self, snapshot):',
+            '    indexes = set()'
+        ]
+
+        for i, (f, is_list_field, target_codec) in enumerate(self.fields):
+            if target_codec is None:
+                value_code = self._get_encoded_code(f'self.{f.name}', f, is_list_field, None, namespace)
+                previous_code = self._get_encoded_code(f'snapshot[{i}]', f, is_list_field, None, namespace)
+            elif is_list_field:
+                value_code = f'None if self.{f.name} is None else [key(e) for e in self.{f.name}]'
+                previous_code = f'None if snapshot[{i}] is None else [key(e) for e in snapshot[{i}]]'
+            else:
+                value_code = f'key(self.{f.name})'
+                previous_code = f'key(snapshot[{i}])'
+
+            lines.extend([
+                f'    if ({value_code}) != ({previous_code}):',
+                f'        indexes.add({i})'
+            ])
+
+        lines.append('    return indexes')
+
+        return self._compile('dirty', lines, namespace)
+
+    def _compile_snapshot(self):
+        lines = [
+            'def snapshot(self):',
+            '    return ('
+        ]
+
+        # The lists are copied as they are usually modified in place
+        for f, is_list_field, target_codec in self.fields:
+            if is_list_field:
+                lines.append(f'        None if self.{f.name} is None else tuple(self.{f.name}),')
+            else:
+                lines.append(f'        self.{f.name},')
+
+        lines.append('    )')
+
+        return self._compile('snapshot', lines, {})
+
+    def _compile_changes(self):
+        namespace = {}
+        lines = [
+            'def changes(self, snapshot):',
+            '    data = {}'
+        ]
+
+        for i, (f, is_list_field, target_codec) in enumerate(self.fields):
+            # The identifier is part of the URL
+            if f.name == 'id':
+                continue
+
+            value_code = self._get_encoded_code(f'self.{f.name}', f, is_list_field, target_codec, namespace)
+            previous_code = self._get_encoded_code(f'snapshot[{i}]', f, is_list_field, target_codec, namespace)
+
+            lines.extend([
+                f'    value = {value_code}',
+                f'    if value != ({previous_code}):',
+                f'        data[{camel_case(f.name)!r}] = value'
+            ])
+
+        lines.append('    return data')
+
+        return self._compile('changes', lines, namespace)
+
+
+def get_reference_key(value):
+    """
+    Return a value identifying the target of a reference: its IRI, or the object itself if it has no identifier yet.
+    """
+
+    if isinstance(value, Model):
+        return value if value.id is None else value.iri
+
+    return value
+
+
+_codecs_lock = threading.RLock()
+_pending_codecs = {}
+
+
+def get_codec(cls):
+    codec = cls.__dict__.get('_codec')
+
+    if codec is not None:
+        return codec
+
+    with _codecs_lock:
+        codec = cls.__dict__.get('_codec') or _pending_codecs.get(cls)
+
+        if codec is not None:
+            return codec
+
+        building = len(_pending_codecs) > 0
+        codec = ModelCodec(cls)
+
+        # The codecs built along (the referenced models) are only published once they are all complete
+        if not building:
+            for pending_codec in _pending_codecs.values():
+                pending_codec.cls._codec = pending_codec
+
+            _pending_codecs.clear()
+
+    return codec
+
+
+def add_slots(cls):
+    """
+    Recreate a dataclass with __slots__ so its instances don't have a __dict__. The first slotted class of a hierarchy
+    also gets a __weakref__ slot.
+    """
+
+    inherited_slots = {name for base in cls.__mro__[1:] for name in base.__dict__.get('__slots__', ())}
+    slots = tuple(cls.__dict__.get('__slots__', ())) + \
+        tuple(f.name for f in fields(cls) if f.name not in inherited_slots)
 
-    def from_dict_lazy(cls, kvs, *, infer_missing=False):
-        lazy_keys = set()
+    if '__weakref__' not in inherited_slots:
+        slots += ('__weakref__',)
 
-        for field_name, field_type in get_type_hints(cls).items():
-            if (field_name in kvs) and is_model(field_type):
-                value = kvs[field_name]
-                value_type = type(value)
+    namespace = dict(cls.__dict__)
+    namespace['__slots__'] = slots
 
-                if ((value_type == list) and (len(value) > 0) and (type(value[0]) == str)) or (value_type == str):
-                    lazy_keys.add(field_name)
+    # The default values of the fields would conflict with the slots, the dataclass keeps them in its fields anyway
+    for name in slots + ('__dict__',):
+        namespace.pop(name, None)
 
-        wrapped = wrap_id_dict(kvs, lazy_keys)
-        return cls.from_dict_not_lazy(wrapped, infer_missing=infer_missing)
+    slotted_cls = type(cls)(cls.__name__, cls.__bases__, namespace)
+
+    if issubclass(cls, DataClassJsonMixin):
+        DataClassJsonMixin.register(slotted_cls)
+
+    return slotted_cls
+
+
+def get_lazy_repr(dataclass_repr):
+
+    def __repr__(self):
+        # Printing a stub must not load it
+        if self.is_lazy():
+            return f'{self.__class__.__name__}(id={self.id!r})'
+
+        return dataclass_repr(self)
+
+    return __repr__
+
+
+def lazy_model(_cls):
+
+    def from_dict_lazy(cls, kvs, *, infer_missing=False, identity_map=None, loader=None):
+        # The codec needs the type hints of the model which can't be resolved before every model is defined
+        return get_codec(cls).decode(kvs, identity_map, loader)
 
     def wrap(cls):
         for field in fields(cls):
             if (field.name != 'id') and not is_optional(field.type):
                 raise RuntimeError('All fields must be declared optional for a lazy model')
 
+        cls = add_slots(cls)
         cls.from_dict_not_lazy = cls.from_dict
         cls.from_dict = classmethod(from_dict_lazy)
+        cls.__repr__ = get_lazy_repr(cls.__repr__)
+        MODELS[cls.ENDPOINT_NAME] = cls
 
         return cls
 
@@ -94,52 +455,311 @@ def lazy_model(_cls):
     return wrap(_cls)
 
 
+# The lazy models by endpoint name
+MODELS = {}
+
+
+@add_slots
 @dataclass_json
 @dataclass
 class Model(ABC):
+    """
+    The base class of the objects of the API. The models are slotted, and the lazy stubs (objects only known by their
+    IRI) only have their `id` set: their other fields get their default value when they are first read.
+    """
 
     API_ROOT = '/api'
     ENDPOINT_NAME = None
 
+    # The reference loader of a stub and the fields of the object as it was loaded
+    __slots__ = ('_loader', '_snapshot')
+
     id: str
-    
+
+    def __getattr__(self, name):
+        # Only called for attributes which are not set, the fields of the stubs for instance
+        f = self.__dataclass_fields__.get(name)
+
+        if f is None:
+            raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{name}'")
+
+        loader = self._get_private('_loader')
+
+        if loader is not None:
+            loader.load(self)
+
+            try:
+                return object.__getattribute__(self, name)
+            except AttributeError:
+                # The field was not sent by the server
+                pass
+
+        if f.default is not MISSING:
+            value = f.default
+        elif f.default_factory is not MISSING:
+            value = f.default_factory()
+        else:
+            raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{name}'")
+
+        setattr(self, name, value)
+
+        return value
+
+    def _get_private(self, name):
+        try:
+            return object.__getattribute__(self, name)
+        except AttributeError:
+            return None
+
+    @classmethod
+    def get_known(cls, api, id):
+        """
+        Return the loaded object `id` from the identity map of `api`, or None if it is unknown or only a lazy stub.
+        """
+
+        o = api.identity_map.get(get_codec(cls).get_iri(id))
+
+        if (o is None) or o.is_lazy():
+            return None
+
+        stats.increment('identity_map_hits')
+
+        return o
+
     @classmethod
-    def get(cls, api, id):
-        return cls.from_dict(api.get(f'{Model.API_ROOT}/{cls.ENDPOINT_NAME}/{id}'))
+    def get_projection_parameters(cls, fields):
+        """
+        Return the query parameters requesting only the fields of `fields` (the sparse fieldsets of API Platform), all
+        of them if `fields` is None. The identifier is always returned.
+        """
+
+        if fields is None:
+            return []
+
+        for name in fields:
+            if name not in cls.__dataclass_fields__:
+                raise ValueError(f'Unknown field "{name}" for {cls.__name__}')
+
+        return [('properties[]', camel_case(name)) for name in fields if name != 'id']
 
     @classmethod
-    def all(cls, api):
-        results = []
+    def get_projection(cls, fields):
+        parameters = cls.get_projection_parameters(fields)
 
-        for e in api.get(f'{Model.API_ROOT}/{cls.ENDPOINT_NAME}'):
-            results.append(cls.from_dict(e))
+        return '' if len(parameters) == 0 else '?' + urlencode(parameters)
 
-        return results
+    @classmethod
+    def query(cls, api):
+        """
+        Return a query of the objects of this model, filtered, ordered and limited by the server.
+        """
+
+        return Query(cls, api, get_codec(cls))
+
+    @classmethod
+    def from_response(cls, api, data, fields=None):
+        # The objects with only some of their fields are not shared with the rest of the session, the other fields have
+        # their default value
+        if fields is not None:
+            return cls.from_dict(data)
+
+        return cls.from_dict(data, identity_map=api.identity_map, loader=api.loader)
+
+    @classmethod
+    def get(cls, api, id, cached=False, fields=None):
+        """
+        Request the object `id` and return the instance shared by the session, updated with the fields of the server.
+        If `cached` is set, an object already loaded in this session is returned without requesting it again. If
+        `fields` is set, only these fields are requested.
+        """
+
+        o = cls.get_known(api, id) if (cached and (fields is None)) else None
+
+        if o is None:
+            data = api.get(get_codec(cls).get_iri(id) + cls.get_projection(fields))
+            o = cls.from_response(api, data, fields)
+
+        return o
+
+    @classmethod
+    async def aget(cls, api, id, cached=False, fields=None):
+        o = cls.get_known(api, id) if (cached and (fields is None)) else None
+
+        if o is None:
+            data = await api.get(get_codec(cls).get_iri(id) + cls.get_projection(fields))
+            o = cls.from_response(api, data, fields)
+
+        return o
+
+    @classmethod
+    def get_many(cls, api, ids, max_workers=None, fields=None):
+        """
+        Fetch several objects concurrently. Return the objects found, in the order of `ids`, and a list of
+        (id, HTTPError) pairs for the ones that could not be fetched.
+        """
+
+        def get(id):
+            try:
+                return cls.get(api, id, fields=fields), None
+            except HTTPError as e:
+                return None, e
+
+        if max_workers is None:
+            max_workers = api.pool_size
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(ids)))) as executor:
+            results = list(executor.map(get, ids))
+
+        return cls._split_results(ids, results)
+
+    @classmethod
+    async def aget_many(cls, api, ids, fields=None):
+        async def get(id):
+            try:
+                return await cls.aget(api, id, fields=fields), None
+            except HTTPError as e:
+                return None, e
+
+        results = await asyncio.gather(*[get(id) for id in ids])
+
+        return cls._split_results(ids, results)
+
+    @staticmethod
+    def _split_results(ids, results):
+        objects = []
+        errors = []
+
+        for id, (o, e) in zip(ids, results):
+            if e is None:
+                objects.append(o)
+            else:
+                errors.append((id, e))
+
+        return objects, errors
+
+    @classmethod
+    def iter_all(cls, api, fields=None):
+        for e in api.iter_collection(f'{Model.API_ROOT}/{cls.ENDPOINT_NAME}{cls.get_projection(fields)}'):
+            yield cls.from_response(api, e, fields)
+
+    @classmethod
+    async def aiter_all(cls, api, fields=None):
+        async for e in api.iter_collection(f'{Model.API_ROOT}/{cls.ENDPOINT_NAME}{cls.get_projection(fields)}'):
+            yield cls.from_response(api, e, fields)
+
+    @classmethod
+    def all(cls, api, fields=None):
+        return list(cls.iter_all(api, fields))
+
+    @classmethod
+    async def aall(cls, api, fields=None):
+        return [e async for e in cls.aiter_all(api, fields)]
+
+    def encode(self):
+        """
+        Return the data of the object as expected by the API.
+        """
+
+        return get_codec(self.__class__).encode(self)
+
+    def get_changes(self):
+        """
+        Return the data of the fields modified since the object was loaded, as expected by the API. Every field is
+        returned if the object was not loaded from the API.
+        """
+
+        snapshot = self._get_private('_snapshot')
+
+        if snapshot is None:
+            return self.encode()
+
+        return get_codec(self.__class__).changes(self, snapshot)
 
     def save(self, api, new=False):
-        data = convert_dict_keys_case(self._export(), camel_case)
+        """
+        Create the object, or update the fields modified since it was loaded. No request is sent if none was.
+        """
+
+        if new or (self.id is None):
+            response = api.post(f'{Model.API_ROOT}/{self.ENDPOINT_NAME}', self.encode())
+            self.id = response['id'].split('/')[-1]
+            api.identity_map.add(self.iri, self)
+        else:
+            data = clean_none_keys(self.get_changes())
+
+            if len(data) == 0:
+                stats.increment('unchanged_saves')
+                return self
 
+            api.patch(self.iri, data)
+
+        self._snapshot = get_codec(self.__class__).snapshot(self)
+
+        return self
+
+    async def asave(self, api, new=False):
         if new or (self.id is None):
-            response = api.post(f'{Model.API_ROOT}/{self.ENDPOINT_NAME}', data)
+            response = await api.post(f'{Model.API_ROOT}/{self.ENDPOINT_NAME}', self.encode())
             self.id = response['id'].split('/')[-1]
+            api.identity_map.add(self.iri, self)
         else:
-            api.patch(self.iri, clean_none_keys(data))
+            data = clean_none_keys(self.get_changes())
+
+            if len(data) == 0:
+                stats.increment('unchanged_saves')
+                return self
+
+            await api.patch(self.iri, data)
+
+        self._snapshot = get_codec(self.__class__).snapshot(self)
 
         return self
 
     def delete(self, api):
         try:
             api.delete(self.iri)
+            api.identity_map.discard(self.iri)
+            return True
+        except HTTPError:
+            return False
+
+    async def adelete(self, api):
+        try:
+            await api.delete(self.iri)
+            api.identity_map.discard(self.iri)
             return True
         except HTTPError:
             return False
 
     def fetch(self, api):
+        """
+        Request the object from the server, even if it is already loaded in this session.
+        """
+
+        stats.increment('refetches')
         return self.get(api, self.id.split('/')[-1])
 
+    async def afetch(self, api):
+        stats.increment('refetches')
+        return await self.aget(api, self.id.split('/')[-1])
+
+    def refresh(self, api):
+        """
+        Request the object again and update every field with the ones of the server, discarding the unsaved
+        modifications. Return the instance shared by the session, which is this object unless another copy was already
+        known.
+        """
+
+        api.identity_map.add(self.iri, self)._snapshot = None
+        return self.get(api, self.id.split('/')[-1])
+
+    async def arefresh(self, api):
+        api.identity_map.add(self.iri, self)._snapshot = None
+        return await self.aget(api, self.id.split('/')[-1])
+
     def is_lazy(self):
         # TODO: It could be better to test with a regex to be sure it's a link but for now it will be good enough
-        return self.id[0] == '/'
+        return (self.id is not None) and (self.id[0] == '/')
 
     @property
     def iri(self):
@@ -148,36 +768,6 @@ class Model(ABC):
 
         return f'{Model.API_ROOT}/{self.ENDPOINT_NAME}/{self.id}'
 
-    def _export(self):
-        data = {}
-
-        for field_name, field_type in get_type_hints(self.__class__).items():
-            field_value = getattr(self, field_name)
-
-            data[field_name] = self._export_field(field_type, field_value)
-
-        return data
-
-    def _export_field(self, field_type, field_value):
-        if is_list(field_type):
-            l = []
-            item_type = get_innermost_field(field_type)
-
-            for e in field_value:
-                l.append(self._export_field(item_type, e))
-
-            return l
-        elif is_model(field_type):
-            if issubclass(field_value.__class__, Model):
-                return field_value.iri
-            else:
-                # Here we handle the case were user has specified an ID of the model
-                # So we create an instance of this model, assign this id to it and then get the iri
-                # That's dirty but it works
-                return get_innermost_field(field_type)(id=field_value).iri
-
-        return field_value
-
 
 @lazy_model
 @dataclass_json
@@ -0,0 +1,180 @@
+import copy
+import itertools
+from urllib.parse import urlencode
+
+from .utils.case import camel_case
+
+# The lookups of the API Platform filters, sent as field[lookup]=value
+LOOKUPS = ('after', 'before', 'strictly_after', 'strictly_before', 'gt', 'gte', 'lt', 'lte', 'between', 'exact',
+           'partial', 'start', 'end', 'word_start')
+
+
+class Query:
+    """
+    A lazily evaluated request of the objects of a model. The filters, the ordering and the limit are compiled to the
+    query parameters of the API Platform filters and pagination, so they are applied by the server. Nothing is requested
+    before the query is iterated, the results are then streamed page by page.
+
+    Each method returns a new query, so a query can be refined without modifying it:
+
+        Host.query(api).where(mission=12, checked=False).order_by('name').limit(100)
+    """
+
+    def __init__(self, model, api, codec):
+        self.model = model
+        self.api = api
+        self.codec = codec
+        self.filters = []
+        self.ordering = []
+        self.count = None
+        self.fields = None
+
+    def _copy(self):
+        query = copy.copy(self)
+        query.filters = list(self.filters)
+        query.ordering = list(self.ordering)
+
+        return query
+
+    def where(self, **filters):
+        """
+        Only keep the objects whose fields have the given values. A list of values matches any of them, a model or an
+        identifier matches a reference, and None matches a missing value. A lookup can follow the field name, like
+        `created_at__after='2021-01-01'`.
+        """
+
+        query = self._copy()
+
+        for name, value in filters.items():
+            name, __, lookup = name.partition('__')
+
+            if (lookup != '') and (lookup not in LOOKUPS):
+                raise ValueError(f'Unknown lookup "{lookup}"')
+
+            query.filters.append((self._get_field(name), lookup, value))
+
+        return query
+
+    def order_by(self, *names):
+        """
+        Sort the objects by the given fields, in descending order for the names starting with "-".
+        """
+
+        query = self._copy()
+
+        for name in names:
+            if name.startswith('-'):
+                query.ordering.append((self._get_field(name[1:]), 'desc'))
+            else:
+                query.ordering.append((self._get_field(name), 'asc'))
+
+        return query
+
+    def limit(self, count):
+        if count < 0:
+            raise ValueError('The limit must be positive')
+
+        query = self._copy()
+        query.count = count
+
+        return query
+
+    def only(self, *fields):
+        """
+        Request only the given fields, see `Model.get_projection_parameters`.
+        """
+
+        query = self._copy()
+        query.fields = fields
+
+        return query
+
+    def _get_field(self, name):
+        for f, is_list, target_codec in self.codec.fields:
+            if f.name == name:
+                return f, target_codec
+
+        raise ValueError(f'Unknown field "{name}" for {self.model.__name__}')
+
+    def _get_value(self, value, target_codec):
+        if hasattr(value, 'iri'):
+            return value.iri
+
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+
+        if (target_codec is not None) and (value is not None):
+            return target_codec.get_iri(str(value))
+
+        return str(value)
+
+    def get_parameters(self):
+        parameters = []
+
+        for (f, target_codec), lookup, value in self.filters:
+            name = camel_case(f.name)
+
+            if value is None:
+                parameters.append((f'exists[{name}]', 'false'))
+            elif isinstance(value, (list, tuple, set)):
+                parameters.extend((f'{name}[]', self._get_value(e, target_codec)) for e in value)
+            elif lookup != '':
+                parameters.append((f'{name}[{lookup}]', self._get_value(value, target_codec)))
+            else:
+                parameters.append((name, self._get_value(value, target_codec)))
+
+        for (f, target_codec), direction in self.ordering:
+            parameters.append((f'order[{camel_case(f.name)}]', direction))
+
+        # A single page is enough for a small limit
+        if self.count is not None:
+            parameters.append(('itemsPerPage', str(max(1, self.count))))
+
+        parameters.extend(self.model.get_projection_parameters(self.fields))
+
+        return parameters
+
+    def get_path(self):
+        path = f'{self.model.API_ROOT}/{self.model.ENDPOINT_NAME}'
+        parameters = self.get_parameters()
+
+        return path if len(parameters) == 0 else f'{path}?{urlencode(parameters)}'
+
+    def __iter__(self):
+        if self.count == 0:
+            return
+
+        members = self.api.iter_collection(self.get_path(), self.count)
+
+        try:
+            for e in itertools.islice(members, self.count):
+                yield self.model.from_response(self.api, e, self.fields)
+        finally:
+            # Stop downloading the next pages
+            members.close()
+
+    async def __aiter__(self):
+        if self.count == 0:
+            return
+
+        members = self.api.iter_collection(self.get_path(), self.count)
+        i = 0
+
+        try:
+            async for e in members:
+                if (self.count is not None) and (i >= self.count):
+                    break
+
+                i += 1
+                yield self.model.from_response(self.api, e, self.fields)
+        finally:
+            await members.aclose()
+
+    def all(self):
+        return list(self)
+
+    async def aall(self):
+        return [e async for e in self]
+
+    def first(self):
+        return next(iter(self.limit(1)), None)
@@ -0,0 +1,569 @@
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from .models import MODELS, Model, get_codec
+from .stats import stats
+from .utils.case import camel_case
+from .utils.json import get_next_page
+
+
+class SyncResult:
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.pages = 0
+        self.changed_pages = 0
+        self.objects = 0
+        self.removed = 0
+        self.duration = 0.0
+
+
+class Replica:
+    """
+    A local copy of the collections of the API in a SQLite database, so the objects can be read without contacting the
+    server (and when it can't be reached). Each endpoint is mirrored in its own table, with an index on the references
+    to other objects.
+
+    The replica is updated by `sync`: the pages of the collections are requested again with their ETag, so only the
+    pages which changed since the previous synchronization are downloaded. The objects created, modified or deleted
+    through the API are written to the replica as well.
+
+    The replica only answers the requests when the last synchronization of the endpoint is more recent than `max_age`
+    seconds (unless the server can't be reached), otherwise the requests are sent to the server.
+    """
+
+    DEFAULT_MAX_AGE = 3600
+    DEFAULT_PAGE_SIZE = 100
+    SCHEMA_VERSION = 1
+
+    # The number of rows read at once when streaming a collection
+    FETCH_SIZE = 1000
+
+    def __init__(self, path, max_age=DEFAULT_MAX_AGE, page_size=DEFAULT_PAGE_SIZE, json_backend=None):
+        self.path = path
+        self.max_age = max_age
+        self.page_size = page_size
+        self.json_backend = json_backend
+        self.lock = threading.RLock()
+
+        directory = os.path.dirname(path)
+
+        if directory != '':
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+
+        # The replica holds the credentials of the missions
+        os.close(os.open(path, os.O_CREAT | os.O_RDWR, 0o600))
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+
+        self.references = {endpoint: self._get_reference_fields(cls) for endpoint, cls in MODELS.items()}
+        self._create_schema()
+        self.synced_at = dict(self.connection.execute('SELECT endpoint, synced_at FROM endpoints'))
+
+    @staticmethod
+    def _get_reference_fields(cls):
+        # (key of the JSON-LD data, column, whether it is a list, endpoint of the referenced objects)
+        return [(camel_case(f.name), f.name, is_list, target_codec.cls.ENDPOINT_NAME)
+                for f, is_list, target_codec in get_codec(cls).fields if target_codec is not None]
+
+    def _create_schema(self):
+        with self.lock:
+            version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+
+            if version != self.SCHEMA_VERSION:
+                tables = [row[0] for row in self.connection.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table'")]
+
+                for table in tables:
+                    self.connection.execute(f'DROP TABLE "{table}"')
+
+            self.connection.execute('CREATE TABLE IF NOT EXISTS endpoints (endpoint TEXT PRIMARY KEY, synced_at REAL)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, endpoint TEXT NOT NULL, '
+                                    'etag TEXT NOT NULL, ids TEXT NOT NULL)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS refs (source TEXT NOT NULL, field TEXT NOT NULL, '
+                                    'target TEXT NOT NULL)')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS refs_target ON refs (target, field)')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS refs_source ON refs (source)')
+
+            for endpoint, references in self.references.items():
+                columns = ''.join(f', "{column}" TEXT' for key, column, is_list, target in references if not is_list)
+                self.connection.execute(f'CREATE TABLE IF NOT EXISTS "{endpoint}" (id INTEGER PRIMARY KEY, '
+                                        f'data TEXT NOT NULL, synced_at REAL NOT NULL{columns})')
+
+                for key, column, is_list, target in references:
+                    if not is_list:
+                        self.connection.execute(f'CREATE INDEX IF NOT EXISTS "{endpoint}_{column}" '
+                                                f'ON "{endpoint}" ("{column}")')
+
+            self.connection.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def _dumps(self, data):
+        if self.json_backend is None:
+            return json.dumps(data)
+
+        dumped = self.json_backend.dumps(data)
+
+        return dumped.decode() if isinstance(dumped, bytes) else dumped
+
+    def _loads(self, s):
+        return json.loads(s) if self.json_backend is None else self.json_backend.loads(s)
+
+    @staticmethod
+    def _parse_path(path):
+        """
+        Return the endpoint, the identifier (None for a collection) and the query parameters of a path of the API, or
+        None if it is not the path of a mirrored endpoint.
+        """
+
+        url = urlsplit(path)
+
+        if not url.path.startswith(Model.API_ROOT + '/'):
+            return None
+
+        parts = url.path[len(Model.API_ROOT) + 1:].rstrip('/').split('/')
+
+        if (parts[0] not in MODELS) or (len(parts) > 2):
+            return None
+
+        id = None
+
+        if len(parts) == 2:
+            try:
+                id = int(parts[1])
+            except ValueError:
+                return None
+
+        return parts[0], id, parse_qs(url.query)
+
+    @staticmethod
+    def _get_id(item):
+        # The projections and the embedded objects may only have their IRI
+        id = item.get('id')
+
+        if id is None:
+            id = item['@id'].rstrip('/').rsplit('/', 1)[-1]
+
+        return int(id)
+
+    def is_fresh(self, endpoint):
+        synced_at = self.synced_at.get(endpoint)
+
+        if synced_at is None:
+            return False
+
+        return (self.max_age is None) or (time.time() - synced_at <= self.max_age)
+
+    def get(self, path, stale=False):
+        """
+        Return the JSON-LD data of the GET request of `path` (an object or a collection), or None if the replica can't
+        answer it: the endpoint is not synchronized or too old (unless `stale` is set), the object is not in the
+        replica, or the query uses filters the replica does not support.
+        """
+
+        parsed = self._parse_path(path)
+
+        if parsed is None:
+            return None
+
+        endpoint, id, query = parsed
+
+        if id is None:
+            members = self.iter_collection(path, stale)
+
+            if members is None:
+                return None
+
+            members = list(members)
+
+            return {'@type': 'hydra:Collection', 'hydra:member': members, 'hydra:totalItems': len(members)}
+
+        if (not stale) and (not self.is_fresh(endpoint)):
+            return None
+
+        with self.lock:
+            row = self.connection.execute(f'SELECT data, synced_at FROM "{endpoint}" WHERE id = ?', (id,)).fetchone()
+
+        # The objects referencing a modified object are outdated until they are read again from the server
+        if (row is None) or ((not stale) and (row[1] == 0)):
+            return None
+
+        stats.increment('replica_reads')
+
+        return self._loads(row[0])
+
+    def iter_collection(self, path, stale=False):
+        """
+        Return an iterator over the JSON-LD members of the collection at `path`, or None if the replica can't answer
+        the request. Only the projections (which are ignored) and the equality filters on the identifiers and the
+        references are supported. The collections holding outdated objects are requested from the server, unless
+        `stale` is set.
+        """
+
+        parsed = self._parse_path(path)
+
+        if parsed is None:
+            return None
+
+        endpoint, id, query = parsed
+
+        if (id is not None) or ((not stale) and (not self.is_fresh(endpoint))):
+            return None
+
+        conditions = []
+        arguments = []
+        limit = None
+        references = {key: (column, is_list, target) for key, column, is_list, target in self.references[endpoint]}
+
+        for key, values in query.items():
+            name = key[:-2] if key.endswith('[]') else key
+
+            if name == 'properties':
+                continue
+
+            if name == 'itemsPerPage':
+                # Only sent alone by the queries with a limit
+                limit = int(values[-1])
+                continue
+
+            if name == 'id':
+                try:
+                    ids = [int(e.rsplit('/', 1)[-1]) for e in values]
+                except ValueError:
+                    return None
+
+                conditions.append(f'id IN ({", ".join("?" * len(ids))})')
+                arguments.extend(ids)
+                continue
+
+            if name not in references:
+                return None
+
+            column, is_list, target = references[name]
+            iris = [e if e.startswith('/') else f'{Model.API_ROOT}/{target}/{e}' for e in values]
+            placeholders = ', '.join('?' * len(iris))
+
+            if is_list:
+                conditions.append(f'(? || id) IN (SELECT source FROM refs WHERE field = ? AND target IN ({placeholders}))')
+                arguments.extend([f'{Model.API_ROOT}/{endpoint}/', column] + iris)
+            else:
+                conditions.append(f'"{column}" IN ({placeholders})')
+                arguments.extend(iris)
+
+        if (not stale) and self._has_outdated_rows(endpoint, conditions, arguments):
+            stats.increment('replica_outdated_reads')
+            return None
+
+        stats.increment('replica_reads')
+
+        return self._iter_rows(endpoint, conditions, arguments, limit)
+
+    def _has_outdated_rows(self, endpoint, conditions, arguments):
+        where = ' AND '.join(conditions + ['synced_at = 0'])
+
+        with self.lock:
+            return self.connection.execute(f'SELECT 1 FROM "{endpoint}" WHERE {where} LIMIT 1',
+                                           arguments).fetchone() is not None
+
+    def _iter_rows(self, endpoint, conditions, arguments, limit):
+        # The rows are read by chunks in the order of the identifiers, without keeping a cursor open between them
+        last_id = None
+        count = 0
+
+        while (limit is None) or (count < limit):
+            chunk_conditions = list(conditions)
+            chunk_arguments = list(arguments)
+
+            if last_id is not None:
+                chunk_conditions.append('id > ?')
+                chunk_arguments.append(last_id)
+
+            where = '' if len(chunk_conditions) == 0 else ' WHERE ' + ' AND '.join(chunk_conditions)
+            size = self.FETCH_SIZE if limit is None else min(self.FETCH_SIZE, limit - count)
+
+            with self.lock:
+                rows = self.connection.execute(f'SELECT id, data FROM "{endpoint}"{where} ORDER BY id LIMIT {size}',
+                                               chunk_arguments).fetchall()
+
+            for id, data in rows:
+                yield self._loads(data)
+
+            if len(rows) < size:
+                return
+
+            last_id = rows[-1][0]
+            count += len(rows)
+
+    def _get_row(self, endpoint, item, synced_at):
+        references = self.references[endpoint]
+        row = [self._get_id(item), self._dumps(item), synced_at]
+        refs = []
+        source = item['@id']
+
+        for key, column, is_list, target in references:
+            value = item.get(key)
+
+            if is_list:
+                for e in (value or []):
+                    refs.append((source, column, e['@id'] if isinstance(e, dict) else e))
+            else:
+                row.append(value['@id'] if isinstance(value, dict) else value)
+
+        return row, refs
+
+    def _store(self, endpoint, items, synced_at):
+        # Must be called with the lock held, inside a transaction
+        columns = ''.join(f', "{column}"' for key, column, is_list, target in self.references[endpoint]
+                          if not is_list)
+        placeholders = ', '.join('?' * (3 + columns.count(',')))
+        rows = []
+        refs = []
+
+        for item in items:
+            row, item_refs = self._get_row(endpoint, item, synced_at)
+            rows.append(row)
+            refs.extend(item_refs)
+
+        self.connection.executemany(f'INSERT OR REPLACE INTO "{endpoint}" (id, data, synced_at{columns}) '
+                                    f'VALUES ({placeholders})', rows)
+        self.connection.executemany('DELETE FROM refs WHERE source = ?', [(e['@id'],) for e in items])
+        self.connection.executemany('INSERT INTO refs (source, field, target) VALUES (?, ?, ?)', refs)
+
+    def _get_targets(self, endpoint, id):
+        # The IRIs of the objects referenced by an object of the replica
+        row = self.connection.execute(f'SELECT data FROM "{endpoint}" WHERE id = ?', (id,)).fetchone()
+        targets = set()
+
+        if row is not None:
+            item = self._loads(row[0])
+
+            for key, column, is_list, target in self.references[endpoint]:
+                value = item.get(key)
+
+                for e in (value if is_list else [value]) if value is not None else []:
+                    targets.add(e['@id'] if isinstance(e, dict) else e)
+
+        return targets
+
+    def _mark_outdated(self, iris):
+        # The inverse references of these objects may have been changed by the server
+        for iri in iris:
+            parsed = self._parse_path(iri)
+
+            if (parsed is not None) and (parsed[1] is not None):
+                self.connection.execute(f'UPDATE "{parsed[0]}" SET synced_at = 0 WHERE id = ?', (parsed[1],))
+
+    def store(self, data, written=False):
+        """
+        Write an object received from the server to the replica. If `written` is set, the object was created or
+        modified by this client: the objects it referenced before and after the modification are marked as outdated.
+        """
+
+        if (type(data) != dict) or ('@id' not in data):
+            return
+
+        parsed = self._parse_path(data['@id'])
+
+        if (parsed is None) or (parsed[1] is None):
+            return
+
+        endpoint, id, __ = parsed
+        item = {k: v for k, v in data.items() if k != '@context'}
+
+        with self.lock, self.connection:
+            if written:
+                targets = self._get_targets(endpoint, id)
+
+            self._store(endpoint, [item], time.time())
+
+            if written:
+                self._mark_outdated(targets | self._get_targets(endpoint, id))
+
+    def record(self, method, path, data):
+        """
+        Update the replica with the response of a request sent to the server.
+        """
+
+        if method == 'GET':
+            # The projections only hold some of the fields
+            if '?' not in path:
+                self.store(data)
+        elif method == 'DELETE':
+            self.remove(path)
+        elif (type(data) == dict) and ('@id' in data):
+            self.store(data, written=True)
+        elif path.startswith(Model.API_ROOT + '/'):
+            # A modification whose effects are unknown, like an upload of hosts
+            self.expire()
+
+    def remove(self, path):
+        """
+        Remove a deleted object from the replica.
+        """
+
+        parsed = self._parse_path(path)
+
+        if (parsed is None) or (parsed[1] is None):
+            return
+
+        endpoint, id, __ = parsed
+
+        with self.lock, self.connection:
+            self._mark_outdated(self._get_targets(endpoint, id))
+            self.connection.execute(f'DELETE FROM "{endpoint}" WHERE id = ?', (id,))
+            self.connection.execute('DELETE FROM refs WHERE source = ?', (f'{Model.API_ROOT}/{endpoint}/{id}',))
+
+    def expire(self, endpoints=None):
+        """
+        Send the next requests of `endpoints` (every endpoint by default) to the server until they are synchronized
+        again.
+        """
+
+        with self.lock, self.connection:
+            for endpoint in (list(self.synced_at) if endpoints is None else endpoints):
+                self.synced_at.pop(endpoint, None)
+                self.connection.execute('DELETE FROM endpoints WHERE endpoint = ?', (endpoint,))
+
+    def count(self, endpoint):
+        with self.lock:
+            return self.connection.execute(f'SELECT COUNT(*) FROM "{endpoint}"').fetchone()[0]
+
+    def sync(self, api, endpoints=None):
+        """
+        Download the new and modified objects of `endpoints` (every endpoint by default) and remove the deleted ones.
+        Return a SyncResult by endpoint.
+        """
+
+        endpoints = list(MODELS) if endpoints is None else endpoints
+
+        return {endpoint: self.sync_endpoint(api, endpoint) for endpoint in endpoints}
+
+    def _get_page_path(self, endpoint, page):
+        return f'{Model.API_ROOT}/{endpoint}?{urlencode([("itemsPerPage", self.page_size), ("page", page)])}'
+
+    def _fetch_page(self, api, endpoint, page, result):
+        """
+        Download a page of a collection unless it did not change since the previous synchronization. Return the
+        identifiers of its members and the number of its last page (None if it is unknown).
+        """
+
+        path = self._get_page_path(endpoint, page)
+
+        with self.lock:
+            row = self.connection.execute('SELECT etag, ids FROM pages WHERE url = ?', (path,)).fetchone()
+
+            # The outdated objects of an unchanged page are downloaded again
+            if row is not None:
+                ids = self._loads(row[1])
+
+                if self._has_outdated_rows(endpoint, [f'id IN ({", ".join("?" * len(ids))})'], ids):
+                    row = None
+
+        headers = {'Content-Type': 'application/ld+json'}
+
+        if row is not None:
+            headers['If-None-Match'] = row[0]
+
+        response = api.send('GET', api.main_url + path, headers=headers)
+
+        if (row is not None) and (response.status_code == 304):
+            api.record_transfer(response, None, 0)
+            stats.increment('replica_unchanged_pages')
+
+            return self._loads(row[1]), None
+
+        api.check_response(response)
+        api.record_transfer(response, None, len(response.content))
+        data = api.json_backend.loads(response.content)
+        members = [e for e in data.get('hydra:member', []) if (type(e) == dict) and ('@id' in e)]
+        ids = [self._get_id(e) for e in members]
+        etag = response.headers.get('ETag')
+
+        with self.lock, self.connection:
+            self._store(endpoint, members, time.time())
+
+            if etag is not None:
+                self.connection.execute('INSERT OR REPLACE INTO pages (url, endpoint, etag, ids) VALUES (?, ?, ?, ?)',
+                                        (path, endpoint, etag, self._dumps(ids)))
+
+            # The empty page following the last one is not counted
+            if len(members) > 0:
+                result.changed_pages += 1
+                result.objects += len(members)
+
+        stats.increment('replica_changed_pages')
+
+        last_page = None
+
+        if get_next_page(data) is None:
+            last_page = page
+        elif len(members) > 0:
+            last_page = math.ceil(data.get('hydra:totalItems', 0) / len(members))
+
+        return ids, last_page
+
+    def sync_endpoint(self, api, endpoint):
+        start = time.perf_counter()
+        started_at = time.time()
+        result = SyncResult(endpoint)
+        seen = set()
+
+        # The first page gives the number of pages, which are then requested concurrently
+        ids, last_page = self._fetch_page(api, endpoint, 1, result)
+        seen.update(ids)
+        known_count = last_page is not None
+
+        if not known_count:
+            # The first page did not change: the collection has at least as many pages as before
+            with self.lock:
+                last_page = max(1, self.connection.execute('SELECT COUNT(*) FROM pages WHERE endpoint = ?',
+                                                           (endpoint,)).fetchone()[0])
+
+        pages = list(range(2, last_page + 1))
+
+        with ThreadPoolExecutor(max_workers=max(1, min(api.pool_size, len(pages)))) as executor:
+            for ids, __ in executor.map(lambda page: self._fetch_page(api, endpoint, page, result), pages):
+                seen.update(ids)
+
+        # The objects added since the previous synchronization may be on new pages
+        while not known_count:
+            ids, __ = self._fetch_page(api, endpoint, last_page + 1, result)
+
+            if len(ids) == 0:
+                break
+
+            last_page += 1
+            seen.update(ids)
+
+        result.pages = last_page
+
+        with self.lock, self.connection:
+            removed = [row[0] for row in self.connection.execute(f'SELECT id FROM "{endpoint}"')
+                       if row[0] not in seen]
+
+            for id in removed:
+                self.connection.execute(f'DELETE FROM "{endpoint}" WHERE id = ?', (id,))
+                self.connection.execute('DELETE FROM refs WHERE source = ?', (f'{Model.API_ROOT}/{endpoint}/{id}',))
+
+            self.connection.execute('DELETE FROM pages WHERE endpoint = ? AND url NOT IN ({})'.format(
+                ', '.join('?' * result.pages)), [endpoint] + [self._get_page_path(endpoint, n)
+                                                             for n in range(1, result.pages + 1)])
+            self.connection.execute('INSERT OR REPLACE INTO endpoints (endpoint, synced_at) VALUES (?, ?)',
+                                    (endpoint, started_at))
+            self.synced_at[endpoint] = started_at
+
+        result.removed = len(removed)
+        result.duration = time.perf_counter() - start
+
+        return result
@@ -0,0 +1,260 @@
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from collections import namedtuple
+from urllib.parse import parse_qs, urlsplit
+
+from .models import MODELS, Model
+from .stats import stats
+from .utils.case import camel_case
+
+# The fields indexed for each endpoint, the first one is the title of the hits
+INDEXED_FIELDS = {
+    'vulns': ('name', 'description', 'remediation'),
+    'steps': ('description',),
+    'hosts': ('name', 'technology'),
+    'positive_points': ('name', 'description'),
+    'negative_points': ('name', 'description')
+}
+
+# The endpoints are numbered to build the row identifiers of the documents: they must keep their order
+ENDPOINTS = tuple(INDEXED_FIELDS)
+
+# Markers of the matched terms in the titles and snippets of the hits
+MATCH_START = '\x02'
+MATCH_END = '\x03'
+
+SearchHit = namedtuple('SearchHit', ['endpoint', 'id', 'title', 'snippet', 'score'])
+
+
+class SearchIndex:
+    """
+    A full-text index of the objects received from the server, kept in an SQLite FTS5 table (an inverted index ranking
+    the hits with BM25). The objects are indexed as they are fetched or saved, and the index is kept between sessions,
+    so the search itself never contacts the server.
+    """
+
+    SCHEMA_VERSION = 1
+    BATCH_SIZE = 500
+
+    # The matches in the titles weigh more than the ones in the other fields
+    TITLE_WEIGHT = 5.0
+    BODY_WEIGHT = 1.0
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+
+        if directory != '':
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+
+        os.close(os.open(path, os.O_CREAT | os.O_RDWR, 0o600))
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+
+        try:
+            self._create_schema()
+        except sqlite3.OperationalError as e:
+            self.connection.close()
+            raise RuntimeError(f'The full-text search requires the FTS5 extension of SQLite: {e}')
+
+    def _create_schema(self):
+        with self.lock:
+            if self.connection.execute('PRAGMA user_version').fetchone()[0] != self.SCHEMA_VERSION:
+                self.connection.execute('DROP TABLE IF EXISTS documents')
+                self.connection.execute('DROP TABLE IF EXISTS checksums')
+
+            self.connection.execute("CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5(title, body, "
+                                    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')")
+
+            # Lets the objects received again without modification be skipped
+            self.connection.execute('CREATE TABLE IF NOT EXISTS checksums (rowid INTEGER PRIMARY KEY, '
+                                    'checksum INTEGER NOT NULL)')
+            self.connection.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    @staticmethod
+    def _get_rowid(endpoint, id):
+        return int(id) * len(ENDPOINTS) + ENDPOINTS.index(endpoint)
+
+    @staticmethod
+    def _parse_iri(iri):
+        # Return the endpoint and the identifier of an indexed object, or None
+        parts = urlsplit(iri).path[len(Model.API_ROOT) + 1:].split('/')
+
+        if (len(parts) != 2) or (parts[0] not in INDEXED_FIELDS) or not parts[1].isdigit():
+            return None
+
+        return parts[0], int(parts[1])
+
+    @staticmethod
+    def is_complete(path):
+        """
+        Whether the objects received for the request of `path` have every indexed field, which is not the case of the
+        projections on other fields.
+        """
+
+        url = urlsplit(path)
+        properties = parse_qs(url.query).get('properties[]')
+
+        if properties is None:
+            return True
+
+        endpoint = url.path[len(Model.API_ROOT) + 1:].split('/')[0]
+
+        return set(camel_case(e) for e in INDEXED_FIELDS.get(endpoint, ())) <= set(properties)
+
+    def add_many(self, items):
+        """
+        Index the JSON-LD objects of `items`, the ones which are not indexed are ignored.
+        """
+
+        documents = []
+
+        for item in items:
+            parsed = self._parse_iri(item.get('@id', '')) if type(item) == dict else None
+
+            if parsed is not None:
+                endpoint, id = parsed
+                values = [item.get(camel_case(name)) for name in INDEXED_FIELDS[endpoint]]
+                values = ['' if value is None else str(value) for value in values]
+                documents.append((self._get_rowid(endpoint, id), values[0], '\n'.join(values[1:])))
+
+        if len(documents) == 0:
+            return
+
+        with self.lock, self.connection:
+            checksums = {}
+
+            for rowid, title, body in documents:
+                checksums[rowid] = zlib.crc32(f'{title}\x00{body}'.encode())
+
+            known = dict(self.connection.execute(
+                f'SELECT rowid, checksum FROM checksums WHERE rowid IN ({", ".join("?" * len(checksums))})',
+                list(checksums)))
+            changed = [e for e in documents if known.get(e[0]) != checksums[e[0]]]
+
+            self.connection.executemany('DELETE FROM documents WHERE rowid = ?', [(e[0],) for e in changed])
+            self.connection.executemany('INSERT INTO documents (rowid, title, body) VALUES (?, ?, ?)', changed)
+            self.connection.executemany('INSERT OR REPLACE INTO checksums (rowid, checksum) VALUES (?, ?)',
+                                        [(e[0], checksums[e[0]]) for e in changed])
+
+        stats.increment('search_indexed', len(changed))
+
+    def index_members(self, path, members):
+        """
+        Yield the JSON-LD members of a collection, indexing them by batches.
+        """
+
+        if not self.is_complete(path):
+            yield from members
+            return
+
+        batch = []
+
+        for e in members:
+            batch.append(e)
+
+            if len(batch) >= self.BATCH_SIZE:
+                self.add_many(batch)
+                batch = []
+
+            yield e
+
+        self.add_many(batch)
+
+    def remove(self, iri):
+        parsed = self._parse_iri(iri)
+
+        if parsed is None:
+            return
+
+        rowid = self._get_rowid(*parsed)
+
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM documents WHERE rowid = ?', (rowid,))
+            self.connection.execute('DELETE FROM checksums WHERE rowid = ?', (rowid,))
+
+    def record(self, method, path, data):
+        """
+        Update the index with the response of a request.
+        """
+
+        if method == 'DELETE':
+            self.remove(path)
+        elif type(data) != dict:
+            return
+        elif data.get('@type') == 'hydra:Collection':
+            if self.is_complete(path):
+                self.add_many(data.get('hydra:member', []))
+        elif (method != 'GET') or self.is_complete(path):
+            self.add_many([data])
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM checksums').fetchone()[0]
+
+    @staticmethod
+    def _compile_query(text):
+        # Every word must match, the last one may be incomplete. The words are quoted so the syntax of FTS5 queries
+        # can't be injected
+        words = re.findall(r'\w+', text)
+
+        if len(words) == 0:
+            return None
+
+        return ' '.join(f'"{word}"' for word in words) + '*'
+
+    def search(self, text, endpoints=None, limit=20):
+        """
+        Return the objects matching every word of `text` (of the given endpoints only, if any) as SearchHit, the best
+        ones first. The matched terms of the titles and snippets are surrounded with MATCH_START and MATCH_END.
+        """
+
+        query = self._compile_query(text)
+
+        if query is None:
+            return []
+
+        sql = (f"SELECT rowid, highlight(documents, 0, ?, ?), snippet(documents, 1, ?, ?, '…', 16), "
+               f"bm25(documents, ?, ?) AS score FROM documents WHERE documents MATCH ?")
+        arguments = [MATCH_START, MATCH_END, MATCH_START, MATCH_END, self.TITLE_WEIGHT, self.BODY_WEIGHT, query]
+
+        if endpoints is not None:
+            sql += f' AND (rowid % {len(ENDPOINTS)}) IN ({", ".join("?" * len(endpoints))})'
+            arguments.extend(ENDPOINTS.index(e) for e in endpoints)
+
+        sql += ' ORDER BY score LIMIT ?'
+        arguments.append(limit)
+
+        with self.lock:
+            rows = self.connection.execute(sql, arguments).fetchall()
+
+        return [SearchHit(ENDPOINTS[rowid % len(ENDPOINTS)], str(rowid // len(ENDPOINTS)), title, snippet, -score)
+                for rowid, title, snippet, score in rows]
+
+    def update(self, api, endpoints=None):
+        """
+        Download the indexed fields of every object of `endpoints` (every indexed endpoint by default) to index them.
+        Return the number of objects received.
+        """
+
+        count = 0
+
+        for endpoint in (ENDPOINTS if endpoints is None else endpoints):
+            model = MODELS[endpoint]
+            path = f'{Model.API_ROOT}/{endpoint}{model.get_projection(INDEXED_FIELDS[endpoint])}'
+
+            for __ in api.iter_collection(path):
+                count += 1
+
+        return count
@@ -0,0 +1,164 @@
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+ID_SEGMENT_REGEX = re.compile(r'/\d+(?=/|$)')
+
+
+def get_endpoint(url):
+    """
+    Return the path of `url` with the identifiers replaced by a placeholder so every request made on the same kind of
+    resource is aggregated together: `/api/hosts/12?page=2` becomes `/api/hosts/{id}`.
+    """
+
+    return ID_SEGMENT_REGEX.sub('/{id}', urlsplit(url).path)
+
+
+class Histogram:
+    """
+    Keep a uniform sample (reservoir sampling) of at most MAX_SAMPLES values to compute percentiles.
+    """
+
+    MAX_SAMPLES = 10000
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.samples = []
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+
+        if len(self.samples) < self.MAX_SAMPLES:
+            self.samples.append(value)
+        else:
+            i = random.randrange(self.count)
+
+            if i < self.MAX_SAMPLES:
+                self.samples[i] = value
+
+    def percentile(self, p):
+        if len(self.samples) == 0:
+            return None
+
+        samples = sorted(self.samples)
+        return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99)
+        }
+
+
+class EndpointStats:
+
+    def __init__(self):
+        self.latencies = Histogram()
+        self.status_codes = Counter()
+        self.retries = 0
+        self.errors = 0
+        self.sent_bytes = 0
+        self.received_bytes = 0
+        self.received_wire_bytes = 0
+
+    def to_dict(self):
+        return {
+            'latency': self.latencies.to_dict(),
+            'status_codes': {str(k): v for k, v in self.status_codes.items()},
+            'retries': self.retries,
+            'errors': self.errors,
+            'sent_bytes': self.sent_bytes,
+            'received_bytes': self.received_bytes,
+            'received_wire_bytes': self.received_wire_bytes
+        }
+
+
+class Stats:
+    """
+    Collect metrics about the requests sent to the API (per endpoint latencies, sizes, status codes and retries),
+    counters of the model layer and the duration of the main processing steps (decoding, rendering, ...).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.endpoints = {}
+            self.counters = Counter()
+            self.timers = {}
+
+    def _get_endpoint_stats(self, method, url):
+        key = (method, get_endpoint(url))
+
+        if key not in self.endpoints:
+            self.endpoints[key] = EndpointStats()
+
+        return self.endpoints[key]
+
+    def record_request(self, method, url, status_code, duration, retries):
+        """
+        Record a request once it is over, retries included. `status_code` is None if no response was received.
+        """
+
+        with self.lock:
+            endpoint_stats = self._get_endpoint_stats(method, url)
+            endpoint_stats.latencies.add(duration)
+            endpoint_stats.retries += retries
+
+            if status_code is None:
+                endpoint_stats.errors += 1
+            else:
+                endpoint_stats.status_codes[status_code] += 1
+
+    def record_transfer(self, method, url, sent_bytes, received_bytes, received_wire_bytes):
+        with self.lock:
+            endpoint_stats = self._get_endpoint_stats(method, url)
+            endpoint_stats.sent_bytes += sent_bytes
+            endpoint_stats.received_bytes += received_bytes
+            endpoint_stats.received_wire_bytes += received_wire_bytes
+
+    def increment(self, name, n=1):
+        with self.lock:
+            self.counters[name] += n
+
+    def record_duration(self, name, duration):
+        with self.lock:
+            if name not in self.timers:
+                self.timers[name] = Histogram()
+
+            self.timers[name].add(duration)
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.record_duration(name, time.perf_counter() - start)
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                'endpoints': [
+                    dict(method=method, endpoint=endpoint, **endpoint_stats.to_dict())
+                    for (method, endpoint), endpoint_stats in sorted(self.endpoints.items())
+                ],
+                'counters': dict(self.counters),
+                'timers': {name: histogram.to_dict() for name, histogram in sorted(self.timers.items())}
+            }
+
+
+# The statistics of the current process, shared by the API clients and the models
+stats = Stats()
@@ -0,0 +1,243 @@
+import base64
+import io
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3 import HTTPResponse
+
+from .auth import AUTHENTICATION_PATH, decode_jwt_claims
+
+# These headers describe the body as it was sent on the wire, but the body is recorded decoded
+IGNORED_RESPONSE_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+
+# The credentials must never be written to a cassette
+REDACTED_HEADERS = {'authorization', 'cookie', 'set-cookie'}
+REDACTED_VALUE = 'REDACTED'
+
+# The lifetime given to the replayed tokens without issue date, in seconds
+DEFAULT_TOKEN_LIFETIME = 3600
+
+
+def encode_body(body):
+    if body is None:
+        return None
+
+    if isinstance(body, str):
+        body = body.encode()
+
+    return base64.b64encode(body).decode()
+
+
+def decode_body(body):
+    return b'' if body is None else base64.b64decode(body)
+
+
+def redact_token_response(body):
+    """
+    Remove the signature of the JWT returned by the server: the replayed token keeps its claims (the user, the
+    expiration date) but can't be used against the server.
+    """
+
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return None
+
+    if (type(data) == dict) and isinstance(data.get('token'), str):
+        data['token'] = '.'.join(data['token'].split('.')[:2] + [REDACTED_VALUE])
+
+    return json.dumps(data).encode()
+
+
+def renew_token_response(body, lifetime=DEFAULT_TOKEN_LIFETIME):
+    """
+    Move the expiration date of the JWT of a replayed login to the future, keeping its lifetime. Otherwise the client
+    would log in again before every request once the recorded expiration date is over.
+    """
+
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return body
+
+    if (type(data) != dict) or not isinstance(data.get('token'), str) or (data['token'].count('.') != 2):
+        return body
+
+    header, __, signature = data['token'].split('.')
+    claims = decode_jwt_claims(data['token'])
+
+    if ('exp' in claims) and ('iat' in claims):
+        lifetime = claims['exp'] - claims['iat']
+
+    now = int(time.time())
+    claims.update(iat=now, exp=now + lifetime)
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).decode().rstrip('=')
+    data['token'] = f'{header}.{payload}.{signature}'
+
+    return json.dumps(data).encode()
+
+
+class Cassette:
+    """
+    A list of recorded request / response pairs saved as a JSON file.
+    """
+
+    def __init__(self, path, interactions=None):
+        self.path = path
+        self.interactions = []
+        self.index = defaultdict(list)
+        self.positions = defaultdict(int)
+        self.lock = threading.Lock()
+
+        for interaction in ([] if interactions is None else interactions):
+            self._add(interaction)
+
+    def _add(self, interaction):
+        self.interactions.append(interaction)
+        self.index[(interaction['request']['method'], interaction['request']['url'])].append(interaction)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as inf:
+            return cls(path, json.load(inf)['interactions'])
+
+    def save(self):
+        with self.lock:
+            # The cassette holds the data of the missions: only its owner can read it
+            with os.fdopen(os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as outf:
+                os.chmod(self.path, 0o600)
+                json.dump({'interactions': self.interactions}, outf, indent=1)
+
+    def record(self, request, response, elapsed):
+        headers = {}
+
+        for k, v in response.headers.items():
+            if k.lower() in REDACTED_HEADERS:
+                headers[k] = REDACTED_VALUE
+            elif k.lower() not in IGNORED_RESPONSE_HEADERS:
+                headers[k] = v
+
+        request_body = request.body
+        response_body = response.content
+
+        # The username and password sent to log in, and the token received
+        if urlsplit(request.url).path.endswith(AUTHENTICATION_PATH):
+            request_body = None
+            response_body = redact_token_response(response_body)
+
+        interaction = {
+            'request': {
+                'method': request.method,
+                'url': request.url,
+                'body': encode_body(request_body)
+            },
+            'response': {
+                'status': response.status_code,
+                'reason': response.reason,
+                'headers': headers,
+                'body': encode_body(response_body),
+                'elapsed': elapsed
+            }
+        }
+
+        with self.lock:
+            self._add(interaction)
+
+    def find(self, method, url):
+        """
+        Return the next recorded interaction matching the request. Identical requests are answered in the order they
+        were recorded, the last answer being repeated once they are all used.
+        """
+
+        with self.lock:
+            candidates = self.index.get((method, url))
+
+            if candidates is None:
+                return None
+
+            position = self.positions[(method, url)]
+            self.positions[(method, url)] += 1
+
+            return candidates[min(position, len(candidates) - 1)]
+
+
+class RecordingAdapter(HTTPAdapter):
+    """
+    A transport sending the requests to the server for real and recording every exchange into a cassette.
+    """
+
+    def __init__(self, cassette, **kwargs):
+        super().__init__(**kwargs)
+
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        start = time.perf_counter()
+        response = super().send(request, **kwargs)
+
+        # Reading the content here still allows the caller to stream it: requests serves it from memory
+        response.content
+        self.cassette.record(request, response, time.perf_counter() - start)
+
+        return response
+
+    def close(self):
+        super().close()
+        self.cassette.save()
+
+
+class ReplayAdapter(HTTPAdapter):
+    """
+    A transport answering the requests with the responses of a cassette, without any network access. Each response is
+    delayed either by a fixed `latency` (plus or minus a random `jitter`, in seconds) or, by default, by the time the
+    server took to answer when it was recorded divided by `speed`. The tokens returned by the logins are given a new
+    expiration date, so the recorded ones are not renewed before every request once they expired.
+    """
+
+    def __init__(self, cassette, latency=None, jitter=0.0, speed=1.0, **kwargs):
+        super().__init__(**kwargs)
+
+        self.cassette = cassette
+        self.latency = latency
+        self.jitter = jitter
+        self.speed = speed
+        self.round_trips = 0
+
+    def get_delay(self, interaction):
+        if self.latency is None:
+            delay = interaction['response']['elapsed'] / self.speed
+        else:
+            delay = self.latency + random.uniform(-self.jitter, self.jitter)
+
+        return max(0.0, delay)
+
+    def send(self, request, **kwargs):
+        interaction = self.cassette.find(request.method, request.url)
+
+        if interaction is None:
+            raise requests.ConnectionError(f'No recorded response for {request.method} {request.url}',
+                                           request=request)
+
+        self.round_trips += 1
+        time.sleep(self.get_delay(interaction))
+
+        recorded_response = interaction['response']
+        body = decode_body(recorded_response['body'])
+
+        if urlsplit(request.url).path.endswith(AUTHENTICATION_PATH):
+            body = renew_token_response(body)
+
+        raw = HTTPResponse(body=io.BytesIO(body),
+                           headers=recorded_response['headers'],
+                           status=recorded_response['status'],
+                           reason=recorded_response['reason'],
+                           preload_content=False)
+
+        return self.build_response(request, raw)
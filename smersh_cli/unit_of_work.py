@@ -0,0 +1,214 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from requests import RequestException
+
+from .models import Model, get_codec
+from .stats import stats
+
+
+def get_references(o):
+    """
+    Yield the (field name, value) pairs of the fields of `o` referencing other objects.
+    """
+
+    for f, is_list_field, target_codec in get_codec(o.__class__).fields:
+        if target_codec is not None:
+            yield f.name, getattr(o, f.name)
+
+
+def get_new_references(o):
+    """
+    Return the new objects (without identifier) referenced by `o`.
+    """
+
+    references = []
+
+    for __, value in get_references(o):
+        for e in (value if isinstance(value, list) else [value]):
+            if isinstance(e, Model) and (e.id is None):
+                references.append(e)
+
+    return references
+
+
+class UnitOfWork:
+    """
+    Collect new, modified and deleted objects, then send them all with `flush`. The objects are saved in waves of
+    concurrent requests: a new object is created after the new objects it references so their identifiers are known.
+    When new objects reference each other, the objects of one of their classes are created without these references,
+    which are sent by a second request once the others exist.
+    """
+
+    def __init__(self, api, max_workers=None):
+        self.api = api
+        self.max_workers = api.pool_size if max_workers is None else max_workers
+
+        # By object identity: the models are compared by value
+        self.saved = {}
+        self.deleted = {}
+
+    def add(self, o):
+        """
+        Save `o` on the next flush: it is created if it is new, or its modified fields are updated. The new objects it
+        references are created as well.
+        """
+
+        self.deleted.pop(id(o), None)
+        self.saved[id(o)] = o
+
+        return o
+
+    def delete(self, o):
+        self.saved.pop(id(o), None)
+
+        if o.id is not None:
+            self.deleted[id(o)] = o
+
+    def __len__(self):
+        return len(self.saved) + len(self.deleted)
+
+    def flush(self):
+        """
+        Send the pending changes. Return a list of (object, exception) pairs for the objects that could not be saved or
+        deleted, they are kept for the next flush. The objects referencing a new object which could not be created are
+        not sent either.
+        """
+
+        objects = self._get_pending()
+        pending = dict(objects)
+        dependencies = {key: {id(e) for e in get_new_references(o)} for key, o in pending.items()}
+        deferred = {}
+        failed = {}
+        errors = []
+
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            while len(pending) > 0:
+                ready = [key for key in pending if len(dependencies[key] & pending.keys()) == 0]
+
+                if len(ready) == 0:
+                    # The remaining objects form cycles: the objects of one class are created first, without their
+                    # references to the others, so these objects are still created together
+                    cls = next(iter(pending.values())).__class__
+
+                    for key, o in pending.items():
+                        if o.__class__ is cls:
+                            references = self._strip_references(o, pending)
+                            dependencies[key] = set()
+
+                            if len(references) > 0:
+                                deferred[key] = references
+
+                    continue
+
+                wave = []
+
+                for key in ready:
+                    o = pending.pop(key)
+
+                    if len(dependencies[key] & failed.keys()) > 0:
+                        failed[key] = o
+                        errors.append((o, RuntimeError('A referenced object could not be created')))
+                    else:
+                        wave.append((key, o))
+
+                errors.extend(self._run_wave(executor, self._save_object, wave, failed))
+
+            # The references removed to break the cycles are now sent
+            wave = []
+
+            for key, references in deferred.items():
+                o = objects[key]
+                targets = set()
+
+                for name, value in references.items():
+                    setattr(o, name, value)
+                    targets.update(id(e) for e in (value if isinstance(value, list) else [value]))
+
+                if key in failed:
+                    continue
+
+                if len(targets & failed.keys()) > 0:
+                    failed[key] = o
+                    errors.append((o, RuntimeError('A referenced object could not be created')))
+                else:
+                    wave.append((key, o))
+
+            errors.extend(self._run_wave(executor, self._save_object, wave, failed))
+            errors.extend(self._run_wave(executor, self._delete_object, list(self.deleted.items()), failed))
+
+        for key in list(self.saved):
+            if key not in failed:
+                del self.saved[key]
+
+        for key in list(self.deleted):
+            if key not in failed:
+                del self.deleted[key]
+
+        return errors
+
+    def _get_pending(self):
+        # The new objects referenced by the added ones are created too
+        pending = dict(self.saved)
+        objects = list(pending.values())
+
+        while len(objects) > 0:
+            for e in get_new_references(objects.pop()):
+                if id(e) not in pending:
+                    pending[id(e)] = e
+                    self.saved[id(e)] = e
+                    objects.append(e)
+
+        return pending
+
+    @staticmethod
+    def _strip_references(o, excluded):
+        """
+        Remove the references of `o` to the objects of `excluded`. Return the original values of the modified fields.
+        """
+
+        references = {}
+
+        for name, value in get_references(o):
+            if isinstance(value, list):
+                kept = [e for e in value if id(e) not in excluded]
+
+                if len(kept) != len(value):
+                    references[name] = value
+                    setattr(o, name, kept)
+            elif id(value) in excluded:
+                references[name] = value
+                setattr(o, name, None)
+
+        return references
+
+    def _run_wave(self, executor, function, wave, failed):
+        if len(wave) == 0:
+            return []
+
+        stats.increment('unit_of_work_waves')
+        errors = []
+
+        for (key, o), e in zip(wave, executor.map(lambda item: function(item[1]), wave)):
+            if e is not None:
+                failed[key] = o
+                errors.append((o, e))
+
+        return errors
+
+    def _save_object(self, o):
+        try:
+            o.save(self.api)
+        except RequestException as e:
+            return e
+
+        return None
+
+    def _delete_object(self, o):
+        try:
+            self.api.delete(o.iri)
+        except RequestException as e:
+            return e
+
+        self.api.identity_map.discard(o.iri)
+
+        return None
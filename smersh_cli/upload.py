@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .utils.hosts import iter_batches, iter_hosts
+from .utils.paths import get_cache_directory
+
+UPLOAD_PATH = '/api/upload/host'
+
+
+class HostsUpload:
+    """
+    Upload a hosts file to a mission in batches of `batch_size` lines sent concurrently by `workers` threads. The file
+    is read line by line, so it is never held in memory as a whole.
+
+    The batches already uploaded are saved in a state file until the upload completes: if it fails, running the same
+    upload again only sends the remaining batches.
+    """
+
+    DEFAULT_BATCH_SIZE = 5000
+    DEFAULT_WORKERS = 4
+
+    def __init__(self, api, file_path, mission, batch_size=DEFAULT_BATCH_SIZE, workers=DEFAULT_WORKERS,
+                 normalize=False, resume=True, state_directory=None):
+        self.api = api
+        self.file_path = file_path
+        self.mission = mission
+        self.batch_size = batch_size
+        self.workers = workers
+        self.normalize = normalize
+        self.resume = resume
+        self.state_directory = get_cache_directory('uploads') if state_directory is None else state_directory
+
+        # The rejected domains of each uploaded batch, by batch index
+        self.rejected_domains = {}
+
+    @property
+    def state_path(self):
+        # The batches depend on the file and on the way it is split, a change of any of these starts a new upload
+        file_stat = os.stat(self.file_path)
+        key = json.dumps([os.path.abspath(self.file_path), file_stat.st_size, file_stat.st_mtime, self.api.main_url,
+                          self.mission.name, self.batch_size, self.normalize])
+
+        return os.path.join(self.state_directory, hashlib.sha1(key.encode()).hexdigest() + '.json')
+
+    def load_state(self):
+        try:
+            with open(self.state_path, 'r') as inf:
+                state = json.load(inf)
+        except (OSError, ValueError):
+            return
+
+        self.rejected_domains = {int(i): domains for i, domains in state['rejected_domains'].items()}
+
+    def save_state(self):
+        os.makedirs(self.state_directory, exist_ok=True)
+
+        with open(self.state_path, 'w') as outf:
+            json.dump({'rejected_domains': self.rejected_domains}, outf)
+
+    def remove_state(self):
+        try:
+            os.remove(self.state_path)
+        except FileNotFoundError:
+            pass
+
+    def upload_batch(self, data):
+        body = {'missionName': self.mission.name}
+        return self.api.request('POST', UPLOAD_PATH, body=body, files=dict(filename=data))
+
+    def run(self, progress=None):
+        """
+        Upload the file and return the report of the whole upload. `progress` is called with the number of lines
+        processed so far each time a batch is done.
+        """
+
+        if self.resume:
+            self.load_state()
+
+        processed_lines = 0
+        pending = {}
+        error = None
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            batches = enumerate(iter_batches(iter_hosts(self.file_path, self.normalize), self.batch_size))
+
+            for i, (data, lines_count) in batches:
+                if i in self.rejected_domains:
+                    processed_lines += lines_count
+
+                    if progress is not None:
+                        progress(processed_lines)
+
+                    continue
+
+                pending[executor.submit(self.upload_batch, data)] = (i, lines_count)
+
+                # Don't read the file faster than it is uploaded
+                if len(pending) >= 2 * self.workers:
+                    processed_lines, error = self._collect(pending, processed_lines, progress, FIRST_COMPLETED)
+
+                    if error is not None:
+                        break
+
+            if error is None:
+                processed_lines, error = self._collect(pending, processed_lines, progress)
+            else:
+                self._collect(pending, processed_lines, progress)
+
+        if error is not None:
+            self.save_state()
+            raise error
+
+        self.remove_state()
+
+        return {'rejected_domains': [domain for __, domains in sorted(self.rejected_domains.items())
+                                     for domain in domains]}
+
+    def _collect(self, pending, processed_lines, progress, return_when=ALL_COMPLETED):
+        done, __ = wait(pending, return_when=return_when)
+        error = None
+
+        for future in done:
+            i, lines_count = pending.pop(future)
+
+            try:
+                response = future.result()
+            except Exception as e:
+                error = e if error is None else error
+                continue
+
+            self.rejected_domains[i] = response.get('rejected_domains', [])
+            processed_lines += lines_count
+
+            if progress is not None:
+                progress(processed_lines)
+
+        return processed_lines, error
@@ -1,10 +1,13 @@
 import re
+from functools import lru_cache
 
 
 SNAKE_CASE_REGEX = re.compile(r'(.)([A-Z][a-z]+)')
 SNAKE_CASE_2_REGEX = re.compile(r'([a-z0-9])([A-Z])')
 
 
+# The keys of the API are converted over and over but there are only a few dozens of them
+@lru_cache(maxsize=1024)
 def snake_case(s):
     s = SNAKE_CASE_REGEX.sub(r'\1_\2', s)
     return SNAKE_CASE_2_REGEX.sub(r'\1_\2', s).lower()
@@ -0,0 +1,49 @@
+def count_lines(file_path, chunk_size=1024 * 1024):
+    count = 0
+
+    with open(file_path, 'rb') as inf:
+        for chunk in iter(lambda: inf.read(chunk_size), b''):
+            count += chunk.count(b'\n')
+
+    return count
+
+
+def iter_hosts(file_path, normalize=False):
+    """
+    Yield the lines of a hosts file one by one, without loading the whole file. If `normalize` is True the hosts are
+    stripped and lowercased, and empty lines, comments and duplicates are skipped.
+    """
+
+    seen = set()
+
+    with open(file_path, 'rb') as inf:
+        for line in inf:
+            if not normalize:
+                yield line if line.endswith(b'\n') else line + b'\n'
+                continue
+
+            host = line.strip().lower()
+
+            if (len(host) == 0) or host.startswith(b'#') or (host in seen):
+                continue
+
+            seen.add(host)
+            yield host + b'\n'
+
+
+def iter_batches(lines, batch_size):
+    """
+    Group lines into batches of at most `batch_size` lines. Each batch is yielded as a (bytes, lines count) pair.
+    """
+
+    batch = []
+
+    for line in lines:
+        batch.append(line)
+
+        if len(batch) >= batch_size:
+            yield b''.join(batch), len(batch)
+            batch = []
+
+    if len(batch) > 0:
+        yield b''.join(batch), len(batch)
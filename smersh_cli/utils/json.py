@@ -1,79 +1,90 @@
+import sys
+
 from .case import snake_case
 
+# Longer strings (descriptions...) are unlikely to be repeated
+INTERN_MAX_LENGTH = 128
+
 
 def extract_id_from_url(url):
     return url.split('/')[-1]
 
 
-def convert_dict_keys_case(data, case_function):
-    converted = {}
-
-    for k, v in data.items():
-        if type(v) == dict:
-            v = convert_dict_keys_case(v, case_function)
-
-        converted[case_function(k)] = v
-
-    return converted
-
-
 def is_collection(data):
     return ('@type' in data) and (data['@type'] == 'hydra:Collection')
 
 
-def clean_ldjson(data):
-    data_type = type(data)
-
-    if data_type == list:
-        cleaned = []
-
-        for e in data:
-            cleaned.append(clean_ldjson(e))
-
-        return cleaned
-
-    elif data_type == dict:
-        if is_collection(data):
-            return clean_ldjson(data['hydra:member'])
+def get_next_page(data):
+    if (type(data) != dict) or not is_collection(data):
+        return None
 
-        if ('id' not in data) and ('@id' not in data):
-            return data
+    return data.get('hydra:view', {}).get('hydra:next')
 
-        id_ = data['id' if 'id' in data else '@id']
 
-        if type(id_) == int:
-            id_ = str(id_)
+def clean_ldjson(data):
+    """
+    Convert JSON-LD data to plain data: collections are replaced by their members, the identifiers are extracted from
+    the IRIs, the JSON-LD keys are removed and the keys are converted to snake case. The objects without identifier are
+    kept as is.
+
+    The data is walked without recursion: each container is created empty at its final place, then filled when it is
+    popped from the stack. Short strings (IRIs, states...) are interned as they are repeated across objects and pages.
+    """
+
+    stack = []
+    intern = sys.intern
+    snake = snake_case
+
+    def shell(value):
+        value_type = type(value)
+
+        while (value_type == dict) and (value.get('@type') == 'hydra:Collection'):
+            value = value['hydra:member']
+            value_type = type(value)
+
+        if value_type == list:
+            cleaned = []
+        elif value_type == dict:
+            if 'id' in value:
+                id_ = value['id']
+            elif '@id' in value:
+                id_ = value['@id']
+            else:
+                return value
+
+            cleaned = {'id': str(id_) if type(id_) == int else id_.rsplit('/', 1)[-1]}
+        elif (value_type == str) and (len(value) <= INTERN_MAX_LENGTH):
+            return intern(value)
         else:
-            id_ = extract_id_from_url(id_)
-
-        cleaned = {
-            'id': id_
-        }
-
-        for k, v in data.items():
-            if (k[0] != '@') and (k != 'id'):
-                cleaned[snake_case(k)] = clean_ldjson(v)
+            return value
 
+        stack.append((value, cleaned))
         return cleaned
 
-    return data
-
+    result = shell(data)
 
-def wrap_id(data):
-    if type(data) == list:
-        return [{'id': e} for e in data]
+    while len(stack) > 0:
+        source, cleaned = stack.pop()
 
-    return {'id': data}
-
-
-def wrap_id_dict(data, keys):
-    # TODO: This function does not support object nesting
-    wrapped = {}
-
-    for k, v in data.items():
-        wrapped[k] = wrap_id(v) if k in keys else v
-
-    return wrapped
+        if type(cleaned) == list:
+            cleaned.extend([
+                intern(e) if (type(e) == str) and (len(e) <= INTERN_MAX_LENGTH) else
+                shell(e) if (type(e) == dict) or (type(e) == list) else e
+                for e in source
+            ])
+        else:
+            for k, v in source.items():
+                if (k[0] != '@') and (k != 'id'):
+                    v_type = type(v)
+
+                    if (v_type == str) and (len(v) <= INTERN_MAX_LENGTH):
+                        cleaned[snake(k)] = intern(v)
+                    elif (v_type == dict) or (v_type == list):
+                        cleaned[snake(k)] = shell(v)
+                    else:
+                        cleaned[snake(k)] = v
+
+    return result
 
 
 def clean_none_keys(data):
@@ -0,0 +1,15 @@
+import hashlib
+import os
+
+
+def get_cache_directory(*parts):
+    root = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(root, 'smersh-cli', *parts)
+
+
+def get_server_path(directory, url, extension):
+    """
+    Return the path of a file of `directory` holding the data of the server at `url`.
+    """
+
+    return os.path.join(directory, hashlib.sha1(url.rstrip('/').encode()).hexdigest()[:16] + extension)
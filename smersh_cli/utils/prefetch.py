@@ -0,0 +1,59 @@
+import queue
+import threading
+
+_END = object()
+
+
+class _Failure:
+
+    def __init__(self, exception):
+        self.exception = exception
+
+
+def prefetch(iterable, size):
+    """
+    Iterate over `iterable` from a background thread which stays up to `size` items ahead of the consumer. Exceptions
+    raised by the iterable are raised again in the consumer thread.
+    """
+
+    items = queue.Queue(maxsize=size)
+    stopped = threading.Event()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except Exception as e:
+            put(_Failure(e))
+        else:
+            put(_END)
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+
+    threading.Thread(target=produce, daemon=True).start()
+
+    try:
+        while True:
+            item = items.get()
+
+            if item is _END:
+                return
+
+            if isinstance(item, _Failure):
+                raise item.exception
+
+            yield item
+    finally:
+        stopped.set()
@@ -0,0 +1,94 @@
+import threading
+import time
+
+
+class AdaptiveRateLimiter:
+    """
+    A token bucket limiting both the request rate and the number of requests in flight. Both limits follow an AIMD
+    scheme: they are cut down as soon as the server pushes back and slowly grow again while it keeps up.
+    """
+
+    DEFAULT_RATE = 50.0
+    DEFAULT_MIN_RATE = 1.0
+    DEFAULT_MAX_RATE = 500.0
+    DEFAULT_MAX_CONCURRENCY = 10
+    DEFAULT_DECREASE_FACTOR = 0.5
+    DEFAULT_INCREASE_STEP = 1.0
+
+    def __init__(self, rate=DEFAULT_RATE, max_concurrency=DEFAULT_MAX_CONCURRENCY, min_rate=DEFAULT_MIN_RATE,
+                 max_rate=DEFAULT_MAX_RATE, decrease_factor=DEFAULT_DECREASE_FACTOR,
+                 increase_step=DEFAULT_INCREASE_STEP):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, rate)
+        self.max_concurrency = max_concurrency
+        self.concurrency = max_concurrency
+        self.decrease_factor = decrease_factor
+        self.increase_step = increase_step
+
+        self.tokens = float(max_concurrency)
+        self.in_flight = 0
+        self.successes = 0
+        self.updated_at = time.monotonic()
+        self.condition = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(float(self.concurrency), self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self):
+        with self.condition:
+            while True:
+                self._refill()
+
+                if (self.in_flight < self.concurrency) and (self.tokens >= 1):
+                    self.tokens -= 1
+                    self.in_flight += 1
+                    return
+
+                if self.tokens >= 1:
+                    # Only the concurrency limit is blocking us, wait for a request to be released
+                    self.condition.wait()
+                else:
+                    self.condition.wait((1 - self.tokens) / self.rate)
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify()
+
+    def throttle(self):
+        """
+        The server is overloaded (or asked us to slow down): multiplicative decrease of both limits.
+        """
+
+        with self.condition:
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            self.concurrency = max(1, int(self.concurrency * self.decrease_factor))
+            self.tokens = min(self.tokens, 0.0)
+            self.successes = 0
+
+    def recover(self):
+        """
+        The server handled a request fine: additive increase of both limits. The concurrency grows by one once a full
+        window of requests went through.
+        """
+
+        with self.condition:
+            self.rate = min(self.max_rate, self.rate + self.increase_step)
+            self.successes += 1
+
+            if self.successes >= self.concurrency:
+                self.successes = 0
+
+                if self.concurrency < self.max_concurrency:
+                    self.concurrency += 1
+                    self.condition.notify()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
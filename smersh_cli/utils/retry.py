@@ -0,0 +1,76 @@
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+class RetryPolicy:
+
+    IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+    RETRY_STATUSES = frozenset([429, 502, 503, 504])
+
+    # The server tells us it did not process these requests so they can be sent again whatever the method is. A 503 may
+    # come from a proxy after the server applied the request, so it is only retried for the idempotent methods
+    SAFE_STATUSES = frozenset([429])
+
+    DEFAULT_MAX_RETRIES = 3
+    DEFAULT_BACKOFF_FACTOR = 0.5
+    DEFAULT_MAX_BACKOFF = 30
+
+    def __init__(self, max_retries=DEFAULT_MAX_RETRIES, backoff_factor=DEFAULT_BACKOFF_FACTOR,
+                 max_backoff=DEFAULT_MAX_BACKOFF, methods=IDEMPOTENT_METHODS, statuses=RETRY_STATUSES):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.methods = methods
+        self.statuses = statuses
+
+    def should_retry(self, method, attempt, response=None):
+        """
+        Tell whether a request should be sent again. `response` is None when the request failed before any response
+        was received (connection reset, timeout, ...).
+        """
+
+        if attempt >= self.max_retries:
+            return False
+
+        if response is None:
+            return method in self.methods
+
+        if response.status_code not in self.statuses:
+            return False
+
+        return (method in self.methods) or (response.status_code in self.SAFE_STATUSES)
+
+    def get_delay(self, attempt, response=None):
+        retry_after = None if response is None else get_retry_after(response)
+
+        # "Full jitter" exponential backoff: spreading the retries of every client over the whole backoff window avoids
+        # having all of them hitting the server again at the same time
+        delay = random.uniform(0, min(self.max_backoff, self.backoff_factor * (2 ** attempt)))
+
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+
+        return delay
+
+
+def get_retry_after(response):
+    value = response.headers.get('Retry-After')
+
+    if value is None:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+
+    return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
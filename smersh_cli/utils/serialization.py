@@ -0,0 +1,108 @@
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+JSON_BACKEND_VARIABLE = 'SMERSH_JSON_BACKEND'
+AUTO_JSON_BACKEND = 'auto'
+
+
+class StdlibJSONBackend:
+
+    name = 'json'
+    available = True
+    DecodeError = json.JSONDecodeError
+
+    @staticmethod
+    def loads(data):
+        return json.loads(data)
+
+    @staticmethod
+    def dumps(data):
+        return json.dumps(data).encode()
+
+
+class OrjsonBackend:
+
+    name = 'orjson'
+    available = orjson is not None
+    DecodeError = None if orjson is None else orjson.JSONDecodeError
+
+    @staticmethod
+    def loads(data):
+        return orjson.loads(data)
+
+    @staticmethod
+    def dumps(data):
+        return orjson.dumps(data)
+
+
+class MsgspecBackend:
+
+    name = 'msgspec'
+    available = msgspec is not None
+    DecodeError = None if msgspec is None else msgspec.DecodeError
+
+    @staticmethod
+    def loads(data):
+        return msgspec.json.decode(data)
+
+    @staticmethod
+    def dumps(data):
+        return msgspec.json.encode(data)
+
+
+class UjsonBackend:
+
+    name = 'ujson'
+    available = ujson is not None
+    DecodeError = None if ujson is None else ujson.JSONDecodeError
+
+    @staticmethod
+    def loads(data):
+        return ujson.loads(data)
+
+    @staticmethod
+    def dumps(data):
+        return ujson.dumps(data, ensure_ascii=False, escape_forward_slashes=False).encode()
+
+
+# In order of preference when the backend is chosen automatically
+JSON_BACKENDS = {backend.name: backend for backend in (OrjsonBackend, MsgspecBackend, UjsonBackend, StdlibJSONBackend)}
+
+
+def get_json_backend(name=None):
+    """
+    Return the JSON backend named `name`, or the one named by the SMERSH_JSON_BACKEND environment variable if `name` is
+    None. The "auto" backend is the fastest installed library, the stdlib `json` module being the fallback.
+    """
+
+    if name is None:
+        name = os.environ.get(JSON_BACKEND_VARIABLE, AUTO_JSON_BACKEND)
+
+    if name == AUTO_JSON_BACKEND:
+        return next(backend() for backend in JSON_BACKENDS.values() if backend.available)
+
+    if name not in JSON_BACKENDS:
+        raise ValueError(f'Unknown JSON backend "{name}"')
+
+    backend = JSON_BACKENDS[name]
+
+    if not backend.available:
+        raise RuntimeError(f'The "{name}" JSON backend is not installed')
+
+    return backend()
@@ -0,0 +1,140 @@
+import codecs
+import json
+
+WHITESPACES = ' \t\n\r'
+DELIMITERS = ',:]}'
+MEMBERS_KEY = 'hydra:member'
+
+_decoder = json.JSONDecoder()
+
+
+class CollectionStream:
+    """
+    Incrementally decode a JSON-LD document received as a sequence of byte chunks. Iterating over the stream yields the
+    members of the Hydra collection (or of a top-level array) one by one as soon as they are received, so only the
+    item being decoded has to be kept in memory.
+
+    Once the stream is exhausted, `metadata` holds every other key of the document (`hydra:view`, ...).
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+        self.metadata = None
+
+    def __iter__(self):
+        if self._skip_whitespaces() == '[':
+            self.position += 1
+            yield from self._iter_array()
+
+            self.metadata = {}
+            return
+
+        self._expect('{')
+        metadata = {}
+
+        if self._skip_whitespaces() == '}':
+            self.position += 1
+        else:
+            while True:
+                key = self._decode_value()
+                self._expect(':')
+
+                if (key == MEMBERS_KEY) and (self._skip_whitespaces() == '['):
+                    self.position += 1
+                    yield from self._iter_array()
+                else:
+                    metadata[key] = self._decode_value()
+
+                if self._next_delimiter('}'):
+                    break
+
+        self.metadata = metadata
+
+    def _iter_array(self):
+        if self._skip_whitespaces() == ']':
+            self.position += 1
+            return
+
+        while True:
+            yield self._decode_value()
+
+            if self._next_delimiter(']'):
+                return
+
+    def _read(self):
+        if self.eof:
+            return False
+
+        # Drop what has already been decoded so the buffer never grows bigger than a chunk plus an item
+        self.buffer = self.buffer[self.position:]
+        self.position = 0
+
+        for chunk in self.chunks:
+            text = self.text_decoder.decode(chunk)
+
+            if len(text) > 0:
+                self.buffer += text
+                return True
+
+        self.buffer += self.text_decoder.decode(b'', final=True)
+        self.eof = True
+
+        return False
+
+    def _skip_whitespaces(self):
+        while True:
+            while (self.position < len(self.buffer)) and (self.buffer[self.position] in WHITESPACES):
+                self.position += 1
+
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+
+            if not self._read():
+                raise ValueError('Unexpected end of the JSON document')
+
+    def _expect(self, char):
+        if self._skip_whitespaces() != char:
+            raise ValueError(f'Invalid JSON document: expected "{char}" at position {self.position}')
+
+        self.position += 1
+
+    def _next_delimiter(self, closing_char):
+        char = self._skip_whitespaces()
+
+        if char not in (',', closing_char):
+            raise ValueError(f'Invalid JSON document: unexpected "{char}" at position {self.position}')
+
+        self.position += 1
+
+        return char == closing_char
+
+    def _decode_value(self):
+        self._skip_whitespaces()
+
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                # The value is most likely incomplete
+                if self._read():
+                    continue
+
+                raise
+
+            # Inside an object or an array a value is always followed by a delimiter. If we don't have it yet the value
+            # may be truncated: "12." is decoded as 12 until the next chunk brings "5"
+            delimiter = end
+
+            while (delimiter < len(self.buffer)) and (self.buffer[delimiter] in WHITESPACES):
+                delimiter += 1
+
+            if ((delimiter >= len(self.buffer)) or (self.buffer[delimiter] not in DELIMITERS)) and self._read():
+                continue
+
+            self.position = end
+
+            return value
@@ -0,0 +1,40 @@
+import argparse
+
+import pytest
+
+from benchmarks.fake_server import add_server_arguments, create_server
+from smersh_cli.api import SmershAPI
+
+
+@pytest.fixture
+def server():
+    parser = argparse.ArgumentParser()
+    add_server_arguments(parser)
+    server = create_server(parser.parse_args(['--missions', '2', '--hosts', '50', '--host-vulns', '100']))
+    server.start()
+
+    yield server
+
+    server.stop()
+
+
+@pytest.fixture
+def api_factory(server):
+    apis = []
+
+    def create():
+        api = SmershAPI(f'http://{server.server_address[0]}:{server.server_address[1]}')
+        assert api.authenticate('admin', 'admin')
+        apis.append(api)
+
+        return api
+
+    yield create
+
+    for api in apis:
+        api.close()
+
+
+@pytest.fixture
+def api(api_factory):
+    return api_factory()
@@ -0,0 +1,25 @@
+from smersh_cli.models import HostVuln, Mission
+from smersh_cli.stats import stats
+
+
+def test_isolated_access_loads_only_its_object(server, api):
+    mission = Mission.get(api, 1)
+    hosts = {host.id for host in mission.hosts}
+    host_vuln = next(e for e in HostVuln.all(api) if e.host.id not in hosts)
+
+    # The hosts of the mission are pending too, but they are not related to the host of the host vuln
+    assert len(hosts) > 1
+
+    requests_count = server.requests_count
+    assert host_vuln.host.name is not None
+    assert server.requests_count == requests_count + 1
+
+
+def test_references_of_a_relation_are_loaded_together(server, api):
+    mission = Mission.get(api, 1)
+    requests_count = server.requests_count
+    batches_count = stats.to_dict()['counters'].get('lazy_load_batches', 0)
+
+    assert all(host.name is not None for host in mission.hosts)
+    assert server.requests_count == requests_count + len(mission.hosts)
+    assert stats.to_dict()['counters']['lazy_load_batches'] == batches_count + 1
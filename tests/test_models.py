@@ -0,0 +1,81 @@
+import pytest
+
+from smersh_cli.models import Host, Mission, User
+
+
+def test_get_requests_a_known_object_again(server, api_factory):
+    api = api_factory()
+    other_api = api_factory()
+
+    host = Host.get(api, 1)
+    other_host = Host.get(other_api, 1)
+    other_host.name = 'renamed.example.com'
+    other_host.save(other_api)
+
+    requests_count = server.requests_count
+
+    assert Host.get(api, 1) is host
+    assert host.name == 'renamed.example.com'
+    assert server.requests_count == requests_count + 1
+
+
+def test_get_cached_does_not_request_a_known_object(server, api):
+    host = Host.get(api, 1)
+    requests_count = server.requests_count
+
+    assert Host.get(api, 1, cached=True) is host
+    assert server.requests_count == requests_count
+
+
+def test_merge_keeps_the_modified_fields(api):
+    host = Host.get(api, 1)
+    technology = host.technology
+    host.name = 'edited.example.com'
+
+    # The collection holds host 1 too, it is merged into the same instance
+    Host.all(api)
+
+    assert host.name == 'edited.example.com'
+    assert host.technology == technology
+    assert host.get_changes() == {'name': 'edited.example.com'}
+
+
+def test_merge_of_partial_data_keeps_the_modified_fields(api):
+    host = Host.get(api, 1)
+    host.checked = not host.checked
+    checked = host.checked
+
+    Host.from_response(api, {'id': '1', 'name': 'host-1.example.com'})
+
+    assert host.checked == checked
+    assert host.get_changes() == {'checked': checked}
+
+
+def test_refresh_discards_the_modified_fields(api):
+    host = Host.get(api, 1)
+    name = host.name
+    host.name = 'edited.example.com'
+
+    assert host.refresh(api) is host
+    assert host.name == name
+    assert host.get_changes() == {}
+
+
+def test_reference_to_an_unsaved_object_is_not_encoded():
+    mission = Mission(id=None, users=[User(id=None)])
+
+    with pytest.raises(TypeError):
+        mission.encode()
+
+    with pytest.raises(TypeError):
+        Host(id='1', mission=Mission(id=None)).get_changes()
+
+
+def test_merge_into_an_object_referencing_an_unsaved_object(api):
+    mission = Mission.get(api, 1)
+    user = User(id=None)
+    mission.users.append(user)
+
+    Mission.all(api)
+
+    assert mission.users[-1] is user
@@ -0,0 +1,49 @@
+import argparse
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from benchmarks.fake_server import add_server_arguments, create_server
+from smersh_cli.api import SmershAPI
+from smersh_cli.utils.retry import RetryPolicy
+
+
+def get_response(status_code):
+    return SimpleNamespace(status_code=status_code, headers={})
+
+
+def test_post_is_not_retried_on_503():
+    assert not RetryPolicy().should_retry('POST', 0, get_response(503))
+    assert not RetryPolicy().should_retry('PATCH', 0, get_response(503))
+
+
+def test_post_is_retried_on_429():
+    assert RetryPolicy().should_retry('POST', 0, get_response(429))
+
+
+def test_idempotent_methods_are_retried_on_503():
+    for method in ('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'):
+        assert RetryPolicy().should_retry(method, 0, get_response(503))
+
+
+def test_post_answered_with_503_is_sent_once():
+    parser = argparse.ArgumentParser()
+    add_server_arguments(parser)
+    server = create_server(parser.parse_args(['--hosts', '10', '--host-vulns', '10', '--retry-after', '0']))
+    api = SmershAPI(server.start())
+
+    try:
+        assert api.authenticate('admin', 'admin')
+
+        server.error_rate = 1.0
+        server.error_statuses = [503]
+        requests_count = server.requests_count
+
+        with pytest.raises(requests.HTTPError):
+            api.post('/api/hosts', {'name': 'host.example.com'})
+
+        assert server.requests_count == requests_count + 1
+    finally:
+        api.close()
+        server.stop()
@@ -0,0 +1,47 @@
+import json
+
+from smersh_cli.utils.stream import CollectionStream
+
+DOCUMENT = {
+    '@context': '/api/contexts/Host',
+    '@type': 'hydra:Collection',
+    'hydra:totalItems': 12.5,
+    'hydra:member': [
+        {'@id': '/api/hosts/1', 'id': 1, 'name': 'hôte-1.example.com', 'score': 12.5, 'ratio': 1.5e-10},
+        {'@id': '/api/hosts/2', 'id': 2, 'name': 'host-2', 'checked': True, 'technology': None, 'tags': [1, -2.25e3]},
+        -0.5,
+        1e+20,
+        [],
+        {}
+    ],
+    'hydra:view': {'@id': '/api/hosts?page=1', 'weight': 3.75, 'count': 120}
+}
+
+
+def decode(chunks):
+    stream = CollectionStream(chunks)
+    members = list(stream)
+
+    return dict(stream.metadata, **{'hydra:member': members})
+
+
+def test_document_split_at_every_offset():
+    for text in (json.dumps(DOCUMENT), json.dumps(DOCUMENT, indent=1)):
+        data = text.encode()
+        expected = json.loads(data)
+
+        for i in range(len(data) + 1):
+            assert decode([data[:i], data[i:]]) == expected, f'split at {i}: {data[:i][-20:]!r} | {data[i:][:20]!r}'
+
+
+def test_document_split_into_bytes():
+    data = json.dumps(DOCUMENT).encode()
+
+    assert decode([data[i:i + 1] for i in range(len(data))]) == json.loads(data)
+
+
+def test_array_split_at_every_offset():
+    data = b'[12.5, 1.5e-10, 3, 7.0E+2]'
+
+    for i in range(len(data) + 1):
+        assert list(CollectionStream([data[:i], data[i:]])) == json.loads(data)
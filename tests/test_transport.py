@@ -0,0 +1,49 @@
+import base64
+import json
+import time
+
+from smersh_cli.api import SmershAPI
+from smersh_cli.auth import decode_jwt_claims
+from smersh_cli.models import Host
+from smersh_cli.transport import Cassette, RecordingAdapter, ReplayAdapter
+
+
+def expire_token(interaction):
+    # The token of the recorded login expired an hour ago
+    data = json.loads(base64.b64decode(interaction['response']['body']))
+    header, payload, signature = data['token'].split('.')
+    claims = decode_jwt_claims(data['token'])
+    claims.update(iat=int(time.time()) - 7200, exp=int(time.time()) - 3600)
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).decode().rstrip('=')
+    data['token'] = f'{header}.{payload}.{signature}'
+    interaction['response']['body'] = base64.b64encode(json.dumps(data).encode()).decode()
+
+
+def test_replay_of_an_expired_token(server, tmp_path):
+    url = f'http://{server.server_address[0]}:{server.server_address[1]}'
+    path = str(tmp_path / 'cassette.json')
+
+    api = SmershAPI(url, transport=RecordingAdapter(Cassette(path)))
+    assert api.authenticate('admin', 'admin')
+
+    for id in (1, 2, 3):
+        Host.get(api, id)
+
+    api.close()
+
+    cassette = Cassette.load(path)
+
+    for interaction in cassette.interactions:
+        if interaction['request']['url'].endswith('/authentication_token'):
+            expire_token(interaction)
+
+    transport = ReplayAdapter(cassette, latency=0)
+    api = SmershAPI(url, transport=transport)
+    assert api.authenticate('admin', 'admin')
+
+    for id in (1, 2, 3):
+        assert Host.get(api, id).name is not None
+
+    api.close()
+
+    assert transport.round_trips == 4